@@ -0,0 +1,170 @@
+"""
+栈帧数据结构的内存及速度对比
+
+    python3 benchmarks/frames.py [--crashes 2000] [--threads 4] [--frames 16] [-o result.json]
+
+对比原来基于property的StackItemInfo、使用__slots__的StackItemInfo及列式FrameTable，
+分别统计创建栈帧、遍历读取属性的耗时以及tracemalloc统计的内存占用，结果以JSON输出。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from symbolicate import symbolicate as core
+from symbolicate.frames import FrameTable
+from benchmarks import synthetic
+
+__author__ = 'jinzhao'
+
+
+class LegacyStackItemInfo(object):
+    """
+    改为__slots__之前的栈信息结构，作为对比基准
+    """
+    def __init__(self):
+        self.__line_num = None
+        self.__name = None
+        self.__invoke_address = None
+        self.__load_address = None
+        self.__invoke_symbol = None
+
+    @property
+    def line_num(self):
+        if self.__line_num is None:
+            self.__line_num = -1
+        return self.__line_num
+
+    @line_num.setter
+    def line_num(self, value):
+        self.__line_num = value
+
+    @property
+    def name(self):
+        if self.__name is None:
+            self.__name = ''
+        return self.__name
+
+    @name.setter
+    def name(self, value):
+        self.__name = value
+
+    @property
+    def invoke_address(self):
+        if self.__invoke_address is None:
+            self.__invoke_address = ''
+        return self.__invoke_address
+
+    @invoke_address.setter
+    def invoke_address(self, value):
+        self.__invoke_address = value
+
+    @property
+    def load_address(self):
+        if self.__load_address is None:
+            self.__load_address = ''
+        return self.__load_address
+
+    @load_address.setter
+    def load_address(self, value):
+        self.__load_address = value
+
+    @property
+    def invoke_symbol(self):
+        if self.__invoke_symbol is None:
+            self.__invoke_symbol = ''
+        return self.__invoke_symbol
+
+    @invoke_symbol.setter
+    def invoke_symbol(self, value):
+        self.__invoke_symbol = value
+
+
+def _build_legacy(rows):
+    frames = list()
+    for line_num, name, invoke_address, load_address in rows:
+        stack_item = LegacyStackItemInfo()
+        stack_item.name = name
+        stack_item.invoke_address = invoke_address
+        stack_item.load_address = load_address
+        stack_item.line_num = line_num
+        frames.append(stack_item)
+    return frames
+
+
+def _build_slots(rows):
+    return [core.StackItemInfo(line_num, name, invoke_address, load_address) for line_num, name, invoke_address, load_address in rows]
+
+
+def _build_table(rows):
+    table = FrameTable()
+    images = dict()
+    for line_num, name, invoke_address, load_address in rows:
+        image_item = images.get(name)
+        if image_item is None:
+            image_item = images[name] = core.ImageItemInfo(load_address, name, 'arm64', name.upper())
+        table.append(0, line_num, image_item, int(invoke_address, 16), int(load_address, 16))
+    return table
+
+
+def _scan_objects(frames):
+    # 与_image_targets相同的访问模式：读取地址计算偏移，写回符号
+    total = 0
+    for stack_item in frames:
+        total += int(stack_item.invoke_address, 16) - int(stack_item.load_address, 16)
+        stack_item.invoke_symbol = stack_item.name
+    return total
+
+
+def _scan_table(table):
+    return sum(table.offsets())
+
+
+def _measure(build_func, scan_func, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    frames = build_func(rows)
+    build_seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    checksum = scan_func(frames)
+    scan_seconds = time.perf_counter() - start
+    return {'build_seconds': build_seconds, 'scan_seconds': scan_seconds, 'memory_bytes': current,
+            'bytes_per_frame': current / len(rows), 'checksum': checksum}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='Benchmark frame representations.')
+    parser.add_argument('--crashes', action='store', type=int, default=2000, help='number of synthetic crashes')
+    parser.add_argument('--threads', action='store', type=int, default=4, help='number of threads in each crash')
+    parser.add_argument('--frames', action='store', type=int, default=16, help='number of frames in each thread')
+    parser.add_argument('-o', '--output', action='store', type=str, dest='output', help='write JSON result into file instead of stdout')
+    args = parser.parse_args(argv)
+
+    images = synthetic.make_images(8)
+    rows = list()
+    for index in range(args.crashes):
+        content = synthetic.make_crash(index, images, args.threads, args.frames)
+        crash_list = core._parse_content(content.splitlines(True), lambda *params: '')
+        rows.extend((stack_item.line_num, stack_item.name, stack_item.invoke_address, stack_item.load_address)
+                    for crash_obj in crash_list for stack_item in crash_obj.function_stacks)
+    result = {'frames': len(rows),
+              'legacy_properties': _measure(_build_legacy, _scan_objects, rows),
+              'slots': _measure(_build_slots, _scan_objects, rows),
+              'frame_table': _measure(_build_table, _scan_table, rows)}
+    content = json.dumps(result, indent=2, sort_keys=True)
+    if args.output is None:
+        print(content)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(content + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+crash日志解析吞吐量测试
+
+    python3 benchmarks/parse.py [--crashes 100000] [--threads 2] [--frames 8] [--images 16] [--repeat 3] [--crash-log file] [-o result.json]
+
+对比每行调用re.match(pattern_string)、每个区段重新编译正则的旧解析方式与当前预编译正则加行首判断的解析方式，
+两者都逐行读取同一个合成的crash日志文件，结果以JSON输出。
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from symbolicate import symbolicate as core
+from benchmarks import synthetic
+
+__author__ = 'jinzhao'
+
+
+def _legacy_parse_crash_info(line, crash_obj):
+    complete = False
+    if crash_obj is None:
+        if re.match(core._match_crash_header_re(), line) is not None:
+            crash_obj = core.CrashInfo()
+    elif len(crash_obj.product_name) == 0:
+        match_obj = re.match(core._match_product_name_re(), line)
+        if match_obj is not None:
+            crash_obj.product_name = match_obj.group(1)
+    elif len(crash_obj.identifier) == 0:
+        match_obj = re.match(core._match_identifier_re(), line)
+        if match_obj is not None:
+            crash_obj.identifier = match_obj.group(1)
+    elif len(crash_obj.version) == 0:
+        match_obj = re.match(core._match_version_re(), line)
+        if match_obj is not None:
+            crash_obj.version = match_obj.group(1)
+    elif len(crash_obj.code_type) == 0:
+        match_obj = re.match(core._match_code_type_re(), line)
+        if match_obj is not None:
+            crash_obj.code_type = match_obj.group(1)
+    elif len(crash_obj.os_version) == 0:
+        match_obj = re.match(core._match_os_version_re(), line)
+        if match_obj is not None:
+            crash_obj.os_version = match_obj.group(1)
+            complete = True
+    return (crash_obj, complete)
+
+
+def _legacy_parse_stack_info(line, re_obj, crash_obj, line_num):
+    if re_obj is None:
+        re_obj = re.compile(core._match_stack_item_re())
+    complete = False
+    match_obj = re_obj.match(line)
+    if match_obj is not None:
+        crash_obj.function_stacks.append(core.StackItemInfo(line_num, match_obj.group(1), match_obj.group(2), match_obj.group(3)))
+    elif re.match(core._match_image_header_re(), line) is not None:
+        complete = True
+        re_obj = None
+    return (crash_obj, re_obj, complete)
+
+
+def _legacy_parse_image_info(line, re_obj, crash_obj):
+    if re_obj is None:
+        re_obj = re.compile(core._match_image_item_re())
+    complete = False
+    match_obj = re_obj.match(line)
+    if match_obj is not None:
+        symbol_file = '{prefix}/{os_version}/Symbols/{symbol_file}'.format(prefix=core._os_symbol_file_path_prefix(),
+                                                                          os_version=crash_obj.os_version,
+                                                                          symbol_file=match_obj.group(7).lstrip('/'))
+        image_item = core.ImageItemInfo(match_obj.group(1), match_obj.group(3).lstrip('+'), match_obj.group(4), (match_obj.group(6) or '').upper(), symbol_file)
+        crash_obj.binary_images[image_item.name] = image_item
+    elif len(crash_obj.binary_images) > 0:
+        complete = True
+        re_obj = None
+    return (crash_obj, re_obj, complete)
+
+
+def _legacy_parse(lines):
+    """
+    预编译之前的解析状态机
+    :return: (crash数, 栈帧数)
+    """
+    crashes = frames = 0
+    header_complete = stack_complete = False
+    crash_obj = re_obj = None
+    for line_num, line in enumerate(lines):
+        if header_complete is False:
+            crash_obj, header_complete = _legacy_parse_crash_info(line, crash_obj)
+        elif stack_complete is False:
+            crash_obj, re_obj, stack_complete = _legacy_parse_stack_info(line, re_obj, crash_obj, line_num)
+        else:
+            crash_obj, re_obj, image_complete = _legacy_parse_image_info(line, re_obj, crash_obj)
+            if image_complete is True:
+                crashes += 1
+                frames += len(crash_obj.function_stacks)
+                header_complete = stack_complete = False
+                crash_obj = re_obj = None
+    return (crashes, frames)
+
+
+def _current_parse(lines):
+    """
+    :return: (crash数, 栈帧数)
+    """
+    crashes = frames = 0
+    for crash_obj in core._parse_crashes(lines, lambda *params: ''):
+        if crash_obj is not None:
+            crashes += 1
+            frames += len(crash_obj.function_stacks)
+    return (crashes, frames)
+
+
+def _measure(parse_func, crash_log):
+    with open(crash_log, 'r') as file:
+        start = time.perf_counter()
+        crashes, frames = parse_func(file)
+        seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'crashes': crashes, 'frames': frames,
+            'crashes_per_second': crashes / seconds if seconds > 0 else 0.0,
+            'frames_per_second': frames / seconds if seconds > 0 else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='Benchmark crash log parsing.')
+    parser.add_argument('--crashes', action='store', type=int, default=100000, help='number of synthetic crashes')
+    parser.add_argument('--threads', action='store', type=int, default=2, help='number of threads in each crash')
+    parser.add_argument('--frames', action='store', type=int, default=8, help='number of frames in each thread')
+    parser.add_argument('--images', action='store', type=int, default=16, help='number of binary images in each crash')
+    parser.add_argument('--repeat', action='store', type=int, default=3, help='run each parser several times and keep the fastest run')
+    parser.add_argument('--crash-log', action='store', type=str, dest='crash_log', help='parse this file instead of a synthetic one')
+    parser.add_argument('-o', '--output', action='store', type=str, dest='output', help='write JSON result into file instead of stdout')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        crash_log = args.crash_log
+        if crash_log is None:
+            crash_log = os.path.join(temp_dir, 'parse.crash')
+            synthetic.write_crash_log(crash_log, args.crashes, args.threads, args.frames, args.images)
+        legacy = min((_measure(_legacy_parse, crash_log) for index in range(args.repeat)), key=lambda item: item['seconds'])
+        current = min((_measure(_current_parse, crash_log) for index in range(args.repeat)), key=lambda item: item['seconds'])
+        size = os.path.getsize(crash_log)
+    result = {'bytes': size,
+              'legacy': legacy,
+              'current': current,
+              'speedup': legacy['seconds'] / current['seconds'] if current['seconds'] > 0 else 0.0}
+    content = json.dumps(result, indent=2, sort_keys=True)
+    if args.output is None:
+        print(content)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(content + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
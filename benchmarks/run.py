@@ -0,0 +1,149 @@
+"""
+symbolicate性能测试
+
+    python3 benchmarks/run.py [--crashes 200] [--threads 4] [--frames 16] [--images 8]
+                              [--atos-latency 0.01] [--dwarfdump-latency 0.01] [--backend atos|atos-pool]
+                              [-j workers] [--scenario parse ...] [-o result.json]
+
+每个场景在独立的子进程中运行，分别记录耗时、吞吐量及峰值内存，结果以JSON输出。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import symbolicate
+from symbolicate import symbolicate as core
+from benchmarks import synthetic
+
+__author__ = 'jinzhao'
+
+SCENARIOS = ['parse', 'symbolicate', 'compose', 'end_to_end', 'stream']
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS上ru_maxrss的单位为字节
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _context(args):
+    atos_pool = symbolicate.AtosPool(max(args.workers, 8)) if args.backend == 'atos-pool' else None
+    return core._SymbolicateContext(None, None, None, args.workers, atos_pool)
+
+
+def _run_scenario(name, args, crash_log, app_file):
+    """
+    :return: dict，包含耗时、crash数、栈帧数
+    """
+    core._set_verbose_mode(False)
+    finder_func = lambda *params: app_file
+    output_path = os.path.join(args.work_dir, name + '.out')
+    context = _context(args)
+    if name in ('end_to_end', 'stream'):
+        start = time.perf_counter()
+        result = core._symbolicate_log(crash_log, finder_func, output_path, context, args.workers, name == 'stream')
+        seconds = time.perf_counter() - start
+        crashes, frames, resolved = result
+    else:
+        status, lines = core._read_log(crash_log)
+        start = time.perf_counter()
+        crash_list = core._parse_content(lines, finder_func)
+        seconds = time.perf_counter() - start
+        if name != 'parse':
+            start = time.perf_counter()
+            core._symbolicate_crash_list(crash_list, context, args.workers)
+            seconds = time.perf_counter() - start
+        if name == 'compose':
+            start = time.perf_counter()
+            core._compose_log(crash_list, lines)
+            seconds = time.perf_counter() - start
+        crashes = len(crash_list)
+        frames = sum(len(crash_obj.function_stacks) for crash_obj in crash_list)
+        resolved = sum(1 for crash_obj in crash_list for stack_item in crash_obj.function_stacks if len(stack_item.invoke_symbol) > 0)
+    if context.atos_pool is not None:
+        context.atos_pool.close()
+    return {'seconds': seconds,
+            'crashes': crashes,
+            'frames': frames,
+            'resolved': resolved,
+            'crashes_per_second': crashes / seconds if seconds > 0 else 0.0,
+            'frames_per_second': frames / seconds if seconds > 0 else 0.0,
+            'peak_rss_kb': _peak_rss_kb()}
+
+
+def _parse_params(argv=None):
+    parser = argparse.ArgumentParser(prog='Benchmark symbolicate.')
+    parser.add_argument('--crashes', action='store', type=int, default=200, help='number of crashes in the synthetic log')
+    parser.add_argument('--threads', action='store', type=int, default=4, help='number of threads in each crash')
+    parser.add_argument('--frames', action='store', type=int, default=16, help='number of frames in each thread')
+    parser.add_argument('--images', action='store', type=int, default=8, help='number of binary images in each crash')
+    parser.add_argument('--atos-latency', action='store', type=float, dest='atos_latency', default=0.0, help='seconds fake atos sleeps per call')
+    parser.add_argument('--dwarfdump-latency', action='store', type=float, dest='dwarfdump_latency', default=0.0, help='seconds fake dwarfdump sleeps per call')
+    parser.add_argument('--backend', action='store', type=str, choices=['atos', 'atos-pool'], default='atos', help='symbol lookup backend')
+    parser.add_argument('-j', '--jobs', action='store', type=int, dest='workers', default=1, help='number of concurrent workers')
+    parser.add_argument('--scenario', action='append', dest='scenarios', choices=SCENARIOS, help='scenario to run, all scenarios by default')
+    parser.add_argument('--work-dir', action='store', type=str, dest='work_dir', help='directory for generated files, a temporary directory by default')
+    parser.add_argument('-o', '--output', action='store', type=str, dest='output', help='write JSON result into file instead of stdout')
+    parser.add_argument('--run-scenario', action='store', type=str, dest='run_scenario', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def _prepare(args):
+    """
+    生成crash日志、符号文件及fake atos/dwarfdump
+    :return: (crash日志路径, app符号文件路径, 子进程的环境变量, 生成的数据规模)
+    """
+    crash_log = os.path.join(args.work_dir, 'bench.crash')
+    workload = synthetic.write_crash_log(crash_log, args.crashes, args.threads, args.frames, args.images)
+    home, app_file = synthetic.write_symbol_files(args.work_dir, args.images)
+    bin_dir = synthetic.write_fake_tools(os.path.join(args.work_dir, 'bin'), args.atos_latency, args.dwarfdump_latency)
+    env = dict(os.environ)
+    env['HOME'] = home
+    env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+    return (crash_log, app_file, env, workload)
+
+
+def main(argv=None):
+    args = _parse_params(argv)
+    if args.run_scenario is not None:
+        result = _run_scenario(args.run_scenario, args, os.path.join(args.work_dir, 'bench.crash'), os.environ['BENCH_APP_FILE'])
+        print(json.dumps(result))
+        return 0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.work_dir is None:
+            args.work_dir = temp_dir
+        os.makedirs(args.work_dir, exist_ok=True)
+        crash_log, app_file, env, workload = _prepare(args)
+        env['BENCH_APP_FILE'] = app_file
+        forwarded = ['--work-dir', args.work_dir, '--backend', args.backend, '-j', str(args.workers)]
+        scenarios = dict()
+        for name in args.scenarios or SCENARIOS:
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--run-scenario', name] + forwarded, env=env)
+            scenarios[name] = json.loads(output.decode('utf-8').splitlines()[-1])
+    result = {'version': symbolicate.version(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'config': {'crashes': args.crashes, 'threads': args.threads, 'frames': args.frames, 'images': args.images,
+                         'atos_latency': args.atos_latency, 'dwarfdump_latency': args.dwarfdump_latency,
+                         'backend': args.backend, 'workers': args.workers},
+              'workload': workload,
+              'scenarios': scenarios}
+    content = json.dumps(result, indent=2, sort_keys=True)
+    if args.output is None:
+        print(content)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(content + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
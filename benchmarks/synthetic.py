@@ -0,0 +1,181 @@
+import os
+import sys
+import stat
+import random
+
+__author__ = 'jinzhao'
+
+OS_VERSION = '9.1 (13B143)'
+
+_SYSTEM_IMAGES = [('libobjc.A.dylib', '/usr/lib/libobjc.A.dylib'),
+                  ('libsystem_kernel.dylib', '/usr/lib/system/libsystem_kernel.dylib'),
+                  ('libsystem_pthread.dylib', '/usr/lib/system/libsystem_pthread.dylib'),
+                  ('libdispatch.dylib', '/usr/lib/system/libdispatch.dylib'),
+                  ('CoreFoundation', '/System/Library/Frameworks/CoreFoundation.framework/CoreFoundation'),
+                  ('Foundation', '/System/Library/Frameworks/Foundation.framework/Foundation'),
+                  ('UIKit', '/System/Library/Frameworks/UIKit.framework/UIKit'),
+                  ('QuartzCore', '/System/Library/Frameworks/QuartzCore.framework/QuartzCore'),
+                  ('GraphicsServices', '/System/Library/PrivateFrameworks/GraphicsServices.framework/GraphicsServices')]
+
+_IMAGE_SIZE = 0x1000000
+
+# 测试与性能测试共用的模拟工具，设置STUB_TOOL_LOG环境变量时记录每次调用
+_FAKE_ATOS = '''\
+#!{python}
+import os, sys, time
+args = sys.argv[1:]
+addresses = list()
+options = dict()
+while args:
+    arg = args.pop(0)
+    if arg in ('-arch', '-o', '-l'):
+        options[arg] = args.pop(0)
+    else:
+        addresses.append(arg)
+if not os.path.exists(options['-o']):
+    # 与atos一样无法打开符号文件时直接退出
+    sys.stderr.write('atos cannot load symbols for the file {{}}\\n'.format(options['-o']))
+    sys.exit(1)
+log = os.environ.get('STUB_TOOL_LOG')
+if log:
+    with open(log, 'a') as file:
+        file.write(('atos ' + ' '.join(addresses) if addresses else 'atos-interactive ' + options['-l']) + '\\n')
+name = os.path.basename(options['-o'])
+load_address = int(options['-l'], 16)
+time.sleep({latency})
+for address in addresses:
+    print('sym_{{:x}} (in {{}}) + 0'.format(int(address, 16) - load_address, name))
+if not addresses:
+    # 没有地址参数时与atos一样从stdin逐行读取地址
+    for line in sys.stdin:
+        time.sleep({latency})
+        print('sym_{{:x}} (in {{}}) + 0'.format(int(line, 16) - load_address, name), flush=True)
+'''
+
+_FAKE_DWARFDUMP = '''\
+#!{python}
+import os, sys, time
+time.sleep({latency})
+path = sys.argv[-1]
+log = os.environ.get('STUB_TOOL_LOG')
+if log:
+    with open(log, 'a') as file:
+        file.write('dwarfdump ' + path + '\\n')
+try:
+    with open(path + '.uuid') as file:
+        uuid = file.read().strip()
+except IOError:
+    print('error: {{}}: No such file or directory'.format(path))
+    sys.exit(1)
+print('UUID: {{}}-{{}}-{{}}-{{}}-{{}} ({{}}) {{}}'.format(uuid[0:8], uuid[8:12], uuid[12:16], uuid[16:20], uuid[20:], sys.argv[-2], path))
+'''
+
+
+def make_images(image_count, product='BenchApp'):
+    """
+    :param image_count: image数量，第一个为app
+    :return: list of (load_address, end_address, name, uuid, path)
+    """
+    images = list()
+    for index in range(max(image_count, 1)):
+        if index == 0:
+            name, path = product, '/var/mobile/Containers/Bundle/Application/{0}.app/{0}'.format(product)
+        elif index <= len(_SYSTEM_IMAGES):
+            name, path = _SYSTEM_IMAGES[index - 1]
+        else:
+            name = 'libsynthetic{}.dylib'.format(index)
+            path = '/usr/lib/' + name
+        load_address = 0x100000000 + index * 0x10000000
+        uuid = '{:032X}'.format(0x0123456789ABCDEF0123456789ABC000 + index)
+        images.append((load_address, load_address + _IMAGE_SIZE - 1, name, uuid, path))
+    return images
+
+
+def make_crash(index, images, threads=4, frames=16, product='BenchApp', rng=None):
+    """
+    生成一个符合Report Version 104格式的crash
+    :param index: crash序号，用于生成Incident Identifier
+    :param images: make_images的结果
+    :param threads: 线程数，第0个线程为崩溃线程
+    :param frames: 每个线程的栈帧数
+    :return: crash内容
+    """
+    rng = rng if rng is not None else random.Random(index)
+    lines = ['Incident Identifier: 8B0B2A4C-{:04X}-4C5E-9A8E-{:012X}\n'.format(index >> 48 & 0xffff, index & 0xffffffffffff),
+             'CrashReporter Key:   TODO\n',
+             'Hardware Model:      iPhone7,2\n',
+             'Process:         {} [1234]\n'.format(product),
+             'Path:            {}\n'.format(images[0][4]),
+             'Identifier:      com.example.{}\n'.format(product),
+             'Version:         1.0\n',
+             'Code Type:       ARM-64\n',
+             'Parent Process:  launchd [1]\n',
+             '\n',
+             'Date/Time:       2015-12-17 10:00:00 +0800\n',
+             'OS Version:      iPhone OS {}\n'.format(OS_VERSION),
+             'Report Version:  104\n',
+             '\n',
+             'Exception Type:  SIGSEGV\n',
+             'Exception Codes: SEGV_ACCERR at 0x0\n',
+             'Crashed Thread:  0\n']
+    for thread in range(threads):
+        lines.append('\nThread {}{}:\n'.format(thread, ' Crashed' if thread == 0 else ''))
+        for frame in range(frames):
+            load_address, end_address, name, uuid, path = images[rng.randrange(len(images))]
+            # 偏移按16字节对齐并集中在少量函数上，接近真实crash中地址的重复程度
+            offset = 0x1000 + rng.randrange(2048) * 0x10
+            lines.append('{:<4}{:<32}0x{:016x} 0x{:x} + {}\n'.format(frame, name, load_address + offset, load_address, offset))
+    lines.append('\nThread 0 crashed with ARM-64 Thread State:\n')
+    for row in range(8):
+        lines.append('    ' + '  '.join('{:>3}: 0x{:016x}'.format('x{}'.format(row * 4 + column), rng.getrandbits(64)) for column in range(4)) + '\n')
+    lines.append('\nBinary Images:\n')
+    for load_address, end_address, name, uuid, path in images:
+        lines.append('       0x{:x} -        0x{:x} {}{} arm64  <{}> {}\n'.format(load_address, end_address, '+' if name == product else '', name, uuid.lower(), path))
+    lines.append('\n')
+    return ''.join(lines)
+
+
+def write_crash_log(path, crashes, threads=4, frames=16, images=8, product='BenchApp', seed=0):
+    """
+    生成由多个crash拼接的日志文件
+    :return: dict，包含crash数、栈帧数及image数
+    """
+    image_list = make_images(images, product)
+    rng = random.Random(seed)
+    with open(path, 'w') as file:
+        for index in range(crashes):
+            file.write(make_crash(index, image_list, threads, frames, product, rng))
+    return {'crashes': crashes, 'frames': crashes * threads * frames, 'images': len(image_list)}
+
+
+def write_symbol_files(root, images=8, product='BenchApp'):
+    """
+    在root/home下生成空的系统库符号文件，在root下生成app符号文件，uuid写入同名的.uuid文件供fake dwarfdump读取
+    :return: (home目录, app符号文件路径)
+    """
+    home = os.path.join(root, 'home')
+    app_file = None
+    for load_address, end_address, name, uuid, path in make_images(images, product):
+        if name == product:
+            symbol_file = os.path.join(root, '{}.app.dSYM'.format(product), 'Contents', 'Resources', 'DWARF', product)
+            app_file = symbol_file
+        else:
+            symbol_file = os.path.join(home, 'Library', 'Developer', 'Xcode', 'iOS DeviceSupport', OS_VERSION, 'Symbols', path.lstrip('/'))
+        os.makedirs(os.path.dirname(symbol_file), exist_ok=True)
+        open(symbol_file, 'w').close()
+        with open(symbol_file + '.uuid', 'w') as file:
+            file.write(uuid)
+    return (home, app_file)
+
+
+def write_fake_tools(bin_dir, atos_latency=0.0, dwarfdump_latency=0.0):
+    """
+    生成模拟的atos和dwarfdump，每次调用（atos交互模式下每个地址）等待指定的秒数
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    for name, template, latency in (('atos', _FAKE_ATOS, atos_latency), ('dwarfdump', _FAKE_DWARFDUMP, dwarfdump_latency)):
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as file:
+            file.write(template.format(python=sys.executable, latency=float(latency)))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir
@@ -1,4 +1,5 @@
 import argparse
+import json
 import symbolicate
 import sys
 import re
@@ -11,11 +12,22 @@ def _parse_params():
     :return: Parser对象
     """
     cmd_usage = """
-    symbolicatedcrash [-v] {crash_log} {dsym_file} [-o {output_file}]
+    symbolicatedcrash [-v] {crash_log} {dsym_file} [-o {output_file}] [--cache-dir {cache_dir}] [--backend {atos,atos-pool,native}] [-j {workers}] [--stream] [--stats] [--stats-format {text,json}]
+                      [--symbol-root {directory} ...] [--state {state_file}] [--resume] [--format {text,ndjson}]
 
     options:
     -v run in verbose mode
     -o indicate ouput file
+    --cache-dir indicate directory to persist caches between runs, ~/.symbolicatecrash by default, the same as warm
+    --backend indicate symbol lookup backend, atos by default, atos-pool keeps atos processes running between images, native also uses symbol indexes in cache_dir
+    -j indicate number of concurrent workers
+    --stream symbolicate and write crash by crash with bounded memory
+    --stats print stage timings, external command latencies, cache hit rates and frame counts to stderr
+    --stats-format print statistics as text by default or as json, implies --stats
+    --symbol-root indicate directory to scan for symbol files by uuid, can be repeated, dsym_file is optional with it
+    --state save parsed crashes and per-frame results into state file, {crash_log}.state.json with --resume by default, not with --stream or ndjson
+    --resume only retry frames left unresolved in the state file, such as images whose dSYM was missing or mismatched
+    --format output symbolicated crash log as text by default, or one json record per crash with ndjson
     """
     cmd_description = """
     author: jinzhao
@@ -30,8 +42,30 @@ def _parse_params():
     group_param = group_run.add_argument_group()
     group_param.add_argument('-v', '--verbose', action='store_true', dest='verbose_mode', help='run in verbose mode, with some debug infomation outputs')
     group_param.add_argument('-o', '--output', action='store', type=str, dest='output_file', help='indicate output file of symolicated crash log')
+    group_param.add_argument('--cache-dir', action='store', type=str, dest='cache_dir', default=symbolicate.default_cache_dir(), help='indicate directory to persist caches between runs')
+    group_param.add_argument('--backend', action='store', type=str, dest='backend', choices=['atos', 'atos-pool', 'native'], default='atos', help='indicate symbol lookup backend, native reads symbol tables without atos')
+    group_param.add_argument('-j', '--jobs', action='store', type=int, dest='workers', default=1, help='indicate number of concurrent workers and child processes')
+    group_param.add_argument('--stream', action='store_true', dest='stream', help='symbolicate and write crash by crash, for huge concatenated crash logs')
+    group_param.add_argument('--stats', action='store_true', dest='stats', help='print statistics of the task to stderr')
+    group_param.add_argument('--stats-format', action='store', type=str, dest='stats_format', choices=['text', 'json'], help='indicate format of statistics, implies --stats')
+    group_param.add_argument('--symbol-root', action='append', type=str, dest='symbol_roots', help='indicate directory to scan for symbol files by uuid')
+    group_param.add_argument('--state', action='store', type=str, dest='state_file', help='indicate file to save parsed crashes and symbolication results')
+    group_param.add_argument('--resume', action='store_true', dest='resume', help='only retry unresolved frames from the state file')
+    group_param.add_argument('--format', action='store', type=str, dest='output_format', choices=['text', 'ndjson'], default='text', help='indicate output format')
     return parser.parse_args()
 
+def _dsym_symbol_file(dsym_file):
+    """
+    :param dsym_file: xxx.app.dSYM路径
+    :return: dSYM中的符号文件路径，dSYM路径无效时返回None
+    """
+    re_obj = re.compile(r'^.*/(.+).app.dSYM$|^(.+).app.dSYM$')
+    match_obj = re_obj.match(dsym_file)
+    if match_obj is None:
+        return None
+    app_name = match_obj.group(1) if match_obj.group(1) is not None else match_obj.group(2)
+    return dsym_file+'/Contents/Resources/DWARF/'+app_name
+
 def _main(args):
     """
     启动symbolicate程序
@@ -45,18 +79,29 @@ def _main(args):
         print('Error! You must indicate a crash log file.')
         return 2
     crash_log = args.crash_log
-    if args.dsym_file is None:
+    if args.dsym_file is None and args.symbol_roots is None:
         print('Error! You must indicate a dSYM file.')
         return 2
-    re_obj = re.compile(r'^.*/(.+).app.dSYM$|^(.+).app.dSYM$')
-    match_obj = re_obj.match(args.dsym_file)
-    if match_obj is None:
+    dsym_file = _dsym_symbol_file(args.dsym_file) if args.dsym_file is not None else None
+    if args.dsym_file is not None and dsym_file is None:
         print('Error! The dSYM file is not valid.')
         return 2
-    app_name = match_obj.group(1) if match_obj.group(1) is not None else match_obj.group(2)
-    dsym_file = args.dsym_file+'/Contents/Resources/DWARF/'+app_name
+    if (args.state_file is not None or args.resume is True) and (args.stream is True or args.output_format != 'text'):
+        print('Error! --state and --resume cannot be used with --stream or --format ndjson.')
+        return 2
     verbose_mode = args.verbose_mode
     output_file = args.output_file
+    uuid_cache = symbolicate.UUIDCache(args.cache_dir)
+    resolver = symbolicate.NativeResolver() if args.backend == 'native' else None
+    # 符号索引不做demangle，只在native解析时使用，atos的输出保持不变
+    index_store = symbolicate.SymbolIndexStore(args.cache_dir) if args.backend == 'native' else None
+    atos_pool = symbolicate.AtosPool(max(args.workers, 8)) if args.backend == 'atos-pool' else None
+    result_cache = symbolicate.ResultCache(cache_dir=args.cache_dir)
+    state_file = args.state_file
+    if state_file is None and args.resume is True:
+        state_file = symbolicate.default_state_path(crash_log)
+    # 没有指定--symbol-root时复用warm保存在缓存目录中的索引
+    symbol_store = symbolicate.SymbolStore(args.symbol_roots, args.cache_dir, scan=args.symbol_roots is not None)
 
     def finder_func(name, identifier, version, codetype, uuid):
         if verbose_mode is True:
@@ -65,11 +110,184 @@ def _main(args):
             print('code type: {codetype}'.format(codetype=codetype))
             print('app uuid: {uuid}'.format(uuid=uuid))
             print('dsym file: {dsym_file}'.format(dsym_file=dsym_file))
+        if dsym_file is None:
+            return symbol_store(name, identifier, version, codetype, uuid)
         return dsym_file
 
-    if symbolicate.symbolicate_crash(crash_log, finder_func, output_file, verbose_mode) is False:
+    try:
+        if args.stats is False and args.stats_format is None:
+            result = symbolicate.symbolicate_crash(crash_log, finder_func, output_file, verbose_mode, uuid_cache, resolver, index_store, args.workers, stream=args.stream, atos_pool=atos_pool, symbol_store=symbol_store, result_cache=result_cache,
+                                                   state_path=state_file, resume=args.resume, output_format=args.output_format)
+        else:
+            result, stats = symbolicate.symbolicate_crash_with_stats(crash_log, finder_func, output_file, verbose_mode, uuid_cache, resolver, index_store, args.workers, stream=args.stream, atos_pool=atos_pool, symbol_store=symbol_store, result_cache=result_cache,
+                                                                     state_path=state_file, resume=args.resume, output_format=args.output_format)
+            print(json.dumps(stats.to_dict(), indent=2) if args.stats_format == 'json' else stats.format(), file=sys.stderr)
+    finally:
+        if atos_pool is not None:
+            atos_pool.close()
+    if result is False:
         print('Error! task failed.')
         return 2
     return 0
 
+def _parse_index_params(argv):
+    """
+    index子命令参数解析
+    :return: Parser对象
+    """
+    cmd_usage = """
+    symbolicatedcrash index {symbol_file} [{symbol_file} ...] [--arch {code_type}] [--cache-dir {cache_dir}]
+    """
+    parser = argparse.ArgumentParser(prog='Build symbol index ahead of time.', usage=cmd_usage)
+    parser.add_argument('symbol_files', nargs='+', action='store', type=str, help='symbol file, such as xxx.app.dSYM/Contents/Resources/DWARF/xxx')
+    parser.add_argument('--arch', action='store', type=str, dest='code_type', help='only build index for this cpu architecture')
+    parser.add_argument('--cache-dir', action='store', type=str, dest='cache_dir', default=symbolicate.default_cache_dir(), help='indicate directory to store symbol index')
+    return parser.parse_args(argv)
+
+def _index_main(args):
+    """
+    为符号文件建立索引
+    :param args:解析后的命令行参数
+    """
+    index_store = symbolicate.SymbolIndexStore(args.cache_dir)
+    status = 0
+    for symbol_file in args.symbol_files:
+        built = index_store.build(symbol_file, args.code_type)
+        if len(built) == 0:
+            print('Error! cannot build symbol index for "{symbol_file}".'.format(symbol_file=symbol_file))
+            status = 2
+        for uuid, code_type in built:
+            print('{uuid} {code_type} {symbol_file}'.format(uuid=uuid, code_type=code_type, symbol_file=symbol_file))
+    index_store.close()
+    return status
+
+def _parse_batch_params(argv):
+    """
+    batch子命令参数解析
+    :return: Parser对象
+    """
+    cmd_usage = """
+    symbolicatedcrash batch {dsym_file} {crash_log|directory|glob} [...] [--manifest {manifest_file}] [-o {output_dir}]
+                            [-p {processes}] [-j {workers}] [--pattern {pattern}] [--cache-dir {cache_dir}] [--backend {atos,atos-pool,native}] [--stream] [-v]
+                            [--symbol-root {directory} ...] [--schedule {files,affinity}]
+    """
+    parser = argparse.ArgumentParser(prog='Symbolicate crash logs in batch.', usage=cmd_usage)
+    parser.add_argument('dsym_file', action='store', type=str, help='App symbolic file, generally named xxx.app.dSYM')
+    parser.add_argument('sources', nargs='*', action='store', type=str, help='crash log files, directories or glob patterns')
+    parser.add_argument('--manifest', action='store', type=str, dest='manifest', help='newline-delimited list of crash log files')
+    parser.add_argument('--pattern', action='store', type=str, dest='pattern', default='*.crash', help='file name pattern of crash logs in directories')
+    parser.add_argument('-o', '--output-dir', action='store', type=str, dest='output_dir', help='indicate output directory, outputs are written next to inputs by default')
+    parser.add_argument('-p', '--processes', action='store', type=int, dest='processes', default=1, help='indicate number of worker processes')
+    parser.add_argument('-j', '--jobs', action='store', type=int, dest='workers', default=1, help='indicate number of concurrent workers in each process')
+    parser.add_argument('--cache-dir', action='store', type=str, dest='cache_dir', default=symbolicate.default_cache_dir(), help='indicate directory to persist caches between runs')
+    parser.add_argument('--backend', action='store', type=str, dest='backend', choices=['atos', 'atos-pool', 'native'], default='atos', help='indicate symbol lookup backend')
+    parser.add_argument('--stream', action='store_true', dest='stream', help='symbolicate and write crash by crash')
+    parser.add_argument('--symbol-root', action='append', type=str, dest='symbol_roots', help='indicate directory to scan for symbol files by uuid')
+    parser.add_argument('--schedule', action='store', type=str, dest='schedule', choices=['files', 'affinity'], default='files',
+                        help='distribute crash log files across processes, or parse all files first and pin each image uuid to one process')
+    parser.add_argument('-v', '--verbose', action='store_true', dest='verbose_mode', help='run in verbose mode')
+    return parser.parse_args(argv)
+
+def _batch_main(args):
+    """
+    批量符号化crash日志
+    :param args:解析后的命令行参数
+    """
+    dsym_file = _dsym_symbol_file(args.dsym_file)
+    if dsym_file is None:
+        print('Error! The dSYM file is not valid.')
+        return 2
+    paths = symbolicate.collect_crash_logs(args.sources, args.pattern, args.manifest)
+    if len(paths) == 0:
+        print('Error! No crash log file found.')
+        return 2
+    symbol_store = symbolicate.SymbolStore(args.symbol_roots, args.cache_dir, scan=args.symbol_roots is not None)
+    summary = symbolicate.symbolicate_batch(paths, symbolicate.DsymFinder(dsym_file), args.output_dir, args.processes, args.workers,
+                                            args.cache_dir, args.backend, args.verbose_mode, stream=args.stream, symbol_store=symbol_store, schedule=args.schedule)
+    for crash_log in summary['failed']:
+        print('Error! cannot symbolicate "{crash_log}".'.format(crash_log=crash_log))
+    print('{files} files, {crashes} crashes, {frames} frames ({resolved} resolved) in {seconds:.2f}s: '
+          '{crashes_per_second:.1f} crashes/sec, {frames_per_second:.1f} frames/sec'.format(**summary))
+    return 2 if len(summary['failed']) > 0 else 0
+
+def _parse_serve_params(argv):
+    """
+    serve子命令参数解析
+    :return: Parser对象
+    """
+    cmd_usage = """
+    symbolicatedcrash serve [--socket {socket_path} | --host {host} --port {port}] [--cache-dir {cache_dir}] [--backend {atos,atos-pool,native}] [-j {workers}]
+                            [--negative-ttl {seconds}] [-v]
+
+    POST /symbolicate?dsym={dsym_file} with crash log as body, GET /health, GET /stats
+    """
+    parser = argparse.ArgumentParser(prog='Run symbolicate as a resident service.', usage=cmd_usage)
+    parser.add_argument('--socket', action='store', type=str, dest='socket_path', help='listen on unix socket instead of localhost http')
+    parser.add_argument('--host', action='store', type=str, dest='host', default='127.0.0.1', help='indicate http listen address')
+    parser.add_argument('--port', action='store', type=int, dest='port', default=8686, help='indicate http listen port')
+    parser.add_argument('--cache-dir', action='store', type=str, dest='cache_dir', default=symbolicate.default_cache_dir(), help='indicate directory to persist caches')
+    parser.add_argument('--backend', action='store', type=str, dest='backend', choices=['atos', 'atos-pool', 'native'], default='atos-pool', help='indicate symbol lookup backend')
+    parser.add_argument('-j', '--jobs', action='store', type=int, dest='workers', default=1, help='indicate number of concurrent workers in each request')
+    parser.add_argument('--negative-ttl', action='store', type=float, dest='negative_ttl', default=300, help='indicate seconds to skip images whose symbol file is missing or mismatched')
+    parser.add_argument('-v', '--verbose', action='store_true', dest='verbose_mode', help='run in verbose mode')
+    return parser.parse_args(argv)
+
+def _serve_main(args):
+    """
+    启动常驻的符号化服务
+    :param args:解析后的命令行参数
+    """
+    server = symbolicate.SymbolicateServer(args.cache_dir, args.backend, args.workers, host=args.host, port=args.port,
+                                           socket_path=args.socket_path, verbose_mode=args.verbose_mode, negative_ttl=args.negative_ttl)
+    print('listening on {address}'.format(address=server.address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+def _parse_warm_params(argv):
+    """
+    warm子命令参数解析
+    :return: Parser对象
+    """
+    cmd_usage = """
+    symbolicatedcrash warm [{root} ...] [--crash-log {crash_log} ...] [--cache-dir {cache_dir}] [-j {workers}] [--no-index] [-q]
+
+    scan symbol roots (iOS DeviceSupport by default), record uuid of every Mach-O file and build uuid cache and symbol index ahead of time,
+    only for images referenced by the crash logs if any, run again to resume an interrupted warm-up
+    """
+    parser = argparse.ArgumentParser(prog='Warm up symbol caches ahead of time.', usage=cmd_usage)
+    parser.add_argument('roots', nargs='*', action='store', type=str, help='directory of symbol files, such as iOS DeviceSupport/<version>/Symbols')
+    parser.add_argument('--crash-log', action='append', type=str, dest='crash_logs', help='only warm images referenced by this crash log, can be repeated')
+    parser.add_argument('--cache-dir', action='store', type=str, dest='cache_dir', default=symbolicate.default_cache_dir(), help='indicate directory to store caches')
+    parser.add_argument('-j', '--jobs', action='store', type=int, dest='workers', default=8, help='indicate number of threads reading symbol files and building indexes')
+    parser.add_argument('--no-index', action='store_false', dest='build_index', help='only record uuids, do not build symbol index')
+    parser.add_argument('-q', '--quiet', action='store_true', dest='quiet', help='do not print progress')
+    return parser.parse_args(argv)
+
+def _warm_main(args):
+    """
+    预热符号缓存
+    :param args:解析后的命令行参数
+    """
+    def progress(stage, done, total):
+        print('\r{stage}: {done}/{total}'.format(stage=stage, done=done, total=total), end='\n' if done == total else '', file=sys.stderr, flush=True)
+
+    summary = symbolicate.warm_symbols(args.roots, args.crash_logs, args.cache_dir, args.workers, args.build_index, None if args.quiet else progress)
+    print('{scanned} files scanned ({read} read), {uuids} uuids, {images} images warmed, {indexed} indexes built, {missing} images without symbol file'.format(**summary))
+    return 0
+
+_commands = {
+    'index': (_parse_index_params, _index_main),
+    'batch': (_parse_batch_params, _batch_main),
+    'serve': (_parse_serve_params, _serve_main),
+    'warm': (_parse_warm_params, _warm_main),
+}
+
+if len(sys.argv) > 1 and sys.argv[1] in _commands:
+    parse_func, main_func = _commands[sys.argv[1]]
+    sys.exit(main_func(parse_func(sys.argv[2:])))
 sys.exit(_main(_parse_params()))
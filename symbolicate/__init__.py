@@ -1,5 +1,26 @@
 from .symbolicate import symbolicate_crash
+from .symbolicate import symbolicate_crash_with_stats
+from .symbolicate import symbolicate_stream
+from .symbolicate import symbolicate_records
 from .symbolicate import version
 from .symbolicate import query_uuid
+from .symbolicate import warm_symbols
+from .symbolicate import default_cache_dir
+from .aio import symbolicate_crash_async
+from .aio import query_uuid_async
+from .cache import UUIDCache, NegativeCache, ResultCache
+from .store import SymbolStore
+from .symtab import NativeResolver
+from .index import SymbolIndexStore
+from .atos import AtosPool
+from .stats import SymbolicateStats
+from .frames import FrameTable
+from .images import ImageIndex
+from .sidecar import default_state_path
+from .batch import symbolicate_batch
+from .batch import collect_crash_logs
+from .batch import DsymFinder
+from .server import SymbolicateServer
+from .server import SymbolicateClient
 
 __author__ = 'jinzhao'
@@ -0,0 +1,134 @@
+import os
+import asyncio
+import inspect
+from .symbolicate import _SymbolicateContext, _parse_content, _set_verbose_mode, _read_log, _write_log, _compose_log, \
+    _group_stack_items, _image_steps, _query_local_uuid, _parse_dwarfdump_output, _parse_atos_output, _atos_chunks, \
+    _lookup_results, _save_results, _default_finder
+
+__author__ = 'jinzhao'
+
+
+async def symbolicate_crash_async(crash_log, finder_func, output_path=None, verbose_mode=False, uuid_cache=None, resolver=None, index_store=None, semaphore=None, symbol_store=None, negative_cache=None, result_cache=None):
+    """
+    符号化crash日志的协程版本，各image的解析并发进行
+    :param crash_log:crash日志文件路径
+    :param finder_func:查询app符号文件的处理函数，定义与symbolicate_crash相同，可以返回awaitable对象
+    :param output_path:符号化之后的crash文件路径，默认为None，表示直接输出到stdout
+    :param verbose_mode:是否开启调试模式
+    :param uuid_cache:UUIDCache对象
+    :param resolver:NativeResolver对象，默认为None，表示使用atos解析符号
+    :param index_store:SymbolIndexStore对象
+    :param semaphore:asyncio.Semaphore对象，限制同时运行的atos/dwarfdump进程数，多个任务可以共享，默认为None，表示最多8个
+    :param symbol_store:SymbolStore对象，finder_func为None时用于查找app符号文件
+    :param negative_cache:NegativeCache对象，默认为None，表示只在本次任务内跳过失败的image
+    :param result_cache:ResultCache对象，默认为None，表示只在本次任务内复用完全相同的crash的结果
+    :return 是否成功
+    """
+    _set_verbose_mode(verbose_mode)
+    loop = asyncio.get_running_loop()
+    context = _SymbolicateContext(uuid_cache, resolver, index_store, symbol_store=symbol_store, negative_cache=negative_cache, result_cache=result_cache)
+    finder_func = _default_finder(finder_func, symbol_store)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(8)
+    status, lines = await loop.run_in_executor(None, _read_log, crash_log)
+    if status is False:
+        return False
+    # app符号文件在解析完成后由finder_func异步查询
+    crash_list = await loop.run_in_executor(None, _parse_content, lines, lambda *args: None)
+    for crash_obj in crash_list:
+        image_item = crash_obj.binary_images.get(crash_obj.product_name)
+        if image_item is not None:
+            symbol_file = finder_func(crash_obj.product_name, crash_obj.identifier, crash_obj.version, image_item.code_type, image_item.uuid)
+            if inspect.isawaitable(symbol_file):
+                symbol_file = await symbol_file
+            image_item.symbol_file = symbol_file or ''
+    pending, duplicates = await loop.run_in_executor(None, _lookup_results, crash_list, context)
+    await asyncio.gather(*[_symbolicate_image_stack_items_async(image_item, stack_items, context, semaphore)
+                           for image_item, stack_items in _group_stack_items([crash_obj for fingerprint, crash_obj in pending])])
+    await loop.run_in_executor(None, _save_results, pending, duplicates, context)
+    newlines = await loop.run_in_executor(None, _compose_log, crash_list, lines)
+    await loop.run_in_executor(None, context.finish)
+    if output_path is None:
+        for line in newlines:
+            print(line.rstrip('\n'))
+        return True
+    return await loop.run_in_executor(None, _write_log, output_path, newlines)
+
+
+async def query_uuid_async(code_type, symbol_file, uuid_cache=None, semaphore=None):
+    """
+    符号文件uuid查询的协程版本
+    :param code_type: cpu架构版本
+    :param symbol_file: 符号文件路径
+    :param uuid_cache: UUIDCache对象，默认为None，表示不使用缓存
+    :param semaphore: asyncio.Semaphore对象，限制同时运行的dwarfdump进程数
+    :return uuid
+    """
+    status, output_uuid, output = await _query_uuid_async(code_type, symbol_file, _SymbolicateContext(uuid_cache), semaphore)
+    return output_uuid
+
+
+async def _run_command(args, semaphore=None):
+    """
+    :param args: 命令参数list
+    :return status:Int, output:String，与getstatusoutput相同
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(1)
+    async with semaphore:
+        try:
+            process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        except OSError as e:
+            return (127, str(e))
+        output, _ = await process.communicate()
+    output = output.decode('utf-8', 'replace')
+    if output.endswith('\n'):
+        output = output[:-1]
+    return (process.returncode, output)
+
+
+async def _query_uuid_async(code_type, symbol_file, context, semaphore=None):
+    """
+    :return status:Bool, uuid:String, output:String
+    """
+    # 缓存查询及读取Mach-O文件头在线程池中进行
+    result = await asyncio.get_running_loop().run_in_executor(None, _query_local_uuid, code_type, symbol_file, context)
+    if result is not None:
+        return result
+    status, output = await _run_command(['dwarfdump', '--uuid', '--arch', code_type, os.path.expanduser(symbol_file)], semaphore)
+    return _parse_dwarfdump_output(code_type, symbol_file, status, output, context)
+
+
+async def _run_atos_async(image_item, load_address, addresses, semaphore):
+    """
+    :return: dict of {address:String: symbol:String}
+    """
+    symbols = dict()
+    for chunk in _atos_chunks(addresses):
+        status, output = await _run_command(['atos', '-arch', image_item.code_type, '-o', os.path.expanduser(image_item.symbol_file), '-l', load_address] + chunk, semaphore)
+        symbols.update(_parse_atos_output(chunk, status, output))
+    return symbols
+
+
+async def _symbolicate_image_stack_items_async(image_item, stack_items, context, semaphore):
+    """
+    与_symbolicate_image_stack_items相同，外部命令以协程方式运行，符号表及索引的读取在线程池中进行
+    """
+    loop = asyncio.get_running_loop()
+    steps = _image_steps(image_item, stack_items, context)
+    result = None
+    while True:
+        try:
+            step, load_address, addresses = steps.send(result)
+        except StopIteration:
+            return
+        if step == 'index':
+            result = await loop.run_in_executor(None, context.index_store.symbolicate, image_item.uuid, image_item.code_type, image_item.name, load_address, addresses)
+        elif step == 'uuid':
+            result = await _query_uuid_async(image_item.code_type, image_item.symbol_file, context, semaphore)
+        elif step == 'build':
+            result = await loop.run_in_executor(None, context.index_store.build, image_item.symbol_file, image_item.code_type)
+        elif context.resolver is not None:
+            result = await loop.run_in_executor(None, context.resolver.symbolicate, image_item.symbol_file, image_item.code_type, image_item.name, load_address, addresses)
+        else:
+            result = await _run_atos_async(image_item, load_address, addresses, semaphore)
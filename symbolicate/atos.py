@@ -0,0 +1,197 @@
+import os
+import time
+import select
+import threading
+import subprocess
+from collections import OrderedDict
+
+__author__ = 'jinzhao'
+
+# 每次写入atos进程stdin的地址数上限
+_LOOKUP_BATCH = 1000
+
+
+class _AtosProcess(object):
+    """
+    常驻的atos进程，从stdin逐行读取地址，向stdout逐行输出符号
+    """
+    def __init__(self, symbol_file, code_type, load_address):
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.closed = False
+        self.__buffer = b''
+        # 不经过shell，需要自行展开系统库符号路径中的~
+        self.__process = subprocess.Popen(['atos', '-arch', code_type, '-o', os.path.expanduser(symbol_file), '-l', load_address],
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    @property
+    def alive(self):
+        return self.__process.poll() is None
+
+    def lookup(self, addresses, timeout):
+        """
+        :param addresses: 调用地址list
+        :param timeout: 等待每行输出的秒数
+        :return: 与addresses一一对应的符号list，进程异常或超时返回None
+        """
+        symbols = list()
+        # 分批写入并读取，每批的输入不超过管道缓冲区，避免atos写满stdout时双方互相等待
+        for start in range(0, len(addresses), _LOOKUP_BATCH):
+            batch = addresses[start:start + _LOOKUP_BATCH]
+            try:
+                self.__process.stdin.write(''.join(address + '\n' for address in batch).encode('utf-8'))
+                self.__process.stdin.flush()
+            except (OSError, ValueError):
+                return None
+            for _ in batch:
+                line = self.__readline(timeout)
+                if line is None:
+                    return None
+                symbols.append(line)
+        self.last_used = time.monotonic()
+        return symbols
+
+    def __readline(self, timeout):
+        stdout = self.__process.stdout
+        while b'\n' not in self.__buffer:
+            ready, _, _ = select.select([stdout], [], [], timeout)
+            if len(ready) == 0:
+                return None
+            data = os.read(stdout.fileno(), 65536)
+            if len(data) == 0:
+                return None
+            self.__buffer += data
+        line, self.__buffer = self.__buffer.split(b'\n', 1)
+        return line.decode('utf-8', 'replace').rstrip('\r')
+
+    def close(self):
+        self.closed = True
+        try:
+            self.__process.stdin.close()
+        except (OSError, ValueError):
+            pass
+        try:
+            self.__process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.__process.kill()
+            self.__process.wait()
+        self.__process.stdout.close()
+
+
+class AtosPool(object):
+    """
+    按(symbol_file, arch, load_address)复用的atos进程池，空闲超时或超过数量上限时关闭最久未使用的进程
+    """
+    _ACQUIRE_RETRIES = 3
+
+    def __init__(self, max_processes=8, idle_timeout=60.0, timeout=30.0):
+        """
+        :param max_processes: 同时保持的atos进程数上限
+        :param idle_timeout: 进程空闲超过该秒数后关闭
+        :param timeout: 等待atos输出的秒数，超时的进程会被关闭
+        """
+        self.max_processes = max_processes
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.spawned = 0
+        self.reused = 0
+        self.evicted = 0
+        self.__lock = threading.Lock()
+        self.__processes = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def symbolicate(self, symbol_file, code_type, load_address, addresses):
+        """
+        :param symbol_file: 符号文件路径
+        :param code_type: arch
+        :param load_address: 加载地址
+        :param addresses: 调用地址list
+        :return: dict of {address:String: symbol:String}，失败时返回空dict
+        """
+        if len(addresses) == 0:
+            return dict()
+        key = (symbol_file, code_type, load_address)
+        symbols = None
+        for _ in range(self._ACQUIRE_RETRIES):
+            process = self.__acquire(key)
+            if process is None:
+                return dict()
+            with process.lock:
+                # 取得进程后加锁前可能已被其他线程淘汰并关闭，此时重新获取
+                if process.closed is False:
+                    symbols = process.lookup(addresses, self.timeout)
+                    break
+        if symbols is None:
+            self.__discard(key, process)
+            return dict()
+        return dict(zip(addresses, symbols))
+
+    def prune(self):
+        """
+        关闭空闲超时或已退出的进程
+        :return: 关闭的进程数
+        """
+        with self.__lock:
+            expired = self.__expired()
+        for process in expired:
+            process.close()
+        return len(expired)
+
+    def stats(self):
+        with self.__lock:
+            return {'processes': len(self.__processes), 'spawned': self.spawned, 'reused': self.reused, 'evicted': self.evicted}
+
+    def close(self):
+        with self.__lock:
+            processes = list(self.__processes.values())
+            self.__processes.clear()
+        for process in processes:
+            process.close()
+
+    def __acquire(self, key):
+        closing = list()
+        with self.__lock:
+            closing.extend(self.__expired())
+            process = self.__processes.get(key)
+            if process is not None:
+                self.__processes.move_to_end(key)
+                self.reused += 1
+            else:
+                try:
+                    process = _AtosProcess(*key)
+                except OSError:
+                    process = None
+                if process is not None:
+                    self.spawned += 1
+                    self.__processes[key] = process
+                    while len(self.__processes) > max(self.max_processes, 1):
+                        closing.append(self.__processes.popitem(last=False)[1])
+                        self.evicted += 1
+        for item in closing:
+            # 被淘汰的进程可能仍在其他线程中使用，等待使用结束后再关闭
+            with item.lock:
+                item.close()
+        return process
+
+    def __expired(self):
+        now = time.monotonic()
+        expired = list()
+        for key, process in list(self.__processes.items()):
+            if process.alive is False or (self.idle_timeout is not None and now - process.last_used > self.idle_timeout):
+                if process.lock.locked() is False:
+                    del self.__processes[key]
+                    expired.append(process)
+                    self.evicted += 1
+        return expired
+
+    def __discard(self, key, process):
+        with self.__lock:
+            if self.__processes.get(key) is process:
+                del self.__processes[key]
+                self.evicted += 1
+        process.close()
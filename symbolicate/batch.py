@@ -0,0 +1,259 @@
+import os
+import glob
+import time
+import fnmatch
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .symbolicate import _SymbolicateContext, _symbolicate_log, _set_verbose_mode, _read_log, _write_log, _parse_content, _compose_log, \
+    _count_crash_list, _lookup_results, _save_results, _group_stack_items, _symbolicate_image_stack_items, StackItemInfo
+from .cache import UUIDCache, NegativeCache, ResultCache
+from .symtab import NativeResolver
+from .index import SymbolIndexStore
+from .atos import AtosPool
+
+__author__ = 'jinzhao'
+
+# 每个工作进程内共享的缓存，由_init_worker创建
+_worker_context = None
+
+
+class DsymFinder(object):
+    """
+    始终返回同一个符号文件的finder_func，可以传递给其他进程
+    """
+    def __init__(self, symbol_file):
+        self.symbol_file = symbol_file
+
+    def __call__(self, name, identifier, version, codetype, uuid):
+        return self.symbol_file
+
+
+def collect_crash_logs(sources, pattern='*.crash', manifest=None):
+    """
+    展开批量任务的输入
+    :param sources: 目录、glob表达式或文件路径的list，目录会递归查找符合pattern的文件
+    :param pattern: 目录中crash日志的文件名匹配模式
+    :param manifest: 每行一个文件路径的清单文件
+    :return: 去重后的文件路径list
+    """
+    paths = list()
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                paths.extend(os.path.join(root, name) for name in sorted(files) if fnmatch.fnmatch(name, pattern))
+        elif glob.has_magic(source):
+            paths.extend(sorted(glob.glob(source, recursive=True)))
+        else:
+            paths.append(source)
+    if manifest is not None:
+        with open(manifest, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if len(line) > 0 and line.startswith('#') is False:
+                    paths.append(line)
+    result = list()
+    seen = set()
+    for path in paths:
+        if path not in seen:
+            seen.add(path)
+            result.append(path)
+    return result
+
+
+def batch_output_path(crash_log, out_dir=None, suffix='.symbolicated'):
+    """
+    :return: 指定out_dir时输出到out_dir下的同名文件，否则输出到输入文件旁边，文件名添加suffix
+    """
+    if out_dir is not None:
+        return os.path.join(out_dir, os.path.basename(crash_log))
+    root, ext = os.path.splitext(crash_log)
+    return root + suffix + ext
+
+
+def _init_worker(cache_dir, backend, verbose_mode, max_processes, symbol_store=None, negative_ttl=None):
+    global _worker_context
+    _set_verbose_mode(verbose_mode)
+    _worker_context = _SymbolicateContext(UUIDCache(cache_dir),
+                                          NativeResolver() if backend == 'native' else None,
+                                          SymbolIndexStore(cache_dir) if cache_dir is not None and backend == 'native' else None,
+                                          max_processes,
+                                          AtosPool(max(max_processes or 1, 8)) if backend == 'atos-pool' else None,
+                                          symbol_store=symbol_store,
+                                          negative_cache=NegativeCache(negative_ttl),
+                                          result_cache=ResultCache(cache_dir=cache_dir))
+
+
+def _symbolicate_task(crash_log, finder_func, output_path, workers, stream):
+    start = time.time()
+    result = _symbolicate_log(crash_log, finder_func, output_path, _worker_context, workers, stream)
+    _worker_context.finish()
+    return (crash_log, output_path, result, time.time() - start)
+
+
+def symbolicate_batch(paths, finder_func, out_dir=None, processes=1, workers=1, cache_dir=None, backend='atos', verbose_mode=False, suffix='.symbolicated', stream=False, symbol_store=None, negative_ttl=None, schedule='files'):
+    """
+    批量符号化crash日志
+    :param paths: crash日志文件路径list，可以由collect_crash_logs得到
+    :param finder_func: 查询app符号文件的处理函数，processes大于1时必须可以pickle，如DsymFinder对象
+    :param out_dir: 输出目录，默认为None，表示输出到输入文件旁边
+    :param processes: 工作进程数，每个进程内的uuid缓存、符号表及符号索引在多个文件之间共享
+    :param workers: 每个文件内并发解析的线程数
+    :param cache_dir: 持久化缓存目录，默认为None
+    :param backend: 'atos'、'atos-pool'或'native'，'atos-pool'在每个进程内复用常驻的atos进程
+    :param verbose_mode: 是否开启调试模式
+    :param suffix: 输出到输入文件旁边时添加的文件名后缀
+    :param stream: 是否使用流式处理
+    :param symbol_store: SymbolStore对象，按uuid查找各image的符号文件，processes大于1时复制到每个进程
+    :param negative_ttl: 失败的image在每个进程内跳过的秒数，默认为None，表示整个批量任务内都跳过
+    :param schedule: 'files'表示按文件分配给工作进程；'affinity'表示先在主进程解析所有文件，再按(uuid, cpu架构)把image分配给固定的工作进程，
+                     每个符号文件只在一个进程内加载，finder_func不需要pickle，stream参数无效
+    :return: dict，包含文件数、失败的文件、crash数、栈帧数、耗时及吞吐量
+    """
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    tasks = [(path, finder_func, batch_output_path(path, out_dir, suffix), workers, stream) for path in paths]
+    initargs = (cache_dir, backend, verbose_mode, workers, symbol_store, negative_ttl)
+    start = time.time()
+    results = list()
+    if schedule == 'affinity':
+        results = _symbolicate_affinity(tasks, processes, workers, initargs)
+    elif processes is None or processes <= 1:
+        _init_worker(*initargs)
+        for task in tasks:
+            results.append(_symbolicate_task(*task))
+        if _worker_context.atos_pool is not None:
+            _worker_context.atos_pool.close()
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=initargs) as executor:
+            futures = [executor.submit(_symbolicate_task, *task) for task in tasks]
+            for future in futures:
+                results.append(future.result())
+    seconds = time.time() - start
+    summary = {'files': len(results), 'failed': list(), 'crashes': 0, 'frames': 0, 'resolved': 0, 'seconds': seconds}
+    for crash_log, output_path, result, elapsed in results:
+        if result is None:
+            summary['failed'].append(crash_log)
+            continue
+        summary['crashes'] += result[0]
+        summary['frames'] += result[1]
+        summary['resolved'] += result[2]
+    summary['crashes_per_second'] = summary['crashes'] / seconds if seconds > 0 else 0.0
+    summary['frames_per_second'] = summary['frames'] / seconds if seconds > 0 else 0.0
+    return summary
+
+
+def _symbolicate_shard(groups, workers):
+    """
+    在工作进程内解析分配给该进程的image
+    :param groups: list of (image_item, 去重后的(invoke_address, load_address) list)
+    :return: 与groups对应的符号list
+    """
+    items = [(image_item, [StackItemInfo(-1, image_item.name, invoke_address, load_address) for invoke_address, load_address in addresses])
+             for image_item, addresses in groups]
+    if workers is None or workers <= 1 or len(items) <= 1:
+        for image_item, stack_items in items:
+            _symbolicate_image_stack_items(image_item, stack_items, _worker_context)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(_symbolicate_image_stack_items, image_item, stack_items, _worker_context) for image_item, stack_items in items]:
+                future.result()
+    _worker_context.finish()
+    return [[stack_item.invoke_symbol for stack_item in stack_items] for image_item, stack_items in items]
+
+
+def _shard_groups(groups, shards):
+    """
+    按(uuid, cpu架构)把image分组分配到各个分片，同一个符号文件只出现在一个分片中，按栈帧数从多到少依次分配给当前栈帧数最少的分片
+    :param groups: list of (image_item, stack_items)
+    :param shards: 分片数
+    :return: 非空分片list，每个分片为groups的子list
+    """
+    keys = dict()
+    for group in groups:
+        image_item = group[0]
+        keys.setdefault((image_item.uuid or image_item.symbol_file, image_item.code_type), list()).append(group)
+    result = [list() for index in range(max(shards, 1))]
+    loads = [0] * len(result)
+    for key, key_groups in sorted(keys.items(), key=lambda item: (-sum(len(group[1]) for group in item[1]), item[0])):
+        index = loads.index(min(loads))
+        result[index].extend(key_groups)
+        loads[index] += sum(len(group[1]) for group in key_groups)
+    return [shard for shard in result if len(shard) > 0]
+
+
+def _shard_payload(shard):
+    """
+    :return: (发送给工作进程的数据, 每个分组中各栈帧对应的地址下标)
+    """
+    payload = list()
+    positions = list()
+    for image_item, stack_items in shard:
+        indexes = dict()
+        addresses = list()
+        group_positions = list()
+        for stack_item in stack_items:
+            key = (stack_item.invoke_address, stack_item.load_address)
+            index = indexes.get(key)
+            if index is None:
+                index = indexes[key] = len(addresses)
+                addresses.append(key)
+            group_positions.append(index)
+        payload.append((image_item, addresses))
+        positions.append(group_positions)
+    return (payload, positions)
+
+
+def _symbolicate_affinity(tasks, processes, workers, initargs):
+    """
+    先在主进程解析所有文件，按(uuid, cpu架构)分片后由固定的工作进程解析，最后在主进程写回各crash并生成输出
+    :return: list of (crash_log, output_path, result, elapsed)
+    """
+    cache_dir = initargs[0]
+    # 只用于查找及保存结果，解析器决定结果的指纹
+    context = _SymbolicateContext(resolver=NativeResolver() if initargs[1] == 'native' else None, result_cache=ResultCache(cache_dir=cache_dir))
+    files = list()
+    crash_list = list()
+    for crash_log, finder_func, output_path, file_workers, stream in tasks:
+        start = time.time()
+        status, lines = _read_log(crash_log)
+        file_crashes = _parse_content(lines, finder_func) if status is True else None
+        files.append((crash_log, output_path, file_crashes, time.time() - start))
+        crash_list.extend(file_crashes or list())
+    pending, duplicates = _lookup_results(crash_list, context)
+    shards = _shard_groups(_group_stack_items([crash_obj for fingerprint, crash_obj in pending]), processes or 1)
+    payloads = [_shard_payload(shard) for shard in shards]
+    if processes is None or processes <= 1:
+        _init_worker(*initargs)
+        symbols_list = [_symbolicate_shard(payload, workers) for payload, positions in payloads]
+        if _worker_context.atos_pool is not None:
+            _worker_context.atos_pool.close()
+    else:
+        # 每个分片使用单独的进程，保证同一个符号文件只在一个进程内加载
+        executors = [ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=initargs) for shard in shards]
+        try:
+            futures = [executor.submit(_symbolicate_shard, payload, workers) for executor, (payload, positions) in zip(executors, payloads)]
+            symbols_list = [future.result() for future in futures]
+        finally:
+            for executor in executors:
+                executor.shutdown()
+    for shard, (payload, positions), shard_symbols in zip(shards, payloads, symbols_list):
+        for (image_item, stack_items), group_positions, symbols in zip(shard, positions, shard_symbols):
+            for stack_item, index in zip(stack_items, group_positions):
+                stack_item.invoke_symbol = symbols[index]
+    _save_results(pending, duplicates, context)
+    results = list()
+    for crash_log, output_path, file_crashes, elapsed in files:
+        if file_crashes is None:
+            results.append((crash_log, output_path, None, elapsed))
+            continue
+        start = time.time()
+        # 解析后不保留日志内容，生成输出时重新读取，主进程内存只与crash结构相关
+        status, lines = _read_log(crash_log)
+        if status is False or _write_log(output_path, _compose_log(file_crashes, lines)) is False:
+            results.append((crash_log, output_path, None, elapsed + time.time() - start))
+            continue
+        counts = [0, 0, 0]
+        _count_crash_list(file_crashes, counts)
+        results.append((crash_log, output_path, tuple(counts), elapsed + time.time() - start))
+    return results
+
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+__author__ = 'jinzhao'
+
+
+def _resolve_path(path):
+    """
+    展开~并解析符号链接，得到符号文件的真实路径
+    """
+    return os.path.realpath(os.path.expanduser(path))
+
+
+class UUIDCache(object):
+    """
+    符号文件uuid缓存，以(真实路径, cpu架构, 文件大小, 修改时间)为键，
+    文件大小或修改时间变化后缓存自动失效。
+    指定cache_dir时缓存内容会持久化到该目录下，供之后的任务复用。
+    """
+    store_name = 'uuid_cache.json'
+
+    def __init__(self, cache_dir=None):
+        self.__cache_dir = cache_dir
+        self.__entries = dict()
+        self.__dirty = False
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir is not None:
+            self.__load()
+
+    @property
+    def cache_dir(self):
+        return self.__cache_dir
+
+    def __store_path(self):
+        return os.path.join(os.path.expanduser(self.__cache_dir), self.store_name)
+
+    def __load(self):
+        self.__entries = self.__read_store()
+
+    def __read_store(self):
+        entries = dict()
+        try:
+            with open(self.__store_path(), 'r') as file:
+                for path, code_type, size, mtime, uuid in json.load(file):
+                    entries[(path, code_type)] = (size, mtime, uuid)
+        except (IOError, ValueError, TypeError):
+            return dict()
+        return entries
+
+    def save(self):
+        """
+        将缓存写入cache_dir，未指定cache_dir或没有变化时不做任何事。
+        多个进程可能共享同一个cache_dir，写入前先合并文件中其他进程保存的记录，同一文件保留修改时间较新的记录
+        :return 是否成功
+        """
+        if self.__cache_dir is None or self.__dirty is False:
+            return True
+        store_path = self.__store_path()
+        stored = self.__read_store()
+        with self.__lock:
+            for key, entry in stored.items():
+                current = self.__entries.get(key)
+                if current is None or current[1] < entry[1]:
+                    self.__entries[key] = entry
+            entries = [[path, code_type, size, mtime, uuid] for (path, code_type), (size, mtime, uuid) in self.__entries.items()]
+        temp_path = '{path}.{pid}.{thread}.tmp'.format(path=store_path, pid=os.getpid(), thread=threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(store_path), exist_ok=True)
+            with open(temp_path, 'w') as file:
+                json.dump(entries, file)
+            os.replace(temp_path, store_path)
+        except (IOError, OSError):
+            return False
+        self.__dirty = False
+        return True
+
+    def get(self, symbol_file, code_type):
+        """
+        :param symbol_file: 符号文件路径
+        :param code_type: cpu架构版本
+        :return uuid，未命中时返回None
+        """
+        path = _resolve_path(symbol_file)
+        entry = self.__entries.get((path, code_type))
+        if entry is not None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                with self.__lock:
+                    self.hits += 1
+                return entry[2]
+        with self.__lock:
+            self.misses += 1
+        return None
+
+    def set(self, symbol_file, code_type, uuid):
+        """
+        :param symbol_file: 符号文件路径
+        :param code_type: cpu架构版本
+        :param uuid: 查询到的uuid
+        """
+        path = _resolve_path(symbol_file)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self.__lock:
+            self.__entries[(path, code_type)] = (stat.st_size, stat.st_mtime_ns, uuid)
+            self.__dirty = True
+
+    def stats(self):
+        """
+        :return 命中/未命中次数
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.__entries)}
+
+
+class NegativeCache(object):
+    """
+    无法解析的image缓存，以(符号文件, cpu架构, 期望的uuid)为键，记录失败原因。
+    符号文件不存在或uuid不一致的image在ttl内不再重复运行dwarfdump/atos，ttl为None时一直有效。
+    """
+    def __init__(self, ttl=None):
+        """
+        :param ttl: 失败记录的有效秒数，默认为None，表示在缓存对象的生命周期内一直有效
+        """
+        self.ttl = ttl
+        self.__entries = dict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, symbol_file, code_type, uuid):
+        """
+        :return 失败原因，没有记录或已过期时返回None
+        """
+        key = (symbol_file, code_type, uuid)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry['expires'] is not None and entry['expires'] <= time.monotonic():
+                del self.__entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry['skipped'] += 1
+            return entry['reason']
+
+    def add(self, symbol_file, code_type, uuid, reason, image=None):
+        """
+        :param reason: 失败原因
+        :param image: image名称，用于汇总输出
+        """
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.__lock:
+            self.__entries[(symbol_file, code_type, uuid)] = {'image': image, 'reason': reason, 'expires': expires, 'skipped': 0}
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def summary(self):
+        """
+        :return 未过期的失败image list，包含image名称、符号文件、cpu架构、uuid、原因及跳过的次数
+        """
+        now = time.monotonic()
+        with self.__lock:
+            return [{'image': entry['image'], 'symbol_file': symbol_file, 'code_type': code_type, 'uuid': uuid,
+                     'reason': entry['reason'], 'skipped': entry['skipped']}
+                    for (symbol_file, code_type, uuid), entry in self.__entries.items()
+                    if entry['expires'] is None or entry['expires'] > now]
+
+    def stats(self):
+        """
+        :return 命中/未命中次数
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.__entries)}
+
+
+class ResultCache(object):
+    """
+    符号化结果缓存，以crash指纹为键保存各栈帧的invoke_symbol list，只保存所有栈帧都已解析的结果。
+    内存中按LRU淘汰，指定cache_dir时每个结果另外保存为一个文件，内存未命中时从文件读取，
+    文件数超过max_disk_entries时按最近使用时间淘汰。
+    """
+    store_name = 'results'
+    # 每写入这么多文件检查一次目录中的文件数
+    prune_interval = 1000
+
+    def __init__(self, max_entries=10000, cache_dir=None, max_disk_entries=100000):
+        """
+        :param max_entries: 内存中保存的结果数上限
+        :param cache_dir: 持久化结果的目录，默认为None，表示只保存在内存中
+        :param max_disk_entries: cache_dir中保存的结果文件数上限
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __store_path(self, fingerprint):
+        return os.path.join(os.path.expanduser(self.cache_dir), self.store_name, fingerprint[:2], fingerprint + '.json')
+
+    def __remember(self, fingerprint, symbols):
+        with self.__lock:
+            self.__entries[fingerprint] = symbols
+            self.__entries.move_to_end(fingerprint)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def get(self, fingerprint):
+        """
+        :param fingerprint: crash指纹
+        :return 栈帧符号list，未命中时返回None
+        """
+        with self.__lock:
+            symbols = self.__entries.get(fingerprint)
+            if symbols is not None:
+                self.__entries.move_to_end(fingerprint)
+                self.hits += 1
+                return symbols
+        if self.cache_dir is not None:
+            store_path = self.__store_path(fingerprint)
+            try:
+                with open(store_path, 'r') as file:
+                    symbols = json.load(file)
+            except (IOError, ValueError):
+                symbols = None
+            if isinstance(symbols, list):
+                try:
+                    # 更新修改时间，用于按最近使用时间淘汰
+                    os.utime(store_path)
+                except OSError:
+                    pass
+                self.__remember(fingerprint, symbols)
+                with self.__lock:
+                    self.hits += 1
+                return symbols
+        with self.__lock:
+            self.misses += 1
+        return None
+
+    def set(self, fingerprint, symbols, complete=True):
+        """
+        :param fingerprint: crash指纹
+        :param symbols: 栈帧符号list
+        :param complete: 是否所有栈帧都已解析，存在未解析栈帧的结果不保存，符号文件补齐后可以重新解析
+        :return 是否成功
+        """
+        if complete is False:
+            with self.__lock:
+                self.__entries.pop(fingerprint, None)
+            return True
+        self.__remember(fingerprint, symbols)
+        if self.cache_dir is None:
+            return True
+        store_path = self.__store_path(fingerprint)
+        # 多个进程可能同时写入同一个结果
+        temp_path = '{path}.{pid}.{thread}.tmp'.format(path=store_path, pid=os.getpid(), thread=threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(store_path), exist_ok=True)
+            with open(temp_path, 'w') as file:
+                json.dump(symbols, file)
+            os.replace(temp_path, store_path)
+        except (IOError, OSError):
+            return False
+        with self.__lock:
+            self.__writes += 1
+            # 每个进程第一次写入时也检查一次，避免大量短任务累积文件
+            prune = self.__writes % self.prune_interval == 1 or self.prune_interval == 1
+        if prune is True:
+            self.prune()
+        return True
+
+    def prune(self):
+        """
+        cache_dir中的结果文件数超过max_disk_entries时删除最久未使用的文件
+        :return: 删除的文件数
+        """
+        if self.cache_dir is None:
+            return 0
+        files = list()
+        for directory, dirs, names in os.walk(os.path.join(os.path.expanduser(self.cache_dir), self.store_name)):
+            for name in names:
+                if name.endswith('.json') is False:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    files.append((os.stat(path).st_mtime_ns, path))
+                except OSError:
+                    continue
+        if len(files) <= self.max_disk_entries:
+            return 0
+        files.sort()
+        removed = 0
+        for mtime, path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+        return removed
+
+    def stats(self):
+        """
+        :return 命中/未命中次数
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.__entries)}
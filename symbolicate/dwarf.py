@@ -0,0 +1,713 @@
+import os
+import bisect
+import threading
+import struct
+from array import array
+
+__author__ = 'jinzhao'
+
+DW_TAG_compile_unit = 0x11
+DW_TAG_subprogram = 0x2e
+DW_TAG_skeleton_unit = 0x4a
+
+DW_AT_name = 0x03
+DW_AT_stmt_list = 0x10
+DW_AT_low_pc = 0x11
+DW_AT_high_pc = 0x12
+DW_AT_abstract_origin = 0x31
+DW_AT_specification = 0x47
+DW_AT_ranges = 0x55
+DW_AT_str_offsets_base = 0x72
+DW_AT_addr_base = 0x73
+DW_AT_rnglists_base = 0x74
+
+DW_FORM_addr = 0x01
+DW_FORM_block2 = 0x03
+DW_FORM_block4 = 0x04
+DW_FORM_data2 = 0x05
+DW_FORM_data4 = 0x06
+DW_FORM_data8 = 0x07
+DW_FORM_string = 0x08
+DW_FORM_block = 0x09
+DW_FORM_block1 = 0x0a
+DW_FORM_data1 = 0x0b
+DW_FORM_flag = 0x0c
+DW_FORM_sdata = 0x0d
+DW_FORM_strp = 0x0e
+DW_FORM_udata = 0x0f
+DW_FORM_ref_addr = 0x10
+DW_FORM_ref1 = 0x11
+DW_FORM_ref2 = 0x12
+DW_FORM_ref4 = 0x13
+DW_FORM_ref8 = 0x14
+DW_FORM_ref_udata = 0x15
+DW_FORM_indirect = 0x16
+DW_FORM_sec_offset = 0x17
+DW_FORM_exprloc = 0x18
+DW_FORM_flag_present = 0x19
+DW_FORM_strx = 0x1a
+DW_FORM_addrx = 0x1b
+DW_FORM_ref_sup4 = 0x1c
+DW_FORM_strp_sup = 0x1d
+DW_FORM_data16 = 0x1e
+DW_FORM_line_strp = 0x1f
+DW_FORM_ref_sig8 = 0x20
+DW_FORM_implicit_const = 0x21
+DW_FORM_loclistx = 0x22
+DW_FORM_rnglistx = 0x23
+DW_FORM_ref_sup8 = 0x24
+DW_FORM_strx1 = 0x25
+DW_FORM_strx2 = 0x26
+DW_FORM_strx3 = 0x27
+DW_FORM_strx4 = 0x28
+DW_FORM_addrx1 = 0x29
+DW_FORM_addrx2 = 0x2a
+DW_FORM_addrx3 = 0x2b
+DW_FORM_addrx4 = 0x2c
+
+DW_LNS_copy = 1
+DW_LNS_advance_pc = 2
+DW_LNS_advance_line = 3
+DW_LNS_set_file = 4
+DW_LNS_const_add_pc = 8
+DW_LNS_fixed_advance_pc = 9
+DW_LNE_end_sequence = 1
+DW_LNE_set_address = 2
+DW_LNE_define_file = 3
+
+DW_LNCT_path = 1
+DW_LNCT_directory_index = 2
+
+DW_RLE_end_of_list = 0
+DW_RLE_base_addressx = 1
+DW_RLE_startx_endx = 2
+DW_RLE_startx_length = 3
+DW_RLE_offset_pair = 4
+DW_RLE_base_address = 5
+DW_RLE_start_end = 6
+DW_RLE_start_length = 7
+
+_STR_FORMS = (DW_FORM_string, DW_FORM_strp, DW_FORM_line_strp, DW_FORM_strx, DW_FORM_strx1, DW_FORM_strx2, DW_FORM_strx3, DW_FORM_strx4)
+_ADDRX_FORMS = (DW_FORM_addrx, DW_FORM_addrx1, DW_FORM_addrx2, DW_FORM_addrx3, DW_FORM_addrx4)
+_REF_FORMS = (DW_FORM_ref1, DW_FORM_ref2, DW_FORM_ref4, DW_FORM_ref8, DW_FORM_ref_udata)
+
+
+class DwarfError(Exception):
+    """
+    DWARF数据格式错误
+    """
+    pass
+
+
+class _Reader(object):
+    """
+    在section数据上顺序读取DWARF基本类型
+    """
+    def __init__(self, data, start, end, endian='<'):
+        self.data = data
+        self.pos = start
+        self.end = end
+        self.endian = endian
+
+    def unpack(self, fmt):
+        size = struct.calcsize(fmt)
+        if self.pos + size > self.end:
+            raise DwarfError('unexpected end of section')
+        value = struct.unpack_from(self.endian + fmt, self.data, self.pos)
+        self.pos += size
+        return value
+
+    def u8(self):
+        if self.pos >= self.end:
+            raise DwarfError('unexpected end of section')
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def u16(self):
+        return self.unpack('H')[0]
+
+    def u24(self):
+        low, middle, high = self.unpack('BBB')
+        if self.endian == '<':
+            return low | (middle << 8) | (high << 16)
+        return (low << 16) | (middle << 8) | high
+
+    def u32(self):
+        return self.unpack('I')[0]
+
+    def u64(self):
+        return self.unpack('Q')[0]
+
+    def s8(self):
+        return self.unpack('b')[0]
+
+    def uint(self, size):
+        if size == 1:
+            return self.u8()
+        if size == 2:
+            return self.u16()
+        if size == 4:
+            return self.u32()
+        if size == 8:
+            return self.u64()
+        raise DwarfError('unsupported size {}'.format(size))
+
+    def uleb(self):
+        result = 0
+        shift = 0
+        while True:
+            byte = self.u8()
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte & 0x80 == 0:
+                return result
+
+    def sleb(self):
+        result = 0
+        shift = 0
+        while True:
+            byte = self.u8()
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte & 0x80 == 0:
+                if byte & 0x40:
+                    result -= 1 << shift
+                return result
+
+    def cstr(self):
+        end = self.data.find(b'\0', self.pos, self.end)
+        if end < 0:
+            raise DwarfError('unterminated string')
+        value = bytes(self.data[self.pos:end]).decode('utf-8', 'replace')
+        self.pos = end + 1
+        return value
+
+    def initial_length(self):
+        """
+        :return: (length, offset_size)
+        """
+        length = self.u32()
+        if length == 0xffffffff:
+            return (self.u64(), 8)
+        return (length, 4)
+
+    def skip(self, size):
+        self.pos += size
+
+
+class _Section(object):
+    """
+    section在文件数据中的位置
+    """
+    def __init__(self, data, start, size):
+        self.data = data
+        self.start = start
+        self.end = start + size
+
+    def reader(self, offset=0, endian='<'):
+        return _Reader(self.data, self.start + offset, self.end, endian)
+
+
+class _Unit(object):
+    """
+    debug_info中的编译单元，其中的函数与行号表在第一次查询时才解析
+    """
+    def __init__(self, offset, end, version, address_size, offset_size, abbrev_offset, die_offset):
+        self.offset = offset
+        self.end = end
+        self.version = version
+        self.address_size = address_size
+        self.offset_size = offset_size
+        self.abbrev_offset = abbrev_offset
+        self.die_offset = die_offset
+        self.name = ''
+        self.comp_dir = ''
+        self.low_pc = 0
+        self.ranges = list()
+        self.stmt_list = None
+        self.str_offsets_base = 8
+        self.addr_base = 8
+        self.rnglists_base = 12
+        self.functions = None
+        self.lines = None
+
+
+class DwarfInfo(object):
+    """
+    从dSYM中读取DWARF信息，只在需要时解码覆盖查询地址的编译单元的
+    __debug_line和__debug_info中的subprogram
+    """
+    def __init__(self, macho_slice):
+        self.__endian = macho_slice.endian
+        self.__sections = dict()
+        for section in macho_slice.sections():
+            if section.segment_name == '__DWARF':
+                self.__sections[section.name] = _Section(macho_slice.data, macho_slice.offset + section.offset, section.size)
+        self.__abbrevs = dict()
+        self.__lock = threading.RLock()
+        self.__units = None
+        self.__unit_starts = None
+        self.__unit_ranges = None
+
+    @property
+    def available(self):
+        return '__debug_info' in self.__sections and '__debug_abbrev' in self.__sections
+
+    def __section(self, name):
+        section = self.__sections.get(name)
+        if section is None:
+            raise DwarfError('missing section {}'.format(name))
+        return section
+
+    def __abbrev_table(self, offset):
+        table = self.__abbrevs.get(offset)
+        if table is not None:
+            return table
+        table = dict()
+        reader = self.__section('__debug_abbrev').reader(offset, self.__endian)
+        while True:
+            code = reader.uleb()
+            if code == 0:
+                break
+            tag = reader.uleb()
+            has_children = reader.u8() != 0
+            specs = list()
+            while True:
+                attr = reader.uleb()
+                form = reader.uleb()
+                if attr == 0 and form == 0:
+                    break
+                implicit = reader.sleb() if form == DW_FORM_implicit_const else None
+                specs.append((attr, form, implicit))
+            table[code] = (tag, has_children, specs)
+        self.__abbrevs[offset] = table
+        return table
+
+    def __read_form(self, reader, unit, form, implicit):
+        """
+        :return 属性的原始值，字符串形式的属性返回(form, value)交由__string解析
+        """
+        if form == DW_FORM_addr:
+            return reader.uint(unit.address_size)
+        if form in (DW_FORM_data1, DW_FORM_ref1, DW_FORM_flag, DW_FORM_strx1, DW_FORM_addrx1):
+            return reader.u8()
+        if form in (DW_FORM_data2, DW_FORM_ref2, DW_FORM_strx2, DW_FORM_addrx2):
+            return reader.u16()
+        if form in (DW_FORM_strx3, DW_FORM_addrx3):
+            return reader.u24()
+        if form in (DW_FORM_data4, DW_FORM_ref4, DW_FORM_ref_sup4, DW_FORM_strx4, DW_FORM_addrx4):
+            return reader.u32()
+        if form in (DW_FORM_data8, DW_FORM_ref8, DW_FORM_ref_sig8, DW_FORM_ref_sup8):
+            return reader.u64()
+        if form == DW_FORM_data16:
+            reader.skip(16)
+            return None
+        if form == DW_FORM_sdata:
+            return reader.sleb()
+        if form in (DW_FORM_udata, DW_FORM_ref_udata, DW_FORM_strx, DW_FORM_addrx, DW_FORM_loclistx, DW_FORM_rnglistx):
+            return reader.uleb()
+        if form == DW_FORM_string:
+            return reader.cstr()
+        if form in (DW_FORM_strp, DW_FORM_line_strp, DW_FORM_sec_offset, DW_FORM_strp_sup):
+            return reader.uint(unit.offset_size)
+        if form == DW_FORM_ref_addr:
+            return reader.uint(unit.offset_size if unit.version >= 3 else unit.address_size)
+        if form == DW_FORM_flag_present:
+            return True
+        if form == DW_FORM_implicit_const:
+            return implicit
+        if form in (DW_FORM_block, DW_FORM_exprloc):
+            reader.skip(reader.uleb())
+            return None
+        if form == DW_FORM_block1:
+            reader.skip(reader.u8())
+            return None
+        if form == DW_FORM_block2:
+            reader.skip(reader.u16())
+            return None
+        if form == DW_FORM_block4:
+            reader.skip(reader.u32())
+            return None
+        if form == DW_FORM_indirect:
+            return self.__read_form(reader, unit, reader.uleb(), implicit)
+        raise DwarfError('unsupported form 0x{:x}'.format(form))
+
+    def __read_die(self, reader, unit, table):
+        """
+        :return: (offset, tag, has_children, attrs:dict of {attr: (form, value)})，遇到null entry时tag为None
+        """
+        offset = reader.pos
+        code = reader.uleb()
+        if code == 0:
+            return (offset, None, False, None)
+        abbrev = table.get(code)
+        if abbrev is None:
+            raise DwarfError('unknown abbrev code {}'.format(code))
+        tag, has_children, specs = abbrev
+        attrs = dict()
+        for attr, form, implicit in specs:
+            if form == DW_FORM_indirect:
+                form = reader.uleb()
+            attrs[attr] = (form, self.__read_form(reader, unit, form, implicit))
+        return (offset, tag, has_children, attrs)
+
+    def __string(self, unit, form_value):
+        form, value = form_value
+        if form == DW_FORM_string:
+            return value
+        if form == DW_FORM_strp:
+            return self.__section('__debug_str').reader(value).cstr()
+        if form == DW_FORM_line_strp:
+            return self.__section('__debug_line_str').reader(value).cstr()
+        if form in _STR_FORMS:
+            offsets = self.__section('__debug_str_offs') if '__debug_str_offs' in self.__sections else self.__section('__debug_str_offsets')
+            string_offset = offsets.reader(unit.str_offsets_base + value * unit.offset_size, self.__endian).uint(unit.offset_size)
+            return self.__section('__debug_str').reader(string_offset).cstr()
+        return None
+
+    def __address(self, unit, form_value):
+        form, value = form_value
+        if form in _ADDRX_FORMS:
+            return self.__section('__debug_addr').reader(unit.addr_base + value * unit.address_size, self.__endian).uint(unit.address_size)
+        return value
+
+    def __pc_ranges(self, unit, attrs):
+        """
+        :return: list of (low, high)
+        """
+        if DW_AT_low_pc in attrs and DW_AT_high_pc in attrs:
+            low = self.__address(unit, attrs[DW_AT_low_pc])
+            form, high = attrs[DW_AT_high_pc]
+            if form == DW_FORM_addr or form in _ADDRX_FORMS:
+                high = self.__address(unit, attrs[DW_AT_high_pc])
+            else:
+                high = low + high
+            return [(low, high)]
+        if DW_AT_ranges in attrs:
+            form, offset = attrs[DW_AT_ranges]
+            if unit.version >= 5:
+                return self.__rnglists(unit, form, offset)
+            return self.__debug_ranges(unit, offset)
+        return list()
+
+    def __debug_ranges(self, unit, offset):
+        ranges = list()
+        reader = self.__section('__debug_ranges').reader(offset, self.__endian)
+        base = unit.low_pc
+        max_address = (1 << (unit.address_size * 8)) - 1
+        while True:
+            begin = reader.uint(unit.address_size)
+            end = reader.uint(unit.address_size)
+            if begin == 0 and end == 0:
+                break
+            if begin == max_address:
+                base = end
+                continue
+            ranges.append((base + begin, base + end))
+        return ranges
+
+    def __rnglists(self, unit, form, offset):
+        if form == DW_FORM_rnglistx:
+            offset = unit.rnglists_base + self.__section('__debug_rnglists').reader(unit.rnglists_base + offset * unit.offset_size, self.__endian).uint(unit.offset_size)
+        ranges = list()
+        reader = self.__section('__debug_rnglists').reader(offset, self.__endian)
+        base = unit.low_pc
+        addrx = lambda index: self.__address(unit, (DW_FORM_addrx, index))
+        while True:
+            kind = reader.u8()
+            if kind == DW_RLE_end_of_list:
+                break
+            if kind == DW_RLE_base_addressx:
+                base = addrx(reader.uleb())
+            elif kind == DW_RLE_startx_endx:
+                ranges.append((addrx(reader.uleb()), addrx(reader.uleb())))
+            elif kind == DW_RLE_startx_length:
+                start = addrx(reader.uleb())
+                ranges.append((start, start + reader.uleb()))
+            elif kind == DW_RLE_offset_pair:
+                start = reader.uleb()
+                ranges.append((base + start, base + reader.uleb()))
+            elif kind == DW_RLE_base_address:
+                base = reader.uint(unit.address_size)
+            elif kind == DW_RLE_start_end:
+                ranges.append((reader.uint(unit.address_size), reader.uint(unit.address_size)))
+            elif kind == DW_RLE_start_length:
+                start = reader.uint(unit.address_size)
+                ranges.append((start, start + reader.uleb()))
+            else:
+                raise DwarfError('unsupported range list entry {}'.format(kind))
+        return ranges
+
+    def __load_units(self):
+        """
+        只读取每个编译单元的头部及根DIE，建立地址区间到编译单元的索引
+        """
+        units = list()
+        ranges = list()
+        section = self.__section('__debug_info')
+        offset = 0
+        while section.start + offset < section.end:
+            reader = section.reader(offset, self.__endian)
+            length, offset_size = reader.initial_length()
+            end = reader.pos - section.start + length
+            version = reader.u16()
+            if version >= 5:
+                unit_type = reader.u8()
+                address_size = reader.u8()
+                abbrev_offset = reader.uint(offset_size)
+                if unit_type in (4, 5):
+                    # skeleton/split_compile带有dwo_id
+                    reader.skip(8)
+                elif unit_type in (2, 6):
+                    # type unit带有type_signature及type_offset
+                    reader.skip(8 + offset_size)
+            else:
+                abbrev_offset = reader.uint(offset_size)
+                address_size = reader.u8()
+            unit = _Unit(offset, end, version, address_size, offset_size, abbrev_offset, reader.pos - section.start)
+            die_offset, tag, has_children, attrs = self.__read_die(reader, unit, self.__abbrev_table(abbrev_offset))
+            if tag in (DW_TAG_compile_unit, DW_TAG_skeleton_unit):
+                if DW_AT_str_offsets_base in attrs:
+                    unit.str_offsets_base = attrs[DW_AT_str_offsets_base][1]
+                if DW_AT_addr_base in attrs:
+                    unit.addr_base = attrs[DW_AT_addr_base][1]
+                if DW_AT_rnglists_base in attrs:
+                    unit.rnglists_base = attrs[DW_AT_rnglists_base][1]
+                if DW_AT_low_pc in attrs:
+                    unit.low_pc = self.__address(unit, attrs[DW_AT_low_pc])
+                if DW_AT_name in attrs:
+                    unit.name = self.__string(unit, attrs[DW_AT_name])
+                if DW_AT_stmt_list in attrs:
+                    unit.stmt_list = attrs[DW_AT_stmt_list][1]
+                unit.ranges = self.__pc_ranges(unit, attrs)
+                for low, high in unit.ranges:
+                    if high > low:
+                        ranges.append((low, high, len(units)))
+            units.append(unit)
+            offset = end
+        ranges.sort()
+        self.__units = units
+        self.__unit_starts = array('Q', [item[0] for item in ranges])
+        self.__unit_ranges = ranges
+
+    def __unit_for_address(self, address):
+        if self.__units is None:
+            self.__load_units()
+        index = bisect.bisect_right(self.__unit_starts, address) - 1
+        # 编译单元的区间一般互不重叠，少数嵌套的情况向前查找有限个
+        for index in range(index, max(index - 16, -1), -1):
+            low, high, unit_index = self.__unit_ranges[index]
+            if low <= address < high:
+                return self.__units[unit_index]
+        return None
+
+    def __load_functions(self, unit):
+        """
+        解析编译单元中的所有DIE，收集subprogram的地址区间及名称
+        """
+        table = self.__abbrev_table(unit.abbrev_offset)
+        section = self.__section('__debug_info')
+        reader = section.reader(unit.die_offset, self.__endian)
+        end = section.start + unit.end
+        names = dict()
+        references = dict()
+        subprograms = list()
+        while reader.pos < end:
+            die_offset, tag, has_children, attrs = self.__read_die(reader, unit, table)
+            if tag is None:
+                continue
+            die_offset -= section.start
+            if DW_AT_name in attrs:
+                names[die_offset] = self.__string(unit, attrs[DW_AT_name])
+            for attr in (DW_AT_specification, DW_AT_abstract_origin):
+                if attr in attrs:
+                    form, value = attrs[attr]
+                    references[die_offset] = value + unit.offset if form in _REF_FORMS else value
+                    break
+            if tag == DW_TAG_subprogram:
+                for low, high in self.__pc_ranges(unit, attrs):
+                    if high > low:
+                        subprograms.append((low, high, die_offset))
+
+        def resolve_name(die_offset):
+            for index in range(8):
+                if die_offset in names:
+                    return names[die_offset]
+                die_offset = references.get(die_offset)
+                if die_offset is None:
+                    break
+            return None
+
+        subprograms.sort()
+        unit.functions = ([low for low, high, die_offset in subprograms],
+                          [(high, resolve_name(die_offset)) for low, high, die_offset in subprograms])
+
+    def __load_lines(self, unit):
+        """
+        执行编译单元的行号程序，得到按地址排序的(address, file, line)表
+        """
+        rows = list()
+        if unit.stmt_list is not None and '__debug_line' in self.__sections:
+            rows = self.__line_program(unit, unit.stmt_list)
+        # 同一地址上end_sequence行排在下一个序列的第一行之前，查找时总是落在有效的行上
+        rows.sort(key=lambda row: (row[0], row[1] is not None))
+        unit.lines = (array('Q', [row[0] for row in rows]), [row[1:] for row in rows])
+
+    def __line_program(self, unit, offset):
+        section = self.__section('__debug_line')
+        reader = section.reader(offset, self.__endian)
+        length, offset_size = reader.initial_length()
+        end = reader.pos + length
+        version = reader.u16()
+        address_size = unit.address_size
+        if version >= 5:
+            address_size = reader.u8()
+            reader.u8()
+        header_length = reader.uint(offset_size)
+        program_start = reader.pos + header_length
+        min_inst_length = reader.u8()
+        if version >= 4:
+            reader.u8()
+        reader.u8()
+        line_base = reader.s8()
+        line_range = reader.u8()
+        opcode_base = reader.u8()
+        opcode_lengths = [reader.u8() for index in range(opcode_base - 1)]
+        line_unit = _Unit(unit.offset, unit.end, version, address_size, offset_size, 0, 0)
+        line_unit.str_offsets_base = unit.str_offsets_base
+        files = list()
+        if version >= 5:
+            def read_entries():
+                formats = [(reader.uleb(), reader.uleb()) for index in range(reader.u8())]
+                entries = list()
+                for index in range(reader.uleb()):
+                    entry = dict()
+                    for content_type, form in formats:
+                        value = self.__read_form(reader, line_unit, form, None)
+                        if form in _STR_FORMS:
+                            value = self.__string(line_unit, (form, value))
+                        entry[content_type] = value
+                    entries.append(entry)
+                return entries
+            read_entries()
+            files = [entry.get(DW_LNCT_path, '') for entry in read_entries()]
+        else:
+            while reader.cstr() != '':
+                pass
+            # 文件编号从1开始
+            files.append('')
+            while True:
+                name = reader.cstr()
+                if name == '':
+                    break
+                reader.uleb()
+                reader.uleb()
+                reader.uleb()
+                files.append(name)
+        reader.pos = program_start
+
+        rows = list()
+        address = 0
+        file_index = 1
+        line = 1
+        def emit(end_sequence=False):
+            if end_sequence:
+                rows.append((address, None, 0))
+            else:
+                rows.append((address, files[file_index] if 0 <= file_index < len(files) else '', line))
+        while reader.pos < end:
+            opcode = reader.u8()
+            if opcode >= opcode_base:
+                adjusted = opcode - opcode_base
+                address += (adjusted // line_range) * min_inst_length
+                line += line_base + adjusted % line_range
+                emit()
+            elif opcode == 0:
+                size = reader.uleb()
+                extended_start = reader.pos
+                extended = reader.u8()
+                if extended == DW_LNE_end_sequence:
+                    emit(True)
+                    address = 0
+                    file_index = 1
+                    line = 1
+                elif extended == DW_LNE_set_address:
+                    address = reader.uint(size - 1)
+                elif extended == DW_LNE_define_file:
+                    files.append(reader.cstr())
+                reader.pos = extended_start + size
+            elif opcode == DW_LNS_copy:
+                emit()
+            elif opcode == DW_LNS_advance_pc:
+                address += reader.uleb() * min_inst_length
+            elif opcode == DW_LNS_advance_line:
+                line += reader.sleb()
+            elif opcode == DW_LNS_set_file:
+                file_index = reader.uleb()
+            elif opcode == DW_LNS_const_add_pc:
+                address += ((255 - opcode_base) // line_range) * min_inst_length
+            elif opcode == DW_LNS_fixed_advance_pc:
+                address += reader.u16()
+            else:
+                for index in range(opcode_lengths[opcode - 1]):
+                    reader.uleb()
+        return rows
+
+    def __prepare_unit(self, unit):
+        if unit.functions is None:
+            self.__load_functions(unit)
+        if unit.lines is None:
+            self.__load_lines(unit)
+
+    def __function(self, functions, address):
+        starts, entries = functions
+        index = bisect.bisect_right(starts, address) - 1
+        if index >= 0 and address < entries[index][0]:
+            return entries[index][1]
+        return None
+
+    def lookup(self, address):
+        """
+        :param address: 符号文件中的虚拟地址
+        :return: (function:String, file:String, line:Int)，地址不在任何编译单元内时返回None，
+                 函数名或行号未知时对应项为None
+        """
+        with self.__lock:
+            unit = self.__unit_for_address(address)
+            if unit is None:
+                return None
+            self.__prepare_unit(unit)
+            functions = unit.functions
+            addresses, rows = unit.lines
+        file_name = None
+        line = None
+        index = bisect.bisect_right(addresses, address) - 1
+        if index >= 0 and rows[index][0] is not None:
+            file_name = os.path.basename(rows[index][0])
+            line = rows[index][1]
+        return (self.__function(functions, address), file_name, line)
+
+    def line_ranges(self):
+        """
+        遍历所有编译单元的行号表，用于预先建立索引
+        :return: generator of (low:Int, high:Int, function:String, file:String, line:Int)
+        """
+        with self.__lock:
+            if self.__units is None:
+                self.__load_units()
+            units = self.__units
+        for unit in units:
+            with self.__lock:
+                self.__prepare_unit(unit)
+                addresses, rows = unit.lines
+                functions = unit.functions
+            for index in range(len(rows) - 1):
+                file_name, line = rows[index]
+                low = addresses[index]
+                high = addresses[index + 1]
+                if file_name is None or high <= low:
+                    continue
+                function = self.__function(functions, low)
+                if function is not None:
+                    yield (low, high, function, os.path.basename(file_name), line)
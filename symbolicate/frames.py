@@ -0,0 +1,75 @@
+from array import array
+
+__author__ = 'jinzhao'
+
+
+class FrameTable(object):
+    """
+    栈帧的列式存储，每一列为一个array，适合对大量栈帧做批量处理。
+    第i个栈帧的数据为各列的第i个元素，image_id为images中的下标，栈帧所在的image不在Binary Images中时为-1
+    """
+    def __init__(self):
+        self.crash_ids = array('I')
+        self.line_nums = array('q')
+        self.image_ids = array('i')
+        self.invoke_addresses = array('Q')
+        self.load_addresses = array('Q')
+        self.images = list()
+        self.__image_ids = dict()
+
+    @classmethod
+    def from_crash_list(cls, crash_list):
+        """
+        :param crash_list: CrashInfo list
+        :return: FrameTable对象
+        """
+        table = cls()
+        for crash_id, crash_obj in enumerate(crash_list):
+            for stack_item in crash_obj.function_stacks:
+                table.append(crash_id, stack_item.line_num, crash_obj.image_for(stack_item),
+                             int(stack_item.invoke_address, 16), int(stack_item.load_address, 16))
+        return table
+
+    def __len__(self):
+        return len(self.line_nums)
+
+    def image_id(self, image_item):
+        """
+        :param image_item: ImageItemInfo object，为None时返回-1
+        :return: image在images中的下标，uuid、名称及cpu架构相同的image共用一个下标
+        """
+        if image_item is None:
+            return -1
+        key = (image_item.uuid, image_item.name, image_item.code_type)
+        image_id = self.__image_ids.get(key)
+        if image_id is None:
+            image_id = self.__image_ids[key] = len(self.images)
+            self.images.append(image_item)
+        return image_id
+
+    def append(self, crash_id, line_num, image_item, invoke_address, load_address):
+        """
+        :param invoke_address: 调用地址Int
+        :param load_address: 加载地址Int
+        """
+        self.crash_ids.append(crash_id)
+        self.line_nums.append(line_num)
+        self.image_ids.append(self.image_id(image_item))
+        self.invoke_addresses.append(invoke_address)
+        self.load_addresses.append(load_address)
+
+    def offsets(self):
+        """
+        :return: 各栈帧在image内的偏移array，调用地址低于加载地址的异常栈帧偏移为负数
+        """
+        return array('q', [invoke - load for invoke, load in zip(self.invoke_addresses, self.load_addresses)])
+
+    def group_by_image(self):
+        """
+        :return: dict of {image_id: 该image内去重后排序的偏移list}
+        """
+        groups = dict()
+        for image_id, invoke, load in zip(self.image_ids, self.invoke_addresses, self.load_addresses):
+            if image_id >= 0:
+                groups.setdefault(image_id, set()).add(invoke - load)
+        return {image_id: sorted(offsets) for image_id, offsets in groups.items()}
@@ -0,0 +1,71 @@
+from bisect import bisect_right
+
+__author__ = 'jinzhao'
+
+
+class ImageIndex(object):
+    """
+    按地址范围排序的image索引，通过二分查找确定地址所在的image，不依赖栈信息中的image名称。
+    没有结束地址的image视为一直延伸到下一个image之前
+    """
+    def __init__(self, images=None):
+        """
+        :param images: ImageItemInfo list
+        """
+        self.__starts = list()
+        self.__ends = list()
+        self.__images = list()
+        for image_item in images or list():
+            self.add(image_item)
+
+    def __len__(self):
+        return len(self.__images)
+
+    def __iter__(self):
+        return iter(self.__images)
+
+    def add(self, image_item):
+        """
+        :param image_item: ImageItemInfo object，load_address及end_address为十六进制字符串
+        """
+        start = int(image_item.load_address, 16)
+        end = int(image_item.end_address, 16) if image_item.end_address else None
+        # Binary Images通常已经按地址排序，此时总是插入到末尾
+        position = len(self.__starts)
+        if position > 0 and self.__starts[-1] > start:
+            position = bisect_right(self.__starts, start)
+        self.__starts.insert(position, start)
+        self.__ends.insert(position, end)
+        self.__images.insert(position, image_item)
+
+    def find(self, address):
+        """
+        :param address: 地址Int
+        :return: 地址所在的ImageItemInfo，不在任何image范围内时返回None
+        """
+        position = bisect_right(self.__starts, address) - 1
+        if position < 0:
+            return None
+        end = self.__ends[position]
+        if end is None:
+            if position + 1 < len(self.__starts) and address >= self.__starts[position + 1]:
+                return None
+        elif address > end:
+            return None
+        return self.__images[position]
+
+    def group(self, addresses):
+        """
+        按image对地址分组，可以用于其他来源的原始地址列表
+        :param addresses: 地址Int list
+        :return: (dict of {image_item: 地址list}, 不在任何image范围内的地址list)
+        """
+        groups = dict()
+        unmatched = list()
+        for address in addresses:
+            image_item = self.find(address)
+            if image_item is None:
+                unmatched.append(address)
+            else:
+                groups.setdefault(image_item, list()).append(address)
+        return (groups, unmatched)
@@ -0,0 +1,332 @@
+import os
+import sys
+import mmap
+import threading
+import bisect
+import struct
+from array import array
+from .macho import MachOFile
+from .symtab import SymbolTable, _format_symbol, _format_source_symbol
+from .dwarf import DwarfInfo, DwarfError
+
+__author__ = 'jinzhao'
+
+_MAGIC = b'SCIX'
+_VERSION = 1
+# magic, version, 行号表项数, 符号表项数, 字符串表大小, 保留, uuid, arch, __TEXT的vmaddr
+_HEADER_FMT = '<4sIIIII16s16sQ'
+_HEADER_SIZE = struct.calcsize(_HEADER_FMT)
+_MAX_LENGTH = 0xffffffff
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class _StringTable(object):
+    """
+    去重的'\\0'结尾字符串表
+    """
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = dict()
+
+    def add(self, value):
+        offset = self.offsets.get(value)
+        if offset is None:
+            offset = len(self.data)
+            self.offsets[value] = offset
+            self.data += value.encode('utf-8') + b'\0'
+        return offset
+
+
+def _table_layout(offset, count, columns):
+    """
+    :return: (各列的起始位置, 结束位置)，每列按8字节对齐
+    """
+    starts = list()
+    for typecode in columns:
+        starts.append(offset)
+        offset = _align(offset + count * array(typecode).itemsize)
+    return (starts, offset)
+
+
+def _write_index(path, uuid, arch, text_vmaddr, lines, symbols):
+    """
+    :param lines: list of (low, high, function, file, line)
+    :param symbols: list of (address, end, name)
+    """
+    strings = _StringTable()
+    columns = [array('Q'), array('I'), array('I'), array('I')]
+    for low, high, function, file_name, line in lines:
+        columns[0].append(low)
+        columns[1].append(min(high - low, _MAX_LENGTH))
+        columns[2].append(strings.add(function + '\0' + file_name))
+        columns[3].append(line)
+    symbol_columns = [array('Q'), array('I'), array('I')]
+    for address, end, name in symbols:
+        symbol_columns[0].append(address)
+        symbol_columns[1].append(min(end - address, _MAX_LENGTH))
+        symbol_columns[2].append(strings.add(name))
+    header = struct.pack(_HEADER_FMT, _MAGIC, _VERSION, len(lines), len(symbols), len(strings.data), 0,
+                         bytes.fromhex(uuid), arch.encode('utf-8')[:16], text_vmaddr)
+    with open(path, 'wb') as file:
+        file.write(header)
+        for column in columns + symbol_columns:
+            if sys.byteorder != 'little':
+                column.byteswap()
+            data = column.tobytes()
+            file.write(data + b'\0' * (_align(len(data)) - len(data)))
+        file.write(bytes(strings.data))
+
+
+class SymbolIndex(object):
+    """
+    以mmap方式加载的符号索引，数组直接映射文件内容不做拷贝
+    """
+    def __init__(self, path):
+        self.__views = list()
+        self.__file = open(path, 'rb')
+        try:
+            self.__data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.__file.close()
+            raise
+        if len(self.__data) < _HEADER_SIZE:
+            self.close()
+            raise ValueError('invalid symbol index "{}"'.format(path))
+        magic, version, line_count, symbol_count, strtab_size, reserved, uuid, arch, text_vmaddr = struct.unpack_from(_HEADER_FMT, self.__data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError('invalid symbol index "{}"'.format(path))
+        self.uuid = uuid.hex().upper()
+        self.arch = arch.rstrip(b'\0').decode('utf-8')
+        self.text_vmaddr = text_vmaddr
+        line_starts, offset = _table_layout(_HEADER_SIZE, line_count, 'QIII')
+        symbol_starts, offset = _table_layout(offset, symbol_count, 'QII')
+        self.__lines = [self.__column(start, line_count, typecode) for start, typecode in zip(line_starts, 'QIII')]
+        self.__symbols = [self.__column(start, symbol_count, typecode) for start, typecode in zip(symbol_starts, 'QII')]
+        self.__strtab = offset
+        if offset + strtab_size > len(self.__data):
+            self.close()
+            raise ValueError('truncated symbol index "{}"'.format(path))
+
+    def __column(self, start, count, typecode):
+        size = count * array(typecode).itemsize
+        if sys.byteorder != 'little':
+            column = array(typecode)
+            column.frombytes(self.__data[start:start + size])
+            column.byteswap()
+            return column
+        view = memoryview(self.__data)[start:start + size].cast(typecode)
+        self.__views.append(view)
+        return view
+
+    def __string(self, offset):
+        start = self.__strtab + offset
+        return bytes(self.__data[start:self.__data.find(b'\0', start)]).decode('utf-8', 'replace')
+
+    def lookup(self, address):
+        """
+        :param address: 符号文件中的虚拟地址
+        :return: (function:String, file:String, line:Int, offset:Int)，只有符号表信息时file与line为None，找不到时返回None
+        """
+        addresses, lengths, names, lines = self.__lines
+        index = bisect.bisect_right(addresses, address) - 1
+        if index >= 0 and address < addresses[index] + lengths[index]:
+            start = self.__strtab + names[index]
+            function_end = self.__data.find(b'\0', start)
+            function = bytes(self.__data[start:function_end]).decode('utf-8', 'replace')
+            return (function, self.__string(function_end + 1 - self.__strtab), lines[index], address - addresses[index])
+        addresses, lengths, names = self.__symbols
+        index = bisect.bisect_right(addresses, address) - 1
+        if index >= 0 and address < addresses[index] + lengths[index]:
+            return (self.__string(names[index]), None, None, address - addresses[index])
+        return None
+
+    def close(self):
+        if self.__data is None:
+            return
+        for view in self.__views:
+            view.release()
+        self.__views = list()
+        self.__data.close()
+        self.__data = None
+        self.__file.close()
+
+
+class SymbolIndexStore(object):
+    """
+    按uuid及cpu架构保存的持久化符号索引，第一次使用时由符号文件建立，
+    之后直接mmap加载。目录总大小超过max_size时按最近使用时间淘汰。
+    """
+    default_max_size = 1 << 30
+
+    def __init__(self, cache_dir, max_size=None):
+        self.__root = os.path.join(os.path.expanduser(cache_dir), 'symbols')
+        self.__max_size = max_size if max_size is not None else self.default_max_size
+        self.__indexes = dict()
+        self.__lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def root(self):
+        return self.__root
+
+    def __path(self, uuid, arch):
+        return os.path.join(self.__root, '{uuid}-{arch}.idx'.format(uuid=uuid.upper(), arch=arch))
+
+    def get(self, uuid, arch):
+        """
+        :return: SymbolIndex，不存在时返回None
+        """
+        with self.__lock:
+            return self.__get(uuid, arch)
+
+    def __get(self, uuid, arch):
+        key = (uuid.upper(), arch)
+        index = self.__indexes.get(key)
+        if index is not None:
+            self.hits += 1
+            return index
+        path = self.__path(uuid, arch)
+        try:
+            index = SymbolIndex(path)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        if index.uuid != key[0] or index.arch != arch:
+            index.close()
+            self.misses += 1
+            return None
+        try:
+            # 更新修改时间，用于按最近使用时间淘汰
+            os.utime(path)
+        except OSError:
+            pass
+        self.__indexes[key] = index
+        self.hits += 1
+        return index
+
+    def exists(self, uuid, arch):
+        """
+        检查索引是否已经建立，不加载索引
+        """
+        key = (uuid.upper(), arch)
+        with self.__lock:
+            if key in self.__indexes:
+                return True
+        try:
+            index = SymbolIndex(self.__path(uuid, arch))
+        except (IOError, OSError, ValueError):
+            return False
+        valid = index.uuid == key[0] and index.arch == arch
+        index.close()
+        return valid
+
+    def build(self, symbol_file, code_type=None):
+        """
+        由符号文件建立索引，已存在的同uuid索引会被覆盖。
+        读取符号文件及写入索引时不加锁，大的符号文件建立索引时不影响其他image的查询
+        :param symbol_file: 符号文件路径
+        :param code_type: cpu架构版本，为None时为所有架构建立索引
+        :return: list of (uuid, arch)
+        """
+        path = os.path.expanduser(symbol_file)
+        if os.path.isfile(path) is False:
+            return list()
+        os.makedirs(self.__root, exist_ok=True)
+        built = list()
+        with MachOFile(path) as macho_file:
+            for macho_slice in macho_file.slices:
+                if code_type is not None and macho_slice.arch != code_type:
+                    continue
+                uuid = macho_slice.uuid
+                if uuid is None:
+                    continue
+                table = SymbolTable(macho_slice)
+                dwarf_info = DwarfInfo(macho_slice)
+                lines = list()
+                if dwarf_info.available:
+                    try:
+                        lines = list(dwarf_info.line_ranges())
+                    except DwarfError:
+                        lines = list()
+                # 长度为0的范围查找时永远不会命中，但会遮住同一地址上的有效范围
+                lines = [item for item in lines if item[1] > item[0]]
+                lines.sort(key=lambda item: (item[0], item[1]))
+                key = (uuid, macho_slice.arch)
+                index_path = self.__path(uuid, macho_slice.arch)
+                # 多个线程或进程可能同时为同一个符号文件建立索引
+                temp_path = '{path}.{pid}.{thread}.tmp'.format(path=index_path, pid=os.getpid(), thread=threading.get_ident())
+                _write_index(temp_path, uuid, macho_slice.arch, table.text_vmaddr, lines, list(table.entries()))
+                with self.__lock:
+                    if key in self.__indexes:
+                        self.__indexes.pop(key).close()
+                    os.replace(temp_path, index_path)
+                built.append(key)
+        self.evict()
+        return built
+
+    def evict(self):
+        """
+        目录总大小超过max_size时删除最久未使用的索引
+        """
+        try:
+            names = [name for name in os.listdir(self.__root) if name.endswith('.idx')]
+        except OSError:
+            return
+        files = list()
+        total = 0
+        for name in names:
+            path = os.path.join(self.__root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        files.sort()
+        for mtime, size, path in files:
+            if total <= self.__max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def symbolicate(self, uuid, code_type, image_name, load_address, addresses):
+        """
+        :param uuid: image的uuid
+        :param code_type: cpu架构版本
+        :param image_name: image名称
+        :param load_address: image加载地址，16进制字符串
+        :param addresses: 调用地址list，16进制字符串
+        :return: dict of {address:String: symbol:String}，没有索引时返回None
+        """
+        index = self.get(uuid, code_type)
+        if index is None:
+            return None
+        symbols = dict()
+        slide = int(load_address, 16) - index.text_vmaddr
+        for address in addresses:
+            result = index.lookup(int(address, 16) - slide)
+            if result is None:
+                continue
+            function, file_name, line, offset = result
+            if file_name is not None:
+                symbols[address] = _format_source_symbol(function, image_name, file_name, line)
+            else:
+                symbols[address] = _format_symbol(function, image_name, offset)
+        return symbols
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'loaded': len(self.__indexes)}
+
+    def close(self):
+        with self.__lock:
+            for index in self.__indexes.values():
+                index.close()
+            self.__indexes = dict()
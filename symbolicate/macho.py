@@ -0,0 +1,311 @@
+import mmap
+import struct
+
+__author__ = 'jinzhao'
+
+FAT_MAGIC = 0xcafebabe
+FAT_MAGIC_64 = 0xcafebabf
+MH_MAGIC = 0xfeedface
+MH_MAGIC_64 = 0xfeedfacf
+MH_CIGAM = 0xcefaedfe
+MH_CIGAM_64 = 0xcffaedfe
+
+LC_SEGMENT = 0x1
+LC_SYMTAB = 0x2
+LC_SEGMENT_64 = 0x19
+LC_UUID = 0x1b
+
+N_STAB = 0xe0
+N_TYPE = 0x0e
+N_EXT = 0x01
+N_SECT = 0x0e
+
+CPU_ARCH_ABI64 = 0x01000000
+CPU_ARCH_ABI64_32 = 0x02000000
+CPU_SUBTYPE_MASK = 0xff000000
+CPU_TYPE_X86 = 7
+CPU_TYPE_ARM = 12
+CPU_TYPE_X86_64 = CPU_TYPE_X86 | CPU_ARCH_ABI64
+CPU_TYPE_ARM64 = CPU_TYPE_ARM | CPU_ARCH_ABI64
+CPU_TYPE_ARM64_32 = CPU_TYPE_ARM | CPU_ARCH_ABI64_32
+
+_arch_names = {
+    (CPU_TYPE_X86, 3): 'i386',
+    (CPU_TYPE_X86_64, 3): 'x86_64',
+    (CPU_TYPE_X86_64, 8): 'x86_64h',
+    (CPU_TYPE_ARM, 5): 'armv4t',
+    (CPU_TYPE_ARM, 6): 'armv6',
+    (CPU_TYPE_ARM, 7): 'armv5',
+    (CPU_TYPE_ARM, 9): 'armv7',
+    (CPU_TYPE_ARM, 10): 'armv7f',
+    (CPU_TYPE_ARM, 11): 'armv7s',
+    (CPU_TYPE_ARM, 12): 'armv7k',
+    (CPU_TYPE_ARM, 13): 'armv8',
+    (CPU_TYPE_ARM, 14): 'armv6m',
+    (CPU_TYPE_ARM, 15): 'armv7m',
+    (CPU_TYPE_ARM, 16): 'armv7em',
+    (CPU_TYPE_ARM64, 0): 'arm64',
+    (CPU_TYPE_ARM64, 1): 'arm64v8',
+    (CPU_TYPE_ARM64, 2): 'arm64e',
+    (CPU_TYPE_ARM64_32, 1): 'arm64_32',
+}
+
+
+def arch_name(cpu_type, cpu_subtype):
+    """
+    :param cpu_type: mach_header中的cputype
+    :param cpu_subtype: mach_header中的cpusubtype
+    :return 与atos/dwarfdump的--arch参数一致的架构名称
+    """
+    cpu_subtype &= ~CPU_SUBTYPE_MASK & 0xffffffff
+    name = _arch_names.get((cpu_type, cpu_subtype))
+    if name is None:
+        name = 'cputype{}_{}'.format(cpu_type, cpu_subtype)
+    return name
+
+
+class MachOSlice(object):
+    """
+    Mach-O文件中某一cpu架构的数据
+    """
+    def __init__(self, data, offset, size, arch, is_64, endian):
+        self.data = data
+        self.offset = offset
+        self.size = size
+        self.arch = arch
+        self.is_64 = is_64
+        self.endian = endian
+        self.__stroff = None
+
+    def unpack_from(self, fmt, offset):
+        """
+        按该slice的字节序读取数据，offset相对于slice起始位置
+        """
+        return struct.unpack_from(self.endian + fmt, self.data, self.offset + offset)
+
+    def load_commands(self):
+        """
+        遍历load command
+        :return: generator of (cmd:Int, offset:Int)，offset相对于slice起始位置
+        """
+        ncmds, sizeofcmds = self.unpack_from('II', 16)
+        offset = 32 if self.is_64 else 28
+        end = offset + sizeofcmds
+        for index in range(ncmds):
+            if offset + 8 > end or self.offset + offset + 8 > len(self.data):
+                break
+            cmd, cmdsize = self.unpack_from('II', offset)
+            yield (cmd, offset)
+            if cmdsize < 8:
+                break
+            offset += cmdsize
+
+    def segments(self):
+        """
+        :return: list of MachOSegment，按load command顺序排列
+        """
+        segments = list()
+        for cmd, offset in self.load_commands():
+            if cmd == LC_SEGMENT_64:
+                segname, vmaddr, vmsize, fileoff, filesize = self.unpack_from('16sQQQQ', offset + 8)
+                nsects = self.unpack_from('I', offset + 64)[0]
+                section_offset, section_fmt, section_size = offset + 72, '16s16sQQI', 80
+            elif cmd == LC_SEGMENT:
+                segname, vmaddr, vmsize, fileoff, filesize = self.unpack_from('16sIIII', offset + 8)
+                nsects = self.unpack_from('I', offset + 48)[0]
+                section_offset, section_fmt, section_size = offset + 56, '16s16sIII', 68
+            else:
+                continue
+            sections = list()
+            for index in range(nsects):
+                sectname, sect_segname, addr, size, sect_offset = self.unpack_from(section_fmt, section_offset + index * section_size)
+                sections.append(MachOSection(_cstring(sectname), _cstring(sect_segname), addr, size, sect_offset))
+            segments.append(MachOSegment(_cstring(segname), vmaddr, vmsize, fileoff, filesize, sections))
+        return segments
+
+    def sections(self):
+        """
+        :return: list of MachOSection，下标加1即为nlist中的n_sect
+        """
+        return [section for segment in self.segments() for section in segment.sections]
+
+    def symtab(self):
+        """
+        :return: (symoff, nsyms, stroff, strsize)，没有LC_SYMTAB时返回None
+        """
+        for cmd, offset in self.load_commands():
+            if cmd == LC_SYMTAB:
+                return self.unpack_from('IIII', offset + 8)
+        return None
+
+    def nlists(self):
+        """
+        遍历符号表
+        :return: generator of (n_strx, n_type, n_sect, n_desc, n_value)
+        """
+        symtab = self.symtab()
+        if symtab is None:
+            return
+        symoff, nsyms, stroff, strsize = symtab
+        fmt = self.endian + ('IBBHQ' if self.is_64 else 'IBBHI')
+        start = self.offset + symoff
+        end = min(start + nsyms * struct.calcsize(fmt), len(self.data))
+        end -= (end - start) % struct.calcsize(fmt)
+        if end <= start:
+            return
+        for entry in struct.iter_unpack(fmt, self.data[start:end]):
+            yield entry
+
+    def string(self, strx):
+        """
+        :param strx: 字符串表中的偏移
+        :return 字符串表中以'\\0'结尾的字符串
+        """
+        if self.__stroff is None:
+            self.__stroff = self.symtab()[2]
+        start = self.offset + self.__stroff + strx
+        end = self.data.find(b'\0', start)
+        if end < 0:
+            end = len(self.data)
+        return bytes(self.data[start:end]).decode('utf-8', 'replace')
+
+    @property
+    def uuid(self):
+        """
+        :return 大写无连字符的uuid，没有LC_UUID时返回None
+        """
+        for cmd, offset in self.load_commands():
+            if cmd == LC_UUID:
+                start = self.offset + offset + 8
+                return bytes(self.data[start:start + 16]).hex().upper()
+        return None
+
+
+class MachOSegment(object):
+    """
+    segment信息
+    """
+    def __init__(self, name, vmaddr, vmsize, fileoff, filesize, sections):
+        self.name = name
+        self.vmaddr = vmaddr
+        self.vmsize = vmsize
+        self.fileoff = fileoff
+        self.filesize = filesize
+        self.sections = sections
+
+
+class MachOSection(object):
+    """
+    section信息
+    """
+    def __init__(self, name, segment_name, addr, size, offset):
+        self.name = name
+        self.segment_name = segment_name
+        self.addr = addr
+        self.size = size
+        self.offset = offset
+
+
+def _cstring(value):
+    return value.split(b'\0', 1)[0].decode('utf-8', 'replace')
+
+
+def _thin_slice(data, offset, size):
+    if offset + 28 > len(data):
+        return None
+    magic = struct.unpack_from('<I', data, offset)[0]
+    if magic == MH_MAGIC or magic == MH_MAGIC_64:
+        endian = '<'
+    elif magic == MH_CIGAM or magic == MH_CIGAM_64:
+        endian = '>'
+    else:
+        return None
+    is_64 = magic in (MH_MAGIC_64, MH_CIGAM_64)
+    cpu_type, cpu_subtype = struct.unpack_from(endian + 'II', data, offset + 4)
+    return MachOSlice(data, offset, size, arch_name(cpu_type, cpu_subtype), is_64, endian)
+
+
+def parse_slices(data):
+    """
+    解析fat或thin的Mach-O头部
+    :param data: bytes或mmap对象
+    :return: list of MachOSlice，不是Mach-O文件时返回空list
+    """
+    if len(data) < 8:
+        return list()
+    magic = struct.unpack_from('>I', data, 0)[0]
+    if magic != FAT_MAGIC and magic != FAT_MAGIC_64:
+        thin = _thin_slice(data, 0, len(data))
+        return [thin] if thin is not None else list()
+    nfat_arch = struct.unpack_from('>I', data, 4)[0]
+    slices = list()
+    offset = 8
+    for index in range(nfat_arch):
+        if magic == FAT_MAGIC_64:
+            if offset + 32 > len(data):
+                break
+            cpu_type, cpu_subtype, slice_offset, slice_size, align, reserved = struct.unpack_from('>IIQQII', data, offset)
+            offset += 32
+        else:
+            if offset + 20 > len(data):
+                break
+            cpu_type, cpu_subtype, slice_offset, slice_size, align = struct.unpack_from('>IIIII', data, offset)
+            offset += 20
+        thin = _thin_slice(data, slice_offset, slice_size)
+        if thin is not None:
+            slices.append(thin)
+    return slices
+
+
+class MachOFile(object):
+    """
+    以mmap方式打开的Mach-O文件，支持fat(universal)及thin格式
+    """
+    def __init__(self, path):
+        self.__path = path
+        self.__file = open(path, 'rb')
+        try:
+            self.__data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法mmap
+            self.__data = b''
+        self.__slices = parse_slices(self.__data)
+
+    @property
+    def path(self):
+        return self.__path
+
+    @property
+    def slices(self):
+        return self.__slices
+
+    def slice(self, arch):
+        """
+        :param arch: cpu架构名称
+        :return: MachOSlice，不存在时返回None
+        """
+        for item in self.__slices:
+            if item.arch == arch:
+                return item
+        return None
+
+    def close(self):
+        if isinstance(self.__data, mmap.mmap):
+            self.__data.close()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_uuids(path):
+    """
+    读取Mach-O文件中各cpu架构的uuid
+    :param path: 文件路径
+    :return: dict of {arch:String: uuid:String}，文件不是Mach-O格式时返回空dict
+    """
+    with MachOFile(path) as macho_file:
+        return dict((item.arch, item.uuid) for item in macho_file.slices if item.uuid is not None)
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import socket
+import threading
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+from .symbolicate import version, _SymbolicateContext, _stream_symbolicated_lines, _set_verbose_mode
+from .cache import UUIDCache, NegativeCache, ResultCache
+from .symtab import NativeResolver
+from .index import SymbolIndexStore
+from .atos import AtosPool
+
+__author__ = 'jinzhao'
+
+
+def dsym_symbol_file(dsym_file):
+    """
+    :param dsym_file: xxx.app.dSYM路径或符号文件路径
+    :return: 符号文件路径
+    """
+    path = dsym_file.rstrip('/')
+    name = os.path.basename(path)
+    if name.endswith('.app.dSYM'):
+        return os.path.join(path, 'Contents', 'Resources', 'DWARF', name[:-len('.app.dSYM')])
+    return path
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    GET /health, GET /stats, POST /symbolicate?dsym={dsym_file}，请求体为crash日志内容
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # Unix socket的client_address为空字符串
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self.__reply(200, json.dumps({'status': 'ok', 'version': version()}), 'application/json')
+        elif path == '/stats':
+            self.__reply(200, json.dumps(self.server.service.stats()), 'application/json')
+        else:
+            self.__reply(404, 'not found\n')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/symbolicate':
+            self.__reply(404, 'not found\n')
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8', 'replace')
+        dsym_file = parse_qs(url.query).get('dsym', [self.headers.get('X-Dsym')])[0]
+        if dsym_file is None or len(dsym_file) == 0:
+            self.__reply(400, 'dsym is required\n')
+            return
+        try:
+            output = self.server.service.symbolicate(body, dsym_file)
+        except Exception as error:
+            self.__reply(500, '{error}\n'.format(error=error))
+            return
+        self.__reply(200, output)
+
+    def __reply(self, code, content, content_type='text/plain; charset=utf-8'):
+        data = content.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        socketserver.ThreadingUnixStreamServer.server_bind(self)
+
+
+class SymbolicateServer(object):
+    """
+    常驻的符号化服务，uuid缓存、符号索引、符号表及atos进程在请求之间共享，请求并发处理
+    """
+    def __init__(self, cache_dir=None, backend='atos-pool', workers=1, max_processes=None, host='127.0.0.1', port=0, socket_path=None, verbose_mode=False, negative_ttl=300):
+        """
+        :param cache_dir: 持久化缓存目录，默认为None
+        :param backend: 'atos'、'atos-pool'或'native'
+        :param workers: 每个请求内并发解析的线程数
+        :param max_processes: 所有请求同时运行的atos/dwarfdump进程数上限
+        :param host: HTTP监听地址，指定socket_path时忽略
+        :param port: HTTP监听端口，0表示随机端口
+        :param socket_path: Unix socket路径
+        :param verbose_mode: 是否开启调试模式
+        :param negative_ttl: 符号文件不存在或uuid不一致的image在多少秒内不再重试，None表示服务运行期间一直跳过
+        """
+        _set_verbose_mode(verbose_mode)
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.context = _SymbolicateContext(UUIDCache(cache_dir),
+                                           NativeResolver() if backend == 'native' else None,
+                                           # 符号索引不做demangle，只在native解析时使用，atos的输出保持不变
+                                           SymbolIndexStore(cache_dir) if cache_dir is not None and backend == 'native' else None,
+                                           max_processes if max_processes is not None else max(workers, 8),
+                                           AtosPool(max(workers, 8)) if backend == 'atos-pool' else None,
+                                           negative_cache=NegativeCache(negative_ttl),
+                                           result_cache=ResultCache(cache_dir=cache_dir))
+        self.__lock = threading.Lock()
+        self.__started = time.time()
+        self.__counts = {'requests': 0, 'failed': 0, 'crashes': 0, 'frames': 0, 'resolved': 0}
+        if socket_path is not None:
+            self.httpd = _UnixHTTPServer(socket_path, _Handler)
+            self.address = socket_path
+        else:
+            self.httpd = ThreadingHTTPServer((host, port), _Handler)
+            self.httpd.daemon_threads = True
+            self.address = 'http://{host}:{port}'.format(host=host, port=self.httpd.server_address[1])
+        self.httpd.service = self
+
+    def symbolicate(self, content, dsym_file):
+        """
+        :param content: crash日志内容
+        :param dsym_file: xxx.app.dSYM路径或app符号文件路径
+        :return: 符号化之后的内容
+        """
+        symbol_file = dsym_symbol_file(dsym_file)
+        counts = [0, 0, 0]
+        try:
+            output = ''.join(_stream_symbolicated_lines(content.splitlines(True), lambda *args: symbol_file, self.context, self.workers, counts))
+        except Exception:
+            with self.__lock:
+                self.__counts['requests'] += 1
+                self.__counts['failed'] += 1
+            raise
+        with self.__lock:
+            self.__counts['requests'] += 1
+            self.__counts['crashes'] += counts[0]
+            self.__counts['frames'] += counts[1]
+            self.__counts['resolved'] += counts[2]
+        return output
+
+    def stats(self):
+        with self.__lock:
+            stats = dict(self.__counts)
+        stats['uptime'] = time.time() - self.__started
+        stats['uuid_cache'] = self.context.uuid_cache.stats()
+        stats['negative_cache'] = self.context.negative_cache.stats()
+        stats['result_cache'] = self.context.result_cache.stats()
+        stats['skipped_images'] = self.context.negative_cache.summary()
+        if self.context.index_store is not None:
+            stats['symbol_index'] = self.context.index_store.stats()
+        if self.context.atos_pool is not None:
+            stats['atos_pool'] = self.context.atos_pool.stats()
+        return stats
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        """
+        在后台线程中处理请求
+        :return: 后台线程
+        """
+        thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self.httpd.shutdown()
+
+    def close(self):
+        self.httpd.server_close()
+        if isinstance(self.httpd, _UnixHTTPServer) and os.path.exists(self.address):
+            os.remove(self.address)
+        self.context.finish()
+        if self.context.atos_pool is not None:
+            self.context.atos_pool.close()
+        if self.context.resolver is not None:
+            self.context.resolver.close()
+        if self.context.index_store is not None:
+            self.context.index_store.close()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        http.client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class SymbolicateClient(object):
+    """
+    SymbolicateServer的客户端
+    """
+    def __init__(self, address, timeout=300):
+        """
+        :param address: 'http://host:port'或Unix socket路径
+        :param timeout: 请求超时秒数
+        """
+        self.address = address
+        self.timeout = timeout
+
+    def __connect(self):
+        if self.address.startswith('http://'):
+            url = urlsplit(self.address)
+            return http.client.HTTPConnection(url.hostname, url.port, timeout=self.timeout)
+        return _UnixHTTPConnection(self.address, self.timeout)
+
+    def __request(self, method, path, body=None):
+        connection = self.__connect()
+        try:
+            connection.request(method, path, body)
+            response = connection.getresponse()
+            content = response.read().decode('utf-8')
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise IOError('{status}: {content}'.format(status=response.status, content=content.strip()))
+        return content
+
+    def symbolicate(self, content, dsym_file):
+        """
+        :param content: crash日志内容
+        :param dsym_file: 服务端可以访问的xxx.app.dSYM路径或app符号文件路径
+        :return: 符号化之后的内容
+        """
+        return self.__request('POST', '/symbolicate?dsym=' + quote(dsym_file), content.encode('utf-8'))
+
+    def health(self):
+        return json.loads(self.__request('GET', '/health'))
+
+    def stats(self):
+        return json.loads(self.__request('GET', '/stats'))
@@ -0,0 +1,80 @@
+import os
+import json
+
+__author__ = 'jinzhao'
+
+STATE_VERSION = 1
+
+
+def default_state_path(crash_log):
+    """
+    :return: crash日志旁边的状态文件路径
+    """
+    return crash_log + '.state.json'
+
+
+def save_state(path, crash_log, crash_list):
+    """
+    保存解析后的crash及各栈帧的解析结果，invoke_symbol为空的栈帧视为未解析
+    :param path: 状态文件路径
+    :param crash_log: crash日志文件路径，记录其大小及修改时间，日志变化后状态文件失效
+    :param crash_list: CrashInfo list
+    :return 是否成功
+    """
+    try:
+        stat = os.stat(crash_log)
+    except OSError:
+        return False
+    crashes = list()
+    for crash_obj in crash_list:
+        images = list(crash_obj.image_index)
+        image_ids = {id(image_item): image_id for image_id, image_item in enumerate(images)}
+        crashes.append([[crash_obj.product_name, crash_obj.identifier, crash_obj.version, crash_obj.code_type, crash_obj.os_version],
+                        [[image_item.load_address, image_item.end_address, image_item.name, image_item.code_type, image_item.uuid, image_item.symbol_file]
+                         for image_item in images],
+                        [image_ids[id(image_item)] for image_item in crash_obj.binary_images.values()],
+                        [[stack_item.line_num, stack_item.name, stack_item.invoke_address, stack_item.load_address, stack_item.invoke_symbol]
+                         for stack_item in crash_obj.function_stacks]])
+    state = {'version': STATE_VERSION, 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'crashes': crashes}
+    try:
+        with open(path + '.tmp', 'w') as file:
+            json.dump(state, file, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def load_state(path, crash_log):
+    """
+    :param path: 状态文件路径
+    :param crash_log: crash日志文件路径
+    :return: CrashInfo list，状态文件不存在、格式不对或crash日志已经变化时返回None
+    """
+    # 避免循环引用
+    from .symbolicate import CrashInfo, StackItemInfo, ImageItemInfo
+    try:
+        stat = os.stat(crash_log)
+        with open(path, 'r') as file:
+            state = json.load(file)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get('version') != STATE_VERSION or \
+            state.get('size') != stat.st_size or state.get('mtime') != stat.st_mtime_ns:
+        return None
+    crash_list = list()
+    try:
+        for header, images, names, frames in state['crashes']:
+            crash_obj = CrashInfo()
+            crash_obj.product_name, crash_obj.identifier, crash_obj.version, crash_obj.code_type, crash_obj.os_version = header
+            image_items = [ImageItemInfo(load_address, name, code_type, uuid, symbol_file, end_address)
+                           for load_address, end_address, name, code_type, uuid, symbol_file in images]
+            for image_item in image_items:
+                crash_obj.image_index.add(image_item)
+            for image_id in names:
+                crash_obj.binary_images[image_items[image_id].name] = image_items[image_id]
+            crash_obj.function_stacks = [StackItemInfo(*frame) for frame in frames]
+            crash_list.append(crash_obj)
+    except (TypeError, ValueError, IndexError):
+        return None
+    return crash_list
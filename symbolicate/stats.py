@@ -0,0 +1,196 @@
+import time
+import threading
+
+__author__ = 'jinzhao'
+
+# 耗时直方图各桶的上限（秒）
+HISTOGRAM_BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class _Timing(object):
+    """
+    一组耗时的次数、总和、最大值及直方图
+    """
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = 0
+        while index < len(HISTOGRAM_BOUNDS) and seconds > HISTOGRAM_BOUNDS[index]:
+            index += 1
+        self.buckets[index] += 1
+
+    def to_dict(self):
+        histogram = dict()
+        for index, count in enumerate(self.buckets):
+            if count > 0:
+                key = '<={}'.format(HISTOGRAM_BOUNDS[index]) if index < len(HISTOGRAM_BOUNDS) else '>{}'.format(HISTOGRAM_BOUNDS[-1])
+                histogram[key] = count
+        return {'count': self.count, 'total': self.total, 'max': self.max, 'histogram': histogram}
+
+
+class _Stage(object):
+    """
+    stage耗时统计的context manager
+    """
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.stats.add_stage(self.name, time.perf_counter() - self.start)
+
+
+class SymbolicateStats(object):
+    """
+    一次符号化任务的统计信息：各stage的耗时、外部命令按工具及image的调用次数和耗时、
+    缓存命中率、解析成功/失败的栈帧数、uuid不匹配的image、因此跳过的image及重复crash的分布
+    """
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.stages = dict()
+        self.commands = dict()
+        self.image_commands = dict()
+        self.caches = dict()
+        self.crashes = 0
+        self.frames = 0
+        self.resolved = 0
+        self.uuid_mismatches = list()
+        # (image, symbol_file, uuid, reason) -> 跳过的栈帧数
+        self.skipped_images = dict()
+        # crash指纹 -> [出现次数, 第一次出现的行号]
+        self.fingerprints = dict()
+
+    def stage(self, name):
+        """
+        :return: 统计with语句块耗时的context manager
+        """
+        return _Stage(self, name)
+
+    def add_stage(self, name, seconds):
+        with self.__lock:
+            timing = self.stages.get(name)
+            if timing is None:
+                timing = self.stages[name] = _Timing()
+            timing.add(seconds)
+
+    def add_command(self, tool, image, seconds):
+        """
+        :param tool: 'atos'、'dwarfdump'等
+        :param image: 命令处理的image名称或符号文件
+        """
+        with self.__lock:
+            timing = self.commands.get(tool)
+            if timing is None:
+                timing = self.commands[tool] = _Timing()
+            timing.add(seconds)
+            key = (tool, image)
+            timing = self.image_commands.get(key)
+            if timing is None:
+                timing = self.image_commands[key] = _Timing()
+            timing.add(seconds)
+
+    def add_uuid_mismatch(self, image, symbol_file, uuid):
+        with self.__lock:
+            self.uuid_mismatches.append({'image': image, 'symbol_file': symbol_file, 'uuid': uuid})
+
+    def add_skipped_image(self, image, symbol_file, uuid, reason, frames):
+        """
+        :param reason: 跳过的原因
+        :param frames: 因此未解析的栈帧数
+        """
+        key = (image, symbol_file, uuid, reason)
+        with self.__lock:
+            self.skipped_images[key] = self.skipped_images.get(key, 0) + frames
+
+    def add_fingerprint(self, fingerprint, line_num):
+        """
+        :param fingerprint: crash指纹
+        :param line_num: crash第一个栈帧的行号
+        """
+        with self.__lock:
+            entry = self.fingerprints.get(fingerprint)
+            if entry is None:
+                self.fingerprints[fingerprint] = [1, line_num]
+            else:
+                entry[0] += 1
+
+    def add_frames(self, crashes, frames, resolved):
+        with self.__lock:
+            self.crashes += crashes
+            self.frames += frames
+            self.resolved += resolved
+
+    def set_cache(self, name, hits, misses):
+        with self.__lock:
+            self.caches[name] = {'hits': hits, 'misses': misses}
+
+    @property
+    def unresolved(self):
+        return self.frames - self.resolved
+
+    def to_dict(self):
+        with self.__lock:
+            images = dict()
+            for (tool, image), timing in self.image_commands.items():
+                images.setdefault(tool, dict())[image] = timing.to_dict()
+            caches = dict()
+            for name, cache in self.caches.items():
+                lookups = cache['hits'] + cache['misses']
+                caches[name] = dict(cache, hit_rate=cache['hits'] / lookups if lookups > 0 else 0.0)
+            return {'stages': {name: timing.to_dict() for name, timing in self.stages.items()},
+                    'commands': {tool: dict(timing.to_dict(), images=images.get(tool, dict())) for tool, timing in self.commands.items()},
+                    'caches': caches,
+                    'crashes': self.crashes,
+                    'frames': self.frames,
+                    'resolved': self.resolved,
+                    'unresolved': self.frames - self.resolved,
+                    'uuid_mismatches': list(self.uuid_mismatches),
+                    'skipped_images': [{'image': image, 'symbol_file': symbol_file, 'uuid': uuid, 'reason': reason, 'frames': frames}
+                                       for (image, symbol_file, uuid, reason), frames in self.skipped_images.items()],
+                    'duplicates': {'unique': len(self.fingerprints),
+                                   'clusters': [{'fingerprint': fingerprint, 'count': count, 'line_num': line_num}
+                                                for fingerprint, (count, line_num) in sorted(self.fingerprints.items(), key=lambda item: (-item[1][0], item[1][1]))
+                                                if count > 1]}}
+
+    def format(self):
+        """
+        :return: 便于阅读的文本
+        """
+        stats = self.to_dict()
+        lines = ['{:<16}{:>8}{:>12}{:>12}'.format('stage', 'count', 'total(s)', 'max(s)')]
+        for name, timing in stats['stages'].items():
+            lines.append('{:<16}{:>8}{:>12.4f}{:>12.4f}'.format(name, timing['count'], timing['total'], timing['max']))
+        for tool, timing in sorted(stats['commands'].items()):
+            lines.append('{tool}: {count} calls, {total:.4f}s total, {max:.4f}s max'.format(tool=tool, **timing))
+            for image, image_timing in sorted(timing['images'].items(), key=lambda item: -item[1]['total']):
+                lines.append('  {image}: {count} calls, {total:.4f}s total, {max:.4f}s max'.format(image=image, **image_timing))
+        for name, cache in sorted(stats['caches'].items()):
+            lines.append('{name}: {hits} hits, {misses} misses ({rate:.1f}%)'.format(name=name, hits=cache['hits'], misses=cache['misses'], rate=cache['hit_rate'] * 100))
+        lines.append('crashes: {crashes}, frames: {frames}, resolved: {resolved}, unresolved: {unresolved}'.format(**stats))
+        lines.append('uuid mismatches: {count}'.format(count=len(stats['uuid_mismatches'])))
+        for mismatch in stats['uuid_mismatches']:
+            lines.append('  {image} {uuid} "{symbol_file}"'.format(**mismatch))
+        lines.append('skipped images: {count}'.format(count=len(stats['skipped_images'])))
+        for skipped in stats['skipped_images']:
+            lines.append('  {image}: {frames} frames, {reason} "{symbol_file}"'.format(**skipped))
+        duplicates = stats['duplicates']
+        lines.append('unique crashes: {unique}, duplicate clusters: {count}'.format(unique=duplicates['unique'], count=len(duplicates['clusters'])))
+        for cluster in duplicates['clusters'][:10]:
+            lines.append('  {count} crashes like line {line}: {fingerprint}'.format(count=cluster['count'], line=cluster['line_num'] + 1, fingerprint=cluster['fingerprint'][:16]))
+        return '\n'.join(lines)
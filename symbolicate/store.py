@@ -0,0 +1,190 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .macho import read_uuids
+
+__author__ = 'jinzhao'
+
+
+def _read_file_uuids(item):
+    path, size, mtime = item
+    try:
+        return read_uuids(path) if size > 0 else dict()
+    except (IOError, OSError, ValueError):
+        return dict()
+
+
+class SymbolStore(object):
+    """
+    符号文件索引，扫描DeviceSupport目录、dSYM及其他目录中的Mach-O文件，记录uuid和cpu架构对应的文件路径。
+    指定cache_dir时索引保存在该目录下，再次扫描时只读取大小或修改时间变化的文件。
+    可以直接作为finder_func使用。
+    """
+    store_name = 'symbol_store.json'
+    # 扫描时每读取这么多文件保存一次索引，中断后再次扫描可以从已保存的位置继续
+    save_interval = 1000
+
+    def __init__(self, roots=None, cache_dir=None, scan=True):
+        """
+        :param roots: 扫描的目录list
+        :param cache_dir: 持久化索引的目录，默认为None，表示不保存
+        :param scan: 是否在创建时扫描roots
+        """
+        self.roots = [os.path.expanduser(root) for root in (roots or list())]
+        self.cache_dir = cache_dir
+        self.__lock = threading.Lock()
+        # path -> (size, mtime_ns, {arch: uuid})
+        self.__files = dict()
+        # uuid -> (path, arch)
+        self.__uuids = dict()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir is not None:
+            self.__load()
+        if scan is True:
+            self.scan()
+
+    def __getstate__(self):
+        # 传递给其他进程时不包含锁
+        state = self.__dict__.copy()
+        del state['_SymbolStore__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def __store_path(self):
+        return os.path.join(os.path.expanduser(self.cache_dir), self.store_name)
+
+    def __load(self):
+        try:
+            with open(self.__store_path(), 'r') as file:
+                for path, size, mtime, uuids in json.load(file):
+                    self.__add(path, size, mtime, uuids)
+        except (IOError, ValueError, TypeError):
+            self.__files = dict()
+            self.__uuids = dict()
+
+    def save(self):
+        """
+        将索引写入cache_dir，未指定cache_dir时不做任何事
+        :return 是否成功
+        """
+        if self.cache_dir is None:
+            return True
+        store_path = self.__store_path()
+        with self.__lock:
+            entries = [[path, size, mtime, uuids] for path, (size, mtime, uuids) in self.__files.items()]
+        try:
+            os.makedirs(os.path.dirname(store_path), exist_ok=True)
+            # 多个线程或进程可能同时保存，各自写入独立的临时文件
+            temp_path = '{path}.{pid}.{thread}.tmp'.format(path=store_path, pid=os.getpid(), thread=threading.get_ident())
+            with open(temp_path, 'w') as file:
+                json.dump(entries, file)
+            os.replace(temp_path, store_path)
+        except (IOError, OSError):
+            return False
+        return True
+
+    def __add(self, path, size, mtime, uuids):
+        self.__files[path] = (size, mtime, uuids)
+        for arch, uuid in uuids.items():
+            self.__uuids[uuid] = (path, arch)
+
+    def __remove(self, path):
+        entry = self.__files.pop(path, None)
+        if entry is not None:
+            for uuid in entry[2].values():
+                if self.__uuids.get(uuid, (None,))[0] == path:
+                    del self.__uuids[uuid]
+
+    def scan(self, roots=None, workers=1, progress=None):
+        """
+        扫描目录，只读取新增或大小、修改时间变化的文件，已删除的文件从索引中移除
+        :param roots: 扫描的目录list，默认为创建时指定的roots
+        :param workers: 并发读取文件的线程数
+        :param progress: (done:Int, total:Int) -> None，每读取一个文件调用一次
+        :return: dict，包含扫描的文件数、读取的文件数及索引的uuid数
+        """
+        roots = [os.path.expanduser(root) for root in roots] if roots is not None else self.roots
+        scanned = 0
+        seen = set()
+        changed = list()
+        for root in roots:
+            for directory, dirs, files in os.walk(root):
+                dirs.sort()
+                for name in files:
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    scanned += 1
+                    seen.add(path)
+                    entry = self.__files.get(path)
+                    if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                        continue
+                    changed.append((path, stat.st_size, stat.st_mtime_ns))
+        if workers is None or workers <= 1:
+            self.__add_files(changed, map(_read_file_uuids, changed), progress)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                self.__add_files(changed, executor.map(_read_file_uuids, changed), progress)
+        # 扫描范围内已经不存在的文件
+        prefixes = tuple(os.path.join(root, '') for root in roots)
+        with self.__lock:
+            for path in [path for path in self.__files if path.startswith(prefixes) and path not in seen]:
+                self.__remove(path)
+        self.save()
+        return {'scanned': scanned, 'read': len(changed), 'uuids': len(self.__uuids)}
+
+    def __add_files(self, changed, results, progress):
+        for done, ((path, size, mtime), uuids) in enumerate(zip(changed, results), 1):
+            with self.__lock:
+                self.__remove(path)
+                self.__add(path, size, mtime, uuids)
+            if progress is not None:
+                progress(done, len(changed))
+            if done % self.save_interval == 0:
+                self.save()
+
+    def lookup(self, uuid, code_type=None):
+        """
+        :param uuid: image的uuid
+        :param code_type: cpu架构，指定时要求与索引中的一致
+        :return: 符号文件路径，未找到或文件在扫描后已经变化时返回None
+        """
+        entry = self.__uuids.get(uuid.upper()) if uuid else None
+        if entry is not None and (code_type is None or entry[1] == code_type) and self.__unchanged(entry[0]) is False:
+            entry = None
+        if entry is None or (code_type is not None and entry[1] != code_type):
+            with self.__lock:
+                self.misses += 1
+            return None
+        with self.__lock:
+            self.hits += 1
+        return entry[0]
+
+    def __unchanged(self, path):
+        # 索引可能来自之前的warm，文件删除或修改后不再可信
+        entry = self.__files.get(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns
+
+    def items(self):
+        """
+        :return: list of (uuid, arch, path)
+        """
+        with self.__lock:
+            return [(uuid, arch, path) for uuid, (path, arch) in self.__uuids.items()]
+
+    def __call__(self, name, identifier, version, codetype, uuid):
+        return self.lookup(uuid)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'files': len(self.__files), 'uuids': len(self.__uuids)}
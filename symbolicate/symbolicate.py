@@ -1,22 +1,94 @@
 from logutils import *
 import re
+import json
+import hashlib
 from subprocess import getstatusoutput
 import os
+import time
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .cache import UUIDCache, NegativeCache, ResultCache
+from .stats import SymbolicateStats
+from .macho import read_uuids
+from .images import ImageIndex
+from .sidecar import save_state, load_state
+from .store import SymbolStore
+from .index import SymbolIndexStore
 
 __author__ = 'jinzhao'
 
+# 每次调用atos传入的地址数上限
+_ATOS_MAX_ADDRESSES = 1000
+
 def version():
     return '1.0.0'
 
-def symbolicate_crash(crash_log, finder_func, output_path=None, verbose_mode=False):
+def default_cache_dir():
+    """
+    默认的缓存目录
+    """
+    return '~/.symbolicatecrash'
+
+def symbolicate_crash(crash_log, finder_func, output_path=None, verbose_mode=False, uuid_cache=None, resolver=None, index_store=None, workers=1, max_processes=None, stream=False, atos_pool=None, symbol_store=None, negative_cache=None, result_cache=None, state_path=None, resume=False, output_format='text'):
     """
     符号化crash日志
     :param crash_log:crash日志文件路径
-    :param finder_func:查询app符号文件的处理函数，定义为:(name:string, identifier:string, version:string, codetype:string, uuid:string) -> (path)
+    :param finder_func:查询app符号文件的处理函数，定义为:(name:string, identifier:string, version:string, codetype:string, uuid:string) -> (path)，为None时使用symbol_store，两者都为None时抛出ValueError
     :param output_path:符号化之后的crash文件路径，默认为none，表示直接输出到stdin
     :param verbos_mode:是否开启调试模式
+    :param uuid_cache:UUIDCache对象，默认为None，表示只在本次任务内缓存符号文件uuid
+    :param resolver:NativeResolver对象，默认为None，表示使用atos解析符号
+    :param index_store:SymbolIndexStore对象，默认为None，表示不使用持久化的符号索引
+    :param workers:并发解析的线程数，默认为1，表示串行解析
+    :param max_processes:同时运行的atos/dwarfdump进程数上限，默认与workers相同
+    :param stream:是否使用流式处理，开启后逐个crash读取、符号化并写入输出，适合多个crash拼接的大文件
+    :param atos_pool:AtosPool对象，默认为None，表示每个image单独启动一次atos
+    :param symbol_store:SymbolStore对象，默认为None，指定时按uuid查找所有image的符号文件
+    :param negative_cache:NegativeCache对象，默认为None，表示只在本次任务内跳过符号文件不存在或uuid不一致的image
+    :param result_cache:ResultCache对象，默认为None，表示只在本次任务内复用完全相同的crash的结果
+    :param state_path:状态文件路径，默认为None，指定时保存解析后的crash及各栈帧的解析结果，流式处理时不保存
+    :param resume:是否从state_path继续，只重新解析未解析的栈帧，状态文件无效时完整处理
+    :param output_format:'text'输出符号化之后的crash日志；'ndjson'每个crash完成后输出一行JSON，内容与symbolicate_records相同
     :return 是否成功
     """
+    return _symbolicate_crash(crash_log, finder_func, output_path, verbose_mode, uuid_cache, resolver, index_store, workers, max_processes, stream, atos_pool,
+                              symbol_store, negative_cache, result_cache, state_path, resume, output_format)
+
+def symbolicate_crash_with_stats(crash_log, finder_func, output_path=None, verbose_mode=False, uuid_cache=None, resolver=None, index_store=None, workers=1, max_processes=None, stream=False, atos_pool=None, symbol_store=None, negative_cache=None, result_cache=None, state_path=None, resume=False, output_format='text'):
+    """
+    与symbolicate_crash相同，同时统计各stage耗时、外部命令调用、缓存命中率及栈帧解析情况
+    :return (是否成功, SymbolicateStats对象)
+    """
+    stats = SymbolicateStats()
+    result = _symbolicate_crash(crash_log, finder_func, output_path, verbose_mode, uuid_cache, resolver, index_store, workers, max_processes, stream, atos_pool,
+                                symbol_store, negative_cache, result_cache, state_path, resume, output_format, stats)
+    return (result, stats)
+
+def _symbolicate_crash(crash_log, finder_func, output_path, verbose_mode, uuid_cache, resolver, index_store, workers, max_processes, stream, atos_pool, symbol_store=None, negative_cache=None, result_cache=None,
+                       state_path=None, resume=False, output_format='text', stats=None):
+    finder_func = _default_finder(finder_func, symbol_store)
+    _set_verbose_mode(verbose_mode)
+    context = _SymbolicateContext(uuid_cache, resolver, index_store, max_processes if max_processes is not None else workers, atos_pool, stats,
+                                  symbol_store, negative_cache, result_cache)
+    result = _symbolicate_log(crash_log, finder_func, output_path, context, workers, stream, state_path, resume, output_format)
+    context.finish()
+    return result is not None
+
+def _default_finder(finder_func, symbol_store):
+    """
+    :return: finder_func为None时使用symbol_store查找app符号文件
+    """
+    if finder_func is not None:
+        return finder_func
+    if symbol_store is None:
+        raise ValueError('finder_func and symbol_store cannot both be None')
+    return symbol_store
+
+def _set_verbose_mode(verbose_mode):
+    """
+    非调试模式下关闭日志输出
+    """
     if verbose_mode is False:
         global loge
         global logd
@@ -24,40 +96,384 @@ def symbolicate_crash(crash_log, finder_func, output_path=None, verbose_mode=Fal
         loge = lambda x : x
         logd = lambda x : x
         logi = lambda x : x
-    status, lines = _read_log(crash_log)
+
+def symbolicate_stream(lines, finder_func, uuid_cache=None, resolver=None, index_store=None, workers=1, max_processes=None, atos_pool=None, symbol_store=None, negative_cache=None, result_cache=None):
+    """
+    流式符号化，每个crash的Binary Images部分结束后立即符号化并输出，内存占用不超过一个crash的内容
+    :param lines: 行的迭代器，如打开的文件对象
+    :param finder_func: 查询app符号文件的处理函数，定义与symbolicate_crash相同
+    :param uuid_cache: UUIDCache对象
+    :param resolver: NativeResolver对象，默认为None，表示使用atos解析符号
+    :param index_store: SymbolIndexStore对象
+    :param workers: 每个crash内并发解析的线程数
+    :param max_processes: 同时运行的atos/dwarfdump进程数上限，默认与workers相同
+    :param atos_pool: AtosPool对象
+    :param symbol_store: SymbolStore对象
+    :param negative_cache: NegativeCache对象
+    :param result_cache: ResultCache对象
+    :return: 符号化之后的行的generator
+    """
+    context = _SymbolicateContext(uuid_cache, resolver, index_store, max_processes if max_processes is not None else workers, atos_pool,
+                                  symbol_store=symbol_store, negative_cache=negative_cache, result_cache=result_cache)
+    finder_func = _default_finder(finder_func, symbol_store)
+    try:
+        for line in _stream_symbolicated_lines(lines, finder_func, context, workers):
+            yield line
+    finally:
+        context.finish()
+
+def _stream_symbolicated_lines(lines, finder_func, context, workers=1, counts=None):
+    """
+    :param lines: 行的迭代器
+    :param finder_func: 查询app符号文件的处理函数
+    :param context: _SymbolicateContext object
+    :param workers: 线程数
+    :param counts: 长度为3的list，累加crash数量、栈帧数量及解析成功的栈帧数量
+    :return: 符号化之后的行的generator
+    """
+    # block保存尚未输出的行，block_start为block第一行的行号
+    block = list()
+    block_start = 0
+
+    def read_lines():
+        for line in lines:
+            block.append(line)
+            yield line
+
+    for crash_obj in _parse_crashes(read_lines(), finder_func):
+        if crash_obj is not None:
+            _symbolicate_crash_list([crash_obj], context, workers)
+            with context.stage('compose'):
+                _compose_log([crash_obj], block, block_start)
+            _count_crash_list([crash_obj], counts)
+        for output_line in block:
+            yield output_line
+        block_start += len(block)
+        del block[:]
+    # 文件末尾不完整的crash原样输出
+    for output_line in block:
+        yield output_line
+
+def symbolicate_records(lines, finder_func, uuid_cache=None, resolver=None, index_store=None, workers=1, max_processes=None, atos_pool=None, symbol_store=None,
+                        negative_cache=None, result_cache=None):
+    """
+    流式符号化，每个crash完成后产生一个dict，供下游直接使用而不需要再解析文本。
+    dict包含product_name、identifier、version、code_type、os_version，
+    frames：栈帧list，每项包含log_line、image、address、offset、symbol、file、line及resolved，
+    images：image list，每项包含name、load_address、end_address、code_type、uuid及symbol_file
+    :param lines: 行的迭代器，如打开的文件对象
+    :param finder_func: 查询app符号文件的处理函数，定义与symbolicate_crash相同
+    其他参数与symbolicate_stream相同
+    :return: dict的generator
+    """
+    context = _SymbolicateContext(uuid_cache, resolver, index_store, max_processes if max_processes is not None else workers, atos_pool,
+                                  symbol_store=symbol_store, negative_cache=negative_cache, result_cache=result_cache)
+    finder_func = _default_finder(finder_func, symbol_store)
+    try:
+        for record in _symbolicated_records(lines, finder_func, context, workers):
+            yield record
+    finally:
+        context.finish()
+
+def _symbolicated_records(lines, finder_func, context, workers=1, counts=None):
+    """
+    :return: 每个crash符号化之后的dict的generator
+    """
+    for crash_obj in _parse_crashes(lines, finder_func):
+        if crash_obj is not None:
+            _symbolicate_crash_list([crash_obj], context, workers)
+            _count_crash_list([crash_obj], counts)
+            with context.stage('compose'):
+                record = _crash_record(crash_obj)
+            yield record
+
+def _ndjson_lines(lines, finder_func, context, workers=1, counts=None):
+    """
+    :return: 每个crash一行JSON的generator
+    """
+    for record in _symbolicated_records(lines, finder_func, context, workers, counts):
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+def _crash_record(crash_obj):
+    """
+    :param crash_obj: CrashInfo object
+    :return: dict
+    """
+    frames = list()
+    for stack_item in crash_obj.function_stacks:
+        image_item = crash_obj.image_for(stack_item)
+        function, file_name, line = _split_symbol(stack_item.invoke_symbol)
+        frames.append({'log_line': stack_item.line_num,
+                       'image': image_item.name if image_item is not None else stack_item.name,
+                       'address': stack_item.invoke_address,
+                       'offset': stack_item.address - int(image_item.load_address, 16) if image_item is not None else stack_item.offset,
+                       'symbol': function,
+                       'file': file_name,
+                       'line': line,
+                       'resolved': len(stack_item.invoke_symbol) > 0})
+    images = [{'name': image_item.name, 'load_address': image_item.load_address, 'end_address': image_item.end_address,
+               'code_type': image_item.code_type, 'uuid': image_item.uuid, 'symbol_file': image_item.symbol_file}
+              for image_item in crash_obj.image_index]
+    return {'product_name': crash_obj.product_name,
+            'identifier': crash_obj.identifier,
+            'version': crash_obj.version,
+            'code_type': crash_obj.code_type,
+            'os_version': crash_obj.os_version,
+            'frames': frames,
+            'images': images}
+
+def _split_symbol(symbol):
+    """
+    :param symbol: atos格式的符号
+    :return: function:String, file:String, line:Int，未解析时function为None，没有源码位置时file及line为None
+    """
+    if len(symbol) == 0:
+        return (None, None, None)
+    match_obj = _symbol_re_obj.match(symbol)
+    if match_obj is None:
+        return (symbol, None, None)
+    if match_obj.group(3) is not None:
+        return (match_obj.group(1), match_obj.group(3), int(match_obj.group(4)))
+    return (match_obj.group(1), None, None)
+
+def _count_crash_list(crash_list, counts):
+    """
+    累加crash数量、栈帧数量及解析成功的栈帧数量
+    """
+    if counts is None:
+        return
+    for crash_obj in crash_list:
+        counts[0] += 1
+        counts[1] += len(crash_obj.function_stacks)
+        counts[2] += len([stack_item for stack_item in crash_obj.function_stacks if len(stack_item.invoke_symbol) > 0])
+
+def _symbolicate_log(crash_log, finder_func, output_path, context, workers=1, stream=False, state_path=None, resume=False, output_format='text'):
+    """
+    :param crash_log: crash日志文件路径
+    :param finder_func: 查询app符号文件的处理函数
+    :param output_path: 输出文件路径，为None时输出到stdout
+    :param context: _SymbolicateContext object
+    :param workers: 线程数
+    :param stream: 是否使用流式处理
+    :param state_path: 状态文件路径
+    :param resume: 是否从状态文件继续
+    :param output_format: 'text'或'ndjson'，ndjson总是流式处理
+    :return: (crash数量, 栈帧数量, 解析成功的栈帧数量)，失败时返回None
+    """
+    counts = [0, 0, 0]
+    if (state_path is not None or resume is True) and (stream is True or output_format == 'ndjson'):
+        loge('state file is not supported in stream mode or ndjson output, ignored')
+    if output_format == 'ndjson':
+        with context.stage('stream'):
+            status = _stream_log(crash_log, output_path, _ndjson_lines, finder_func, context, workers, counts)
+        context.add_frames(counts)
+        if status is False:
+            return None
+        return tuple(counts)
+    if stream is True:
+        with context.stage('stream'):
+            status = _stream_log(crash_log, output_path, _stream_symbolicated_lines, finder_func, context, workers, counts)
+        context.add_frames(counts)
+        if status is False:
+            return None
+        return tuple(counts)
+    with context.stage('read'):
+        status, lines = _read_log(crash_log)
     if status is False:
         loge('cannot open log file "{log_file}"'.format(log_file=crash_log))
-        return False
-    crash_list = _parse_content(lines, finder_func)
-    logd('there is %d crash obj' % len(crash_list))
-    crash_list = map(lambda obj: _symbolicate_stack_items(obj), crash_list)
-    newlines = _compose_log(crash_list, lines)
-    if output_path is None:
-        for line in newlines:
-            print(line.rstrip('\n'))
+        return None
+    crash_list = None
+    if resume is True and state_path is not None:
+        with context.stage('load_state'):
+            crash_list = load_state(state_path, crash_log)
+        if crash_list is None:
+            logi('state file "{state_path}" is missing or out of date'.format(state_path=state_path))
+    if crash_list is None:
+        with context.stage('parse'):
+            crash_list = _parse_content(lines, finder_func)
+        logd('there is %d crash obj' % len(crash_list))
+        crash_list = _symbolicate_crash_list(crash_list, context, workers)
     else:
-        if _write_log(output_path, newlines) is False:
+        # app符号文件可能已经找到，重新查询后只解析之前未解析的栈帧
+        for crash_obj in crash_list:
+            _finish_crash(crash_obj, finder_func)
+        _symbolicate_crash_list(_unresolved_crash_list(crash_list), context, workers)
+    if state_path is not None:
+        with context.stage('save_state'):
+            if save_state(state_path, crash_log, crash_list) is False:
+                loge('cannot write state file "{state_path}"'.format(state_path=state_path))
+    with context.stage('compose'):
+        newlines = _compose_log(crash_list, lines)
+    with context.stage('write'):
+        if output_path is None:
+            for line in newlines:
+                print(line.rstrip('\n'))
+        elif _write_log(output_path, newlines) is False:
             loge('cannot write into file "{log_file}"'.format(log_file=output_path))
-            return False
+            return None
+    _count_crash_list(crash_list, counts)
+    context.add_frames(counts)
+    return tuple(counts)
+
+def _stream_log(crash_log, output_path, stream_func, *args):
+    """
+    逐行读取crash日志，stream_func产生的行立即写入输出
+    :param stream_func: (lines, *args) -> generator of lines
+    :return 是否成功
+    """
+    try:
+        with open(crash_log, 'r') as file:
+            logi('open file {log_path} for reading'.format(log_path=crash_log))
+            if output_path is None:
+                for line in stream_func(file, *args):
+                    print(line.rstrip('\n'))
+                return True
+            with open(output_path, 'w') as output:
+                logi('open file {log_path} for writting'.format(log_path=output_path))
+                for line in stream_func(file, *args):
+                    output.write(line)
+    except (IOError, OSError) as e:
+        loge(e)
+        return False
     return True
 
-def query_uuid(code_type, symbol_file):
+def query_uuid(code_type, symbol_file, uuid_cache=None):
     """
     符号文件uuid查询
     :param codetype: cpu架构版本
     :param symbol_file: 符号文件路径
+    :param uuid_cache: UUIDCache对象，默认为None，表示不使用缓存
     :return uuid
     """
-    uuid_re_obj = re.compile(_match_dwarfdump_uuid_re())
-    logd('dwarfdump --uuid --arch {code_type} {symbol_file}'.format(code_type=code_type, symbol_file=symbol_file))
-    status, output = getstatusoutput('dwarfdump --uuid --arch {code_type} {symbol_file}'.format(code_type=code_type, symbol_file=symbol_file))
+    status, output_uuid, output = _query_uuid(code_type, symbol_file, _SymbolicateContext(uuid_cache))
+    return output_uuid
+
+def warm_symbols(roots=None, crash_logs=None, cache_dir=None, workers=8, build_index=True, progress=None):
+    """
+    预先扫描符号目录并建立uuid缓存及符号索引，新的iOS版本发布后第一次符号化不再需要冷启动atos/dwarfdump。
+    中断后再次运行只处理尚未完成的部分
+    :param roots: 符号文件目录list，默认为iOS DeviceSupport目录
+    :param crash_logs: crash日志路径list，指定时只为其中引用的image建立缓存
+    :param cache_dir: 缓存目录，默认为default_cache_dir()
+    :param workers: 并发读取符号文件及建立索引的线程数
+    :param build_index: 是否建立符号索引
+    :param progress: (stage:String, done:Int, total:Int) -> None，stage为'scan'或'index'
+    :return: dict，包含扫描的文件数、读取的文件数、uuid数、需要预热的image数、找不到符号文件的image数及新建的索引数
+    """
+    cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+    roots = roots if roots else [_os_symbol_file_path_prefix()]
+    symbol_store = SymbolStore(roots, cache_dir, scan=False)
+    summary = symbol_store.scan(workers=workers, progress=(lambda done, total: progress('scan', done, total)) if progress is not None else None)
+    if crash_logs is not None:
+        images = set()
+        for crash_log in crash_logs:
+            status, lines = _read_log(crash_log)
+            if status is False:
+                continue
+            for crash_obj in _parse_crashes(lines, lambda *args: ''):
+                if crash_obj is not None:
+                    images.update((image_item.uuid, image_item.code_type) for image_item in crash_obj.image_index if len(image_item.uuid) > 0)
+        targets = list()
+        for uuid, code_type in sorted(images):
+            path = symbol_store.lookup(uuid, code_type)
+            if path is not None:
+                targets.append((uuid, code_type, path))
+        summary['missing'] = len(images) - len(targets)
+    else:
+        targets = sorted(symbol_store.items())
+        summary['missing'] = 0
+    summary['images'] = len(targets)
+    uuid_cache = UUIDCache(cache_dir)
+    for uuid, code_type, path in targets:
+        uuid_cache.set(path, code_type, uuid)
+    uuid_cache.save()
+    summary['indexed'] = 0
+    if build_index is True:
+        index_store = SymbolIndexStore(cache_dir)
+
+        def build(target):
+            uuid, code_type, path = target
+            # 已经建立的索引直接跳过
+            return index_store.exists(uuid, code_type) is False and len(index_store.build(path, code_type)) > 0
+
+        # 建立索引时不持有索引目录的锁，与读取uuid一样由workers个线程并发进行
+        with ThreadPoolExecutor(max_workers=max(workers or 1, 1)) as executor:
+            futures = [executor.submit(build, target) for target in targets]
+            for done, future in enumerate(as_completed(futures), 1):
+                if future.result() is True:
+                    summary['indexed'] += 1
+                if progress is not None:
+                    progress('index', done, len(targets))
+        index_store.close()
+    return summary
+
+def _query_uuid(code_type, symbol_file, context):
+    """
+    :param code_type: cpu架构版本
+    :param symbol_file: 符号文件路径
+    :param context: _SymbolicateContext对象
+    :return status:Bool, uuid:String, output:String
+    """
+    result = _query_local_uuid(code_type, symbol_file, context)
+    if result is not None:
+        return result
+    # 无法识别的文件格式交给dwarfdump处理
+    command = 'dwarfdump --uuid --arch {code_type} {symbol_file}'.format(code_type=code_type, symbol_file=_escape_path(symbol_file))
+    logd(command)
+    status, output = context.run_command(command, 'dwarfdump', symbol_file)
+    return _parse_dwarfdump_output(code_type, symbol_file, status, output, context)
+
+def _query_local_uuid(code_type, symbol_file, context):
+    """
+    从缓存或Mach-O文件头读取uuid
+    :return status:Bool, uuid:String, output:String，需要调用dwarfdump时返回None
+    """
+    uuid_cache = context.uuid_cache
+    output_uuid = uuid_cache.get(symbol_file, code_type)
+    if output_uuid is not None:
+        return (True, output_uuid, '')
+    path = os.path.expanduser(symbol_file)
+    if os.path.isfile(path) is False:
+        return (False, '', 'cannot find symbol file "{symbol_file}"'.format(symbol_file=symbol_file))
+    try:
+        uuids = read_uuids(path)
+    except (IOError, OSError) as e:
+        return (False, '', str(e))
+    if len(uuids) > 0:
+        output_uuid = uuids.get(code_type)
+        if output_uuid is None:
+            return (False, '', 'symbol file "{symbol_file}" has no {code_type} uuid'.format(symbol_file=symbol_file, code_type=code_type))
+        uuid_cache.set(symbol_file, code_type, output_uuid)
+        return (True, output_uuid, '')
+    return None
+
+def _parse_dwarfdump_output(code_type, symbol_file, status, output, context):
+    """
+    :param status: dwarfdump的退出码
+    :param output: dwarfdump的输出
+    :return status:Bool, uuid:String, output:String
+    """
     output_uuid = ''
-    uuid_match_obj = uuid_re_obj.match(output)
+    uuid_match_obj = _dwarfdump_uuid_re_obj.match(output)
     if uuid_match_obj is not None:
         output_uuid = ''.join(uuid_match_obj.groups())
     else:
         loge('cannot parse the output of dwarfdump')
-    return output_uuid
+    if status != 0 or uuid_match_obj is None:
+        return (False, output_uuid, output)
+    context.uuid_cache.set(symbol_file, code_type, output_uuid)
+    return (True, output_uuid, output)
+
+def _escape_path(path):
+    """
+    为文件路径中shell不支持的字符添加转义
+    """
+    def proccess_path(match_obj):
+        matched_str = match_obj.group(1)
+        if len(matched_str) > 0 and matched_str[0] != '\\':
+            return '\\'+matched_str
+        return matched_str
+    return _proccess_file_path_re_obj.sub(proccess_path, path)
 
 def _match_crash_header_re():
     """
@@ -111,7 +527,7 @@ def _match_image_item_re():
     """
     匹配image信息
     """
-    return r'^\s*(0x[a-f0-9]+)\s\-\s+0x[a-f0-9]+\s+([a-zA-Z0-9\-_\+\.]+)\s+([a-z0-9]+)\s+(<([a-f0-9]+)>\s)?([\S.]+)\s*$'
+    return r'^\s*(0x[a-f0-9]+)\s\-\s+(0x[a-f0-9]+)\s+([a-zA-Z0-9\-_\+\.]+)\s+([a-z0-9]+)\s+(<([a-f0-9]+)>\s)?([\S.]+)\s*$'
 
 def _match_stack_header_re():
     """
@@ -137,210 +553,202 @@ def _match_dwarfdump_uuid_re():
     """
     return r'^UUID:\s([A-F0-9]+)\-([A-F0-9]+)\-([A-F0-9]+)\-([A-F0-9]+)\-([A-F0-9]+)\s\([a-z0-9]+\)\s.+$'
 
+def _match_symbol_re():
+    """
+    匹配atos格式的符号，如main (in MyApp) (main.m:12)或objc_msgSend (in libobjc.A.dylib) + 16
+    """
+    return r'^(.+?)\s\(in\s(.+?)\)(?:\s\((.+):(\d+)\)|\s\+\s(\d+))?\s*$'
+
 def _os_symbol_file_path_prefix():
     """
     iOS系统相关符号文件路径前缀
     """
     return '~/Library/Developer/Xcode/iOS DeviceSupport'
 
+# 解析时使用的正则在模块加载时编译一次
+_crash_header_re_obj = re.compile(_match_crash_header_re())
+_product_name_re_obj = re.compile(_match_product_name_re())
+_identifier_re_obj = re.compile(_match_identifier_re())
+_version_re_obj = re.compile(_match_version_re())
+_code_type_re_obj = re.compile(_match_code_type_re())
+_os_version_re_obj = re.compile(_match_os_version_re())
+_stack_item_re_obj = re.compile(_match_stack_item_re())
+_stack_item_symbol_re_obj = re.compile(_sub_stack_item_symbol_re())
+_image_item_re_obj = re.compile(_match_image_item_re())
+_image_header_re_obj = re.compile(_match_image_header_re())
+_proccess_file_path_re_obj = re.compile(_sub_proccess_file_path_re())
+_dwarfdump_uuid_re_obj = re.compile(_match_dwarfdump_uuid_re())
+_symbol_re_obj = re.compile(_match_symbol_re())
+
 class CrashInfo(object):
     """
-    crash数据结构
+    crash数据结构，binary_images以名称为键，image_index包含所有image并按地址范围查找
     """
-    def __init__(self):
-        self.__product_name = None
-        self.__identifier = None
-        self.__version = None
-        self.__code_type = None
-        self.__os_version = None
-        self.__function_stacks = None
-        self.__binary_images = None
-
-    @property
-    def product_name(self):
-        if self.__product_name is None:
-            self.__product_name = ''
-        return self.__product_name
-
-    @product_name.setter
-    def product_name(self, value):
-        self.__product_name = value
-
-    @property
-    def identifier(self):
-        if self.__identifier is None:
-            self.__identifier = ''
-        return self.__identifier
-
-    @identifier.setter
-    def identifier(self, value):
-        self.__identifier = value
-
-    @property
-    def version(self):
-        if self.__version is None:
-            self.__version = ''
-        return self.__version
-
-    @version.setter
-    def version(self, value):
-        self.__version = value
-
-    @property
-    def code_type(self):
-        if self.__code_type is None:
-            self.__code_type = ''
-        return self.__code_type
+    __slots__ = ('product_name', 'identifier', 'version', 'code_type', 'os_version', 'function_stacks', 'binary_images', 'image_index')
 
-    @code_type.setter
-    def code_type(self, value):
-        self.__code_type = value
-
-    @property
-    def os_version(self):
-        if self.__os_version is None:
-            self.__os_version = ''
-        return self.__os_version
-
-    @os_version.setter
-    def os_version(self, value):
-        self.__os_version = value
-
-    @property
-    def function_stacks(self):
-        if self.__function_stacks is None:
-            self.__function_stacks = list()
-        return self.__function_stacks
-
-    @property
-    def binary_images(self):
-        if self.__binary_images is None:
-            self.__binary_images = dict()
-        return self.__binary_images
+    def __init__(self):
+        self.product_name = ''
+        self.identifier = ''
+        self.version = ''
+        self.code_type = ''
+        self.os_version = ''
+        self.function_stacks = list()
+        self.binary_images = dict()
+        self.image_index = ImageIndex()
+
+    def add_image(self, image_item):
+        self.binary_images[image_item.name] = image_item
+        self.image_index.add(image_item)
+
+    def image_for(self, stack_item):
+        """
+        :param stack_item: StackItemInfo object
+        :return: 调用地址所在的ImageItemInfo，不在任何image范围内时按名称查找，都找不到时返回None
+        """
+        image_item = self.image_index.find(stack_item.address) if stack_item.invoke_address else None
+        if image_item is None:
+            image_item = self.binary_images.get(stack_item.name)
+        return image_item
 
 
 class StackItemInfo(object):
     """
-    栈信息结构
+    栈信息结构，批量任务中栈帧数量可达数百万，使用__slots__减少内存占用及属性访问开销
     """
-    def __init__(self):
-        self.__line_num = None
-        self.__name = None
-        self.__invoke_address = None
-        self.__load_address = None
-        self.__invoke_symbol = None
+    __slots__ = ('line_num', 'name', 'invoke_address', 'load_address', 'invoke_symbol', '_offset')
+
+    def __init__(self, line_num=-1, name='', invoke_address='', load_address='', invoke_symbol=''):
+        self.line_num = line_num
+        self.name = name
+        self.invoke_address = invoke_address
+        self.load_address = load_address
+        self.invoke_symbol = invoke_symbol
+        self._offset = None
+
+    def __addresses(self):
+        # 地址字符串只在第一次访问或被修改后转换一次
+        cached = self._offset
+        if cached is None or cached[0] is not self.invoke_address or cached[1] is not self.load_address:
+            address = int(self.invoke_address, 16) if self.invoke_address else 0
+            offset = address - int(self.load_address, 16) if self.invoke_address and self.load_address else 0
+            cached = self._offset = (self.invoke_address, self.load_address, address, offset)
+        return cached
 
     @property
-    def line_num(self):
-        if self.__line_num is None:
-            self.__line_num = -1
-        return self.__line_num
-
-    @line_num.setter
-    def line_num(self, value):
-        self.__line_num = value
+    def address(self):
+        """
+        调用地址Int
+        """
+        return self.__addresses()[2]
 
     @property
-    def name(self):
-        if self.__name is None:
-            self.__name = ''
-        return self.__name
-
-    @name.setter
-    def name(self, value):
-        self.__name = value
-
-    @property
-    def invoke_address(self):
-        if self.__invoke_address is None:
-            self.__invoke_address = ''
-        return self.__invoke_address
-
-    @invoke_address.setter
-    def invoke_address(self, value):
-        self.__invoke_address = value
-
-    @property
-    def load_address(self):
-        if self.__load_address is None:
-            self.__load_address = ''
-        return self.__load_address
-
-    @load_address.setter
-    def load_address(self, value):
-        self.__load_address = value
-
-    @property
-    def invoke_symbol(self):
-        if self.__invoke_symbol is None:
-            self.__invoke_symbol = ''
-        return self.__invoke_symbol
-
-    @invoke_symbol.setter
-    def invoke_symbol(self, value):
-        self.__invoke_symbol = value
+    def offset(self):
+        """
+        调用地址相对加载地址的偏移
+        """
+        return self.__addresses()[3]
 
 
 class ImageItemInfo(object):
     """
-    Image信息结构
+    Image信息结构，load_address及end_address为Binary Images中的地址范围
     """
-    def __init__(self):
-        self.__load_address = None
-        self.__name = None
-        self.__code_type = None
-        self.__uuid = None
-        self.__symbol_file = None
+    __slots__ = ('load_address', 'name', 'code_type', 'uuid', 'symbol_file', 'end_address')
 
-    @property
-    def load_address(self):
-        if self.__load_address is None:
-            self.__load_address = ''
-        return self.__load_address
-
-    @load_address.setter
-    def load_address(self, value):
-        self.__load_address = value
+    def __init__(self, load_address='', name='', code_type='', uuid='', symbol_file='', end_address=''):
+        self.load_address = load_address
+        self.name = name
+        self.code_type = code_type
+        self.uuid = uuid
+        self.symbol_file = symbol_file
+        self.end_address = end_address
 
-    @property
-    def name(self):
-        if self.__name is None:
-            self.__name = ''
-        return self.__name
 
-    @name.setter
-    def name(self, value):
-        self.__name = value
+_null_stage = nullcontext()
 
-    @property
-    def code_type(self):
-        if self.__code_type is None:
-            self.__code_type = ''
-        return self.__code_type
-
-    @code_type.setter
-    def code_type(self, value):
-        self.__code_type = value
-
-    @property
-    def uuid(self):
-        if self.__uuid is None:
-            self.__uuid = ''
-        return self.__uuid
-
-    @uuid.setter
-    def uuid(self, value):
-        self.__uuid = value
+class _SymbolicateContext(object):
+    """
+    一次符号化任务中共享的缓存、解析器及子进程数限制
+    """
+    def __init__(self, uuid_cache=None, resolver=None, index_store=None, max_processes=None, atos_pool=None, stats=None, symbol_store=None, negative_cache=None, result_cache=None):
+        self.uuid_cache = uuid_cache if uuid_cache is not None else UUIDCache()
+        self.negative_cache = negative_cache if negative_cache is not None else NegativeCache()
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self.resolver = resolver
+        self.index_store = index_store
+        self.atos_pool = atos_pool
+        self.process_slots = threading.BoundedSemaphore(max_processes) if max_processes is not None and max_processes > 0 else None
+        self.stats = stats
+        self.symbol_store = symbol_store
+        # 缓存可能在多个任务之间共享，只统计本次任务内的命中次数
+        self.__cache_baseline = self.__cache_stats() if stats is not None else None
 
     @property
-    def symbol_file(self):
-        if self.__symbol_file is None:
-            self.__symbol_file = ''
-        return self.__symbol_file
-
-    @symbol_file.setter
-    def symbol_file(self, value):
-        self.__symbol_file = value
+    def backend(self):
+        """
+        :return: 符号解析方式，'native'或'atos'
+        """
+        return 'native' if self.resolver is not None else 'atos'
+
+    def stage(self, name):
+        """
+        :return: 开启统计时返回记录耗时的context manager，否则返回空的context manager
+        """
+        if self.stats is None:
+            return _null_stage
+        return self.stats.stage(name)
+
+    def add_frames(self, counts):
+        if self.stats is not None:
+            self.stats.add_frames(*counts)
+
+    def run_command(self, command, tool=None, image=None):
+        """
+        运行atos/dwarfdump等外部命令，同时运行的进程数不超过max_processes
+        :param tool: 统计时使用的工具名称
+        :param image: 统计时使用的image名称
+        :return status:Int, output:String
+        """
+        if self.stats is None:
+            if self.process_slots is None:
+                return getstatusoutput(command)
+            with self.process_slots:
+                return getstatusoutput(command)
+        start = time.perf_counter()
+        if self.process_slots is None:
+            result = getstatusoutput(command)
+        else:
+            with self.process_slots:
+                # 等待进程数限制的时间单独统计
+                self.stats.add_stage('wait_process', time.perf_counter() - start)
+                start = time.perf_counter()
+                result = getstatusoutput(command)
+        self.stats.add_command(tool or command.split(' ', 1)[0], image, time.perf_counter() - start)
+        return result
+
+    def __cache_stats(self):
+        caches = {'uuid_cache': self.uuid_cache.stats(), 'negative_cache': self.negative_cache.stats(), 'result_cache': self.result_cache.stats()}
+        if self.index_store is not None:
+            caches['symbol_index'] = self.index_store.stats()
+        if self.symbol_store is not None:
+            caches['symbol_store'] = self.symbol_store.stats()
+        if self.atos_pool is not None:
+            pool_stats = self.atos_pool.stats()
+            caches['atos_pool'] = {'hits': pool_stats['reused'], 'misses': pool_stats['spawned']}
+        return caches
+
+    def finish(self):
+        logd('uuid cache: {stats}'.format(stats=self.uuid_cache.stats()))
+        if self.uuid_cache.save() is False:
+            loge('cannot write uuid cache into "{cache_dir}"'.format(cache_dir=self.uuid_cache.cache_dir))
+        if self.index_store is not None:
+            logd('symbol index: {stats}'.format(stats=self.index_store.stats()))
+        if self.atos_pool is not None:
+            logd('atos pool: {stats}'.format(stats=self.atos_pool.stats()))
+        if self.stats is not None:
+            for name, cache in self.__cache_stats().items():
+                baseline = self.__cache_baseline.get(name, dict())
+                self.stats.set_cache(name, cache['hits'] - baseline.get('hits', 0), cache['misses'] - baseline.get('misses', 0))
 
 
 def _read_log(path):
@@ -380,173 +788,458 @@ def _parse_content(lines, finder_func):
     :param finder_func: (name:String, identifier:String, version:String, codetype:String, uuid:String) -> (path)
     :return crash_list: list of CrashInfo
     """
-    header_part_complete = False
-    stack_info_complete = False
-    image_info_complete = False
+    return [crash_obj for crash_obj in _parse_crashes(lines, finder_func) if crash_obj is not None]
 
-    crash_list = list()
-    re_obj = None
-    crash_obj = None
+# 解析状态：crash头部信息、栈信息、image信息
+_PARSE_HEADER = 0
+_PARSE_STACK = 1
+_PARSE_IMAGE = 2
+# 缓存的image行数上限
+_IMAGE_LINE_CACHE_SIZE = 65536
 
-    for index, line in enumerate(lines):
-        #logd('line %d: %s' % (index, line))
-        if header_part_complete is False:
-            crash_obj, header_part_complete = _parse_crash_info(line, crash_obj)
-            #logd('parse crash info complete: ' + str(header_part_complete))
-        elif stack_info_complete is False:
-            crash_obj, re_obj, stack_info_complete = _parse_stack_info(line, re_obj, crash_obj, index)
-            #logd('parse stack info complete: ' + str(stack_info_complete))
-        elif image_info_complete is False:
-            crash_obj, re_obj, image_info_complete = _parse_image_info(line, re_obj, crash_obj)
-            #logd('parse image info complete: ' + str(image_info_complete))
+def _parse_crashes(lines, finder_func):
+    """
+    逐行解析crash日志的状态机，Binary Images部分结束时即产生完整的CrashInfo
+    :param lines: 行的迭代器，行号从0开始计算
+    :param finder_func: 查询app符号文件的处理函数
+    :return: generator，每个crash完成时产生CrashInfo，两个crash之间的行产生None，便于流式处理及时输出
+    """
+    stack_item_match = _stack_item_re_obj.match
+    image_header_match = _image_header_re_obj.match
+    image_item_match = _image_item_re_obj.match
+    symbol_file_prefix = _os_symbol_file_path_prefix()
+    # 同一批crash的Binary Images大多完全相同，按行缓存解析结果，避免重复匹配正则
+    image_lines = dict()
+    state = _PARSE_HEADER
+    crash_obj = None
+    function_stacks = None
+    for line_num, line in enumerate(lines):
+        if state == _PARSE_STACK:
+            # 栈信息是crash中最多的行，以数字开头，其余的行只需要检查是否为Binary Images
+            if line[:1].isdigit():
+                match_obj = stack_item_match(line)
+                if match_obj is not None:
+                    function_stacks.append(StackItemInfo(line_num, *match_obj.groups()))
+            elif line.startswith('Binary') and image_header_match(line) is not None:
+                state = _PARSE_IMAGE
+        elif state == _PARSE_HEADER:
+            crash_obj, complete = _parse_crash_info(line, crash_obj)
+            if complete is True:
+                state = _PARSE_STACK
+                function_stacks = crash_obj.function_stacks
+            elif crash_obj is None:
+                yield None
         else:
-            crash_obj.binary_images[crash_obj.product_name].symbol_file = finder_func(crash_obj.product_name, crash_obj.identifier, crash_obj.version, crash_obj.binary_images[crash_obj.product_name].code_type, crash_obj.binary_images[crash_obj.product_name].uuid)
-            crash_list.append(crash_obj)
-            #logd('store crash obj')
-            header_part_complete = False
-            stack_info_complete = False
-            image_info_complete = False
-            crash_obj = None
-    return crash_list
+            image_fields = image_lines.get(line)
+            if image_fields is None:
+                match_obj = image_item_match(line)
+                if match_obj is not None:
+                    image_fields = (match_obj.group(1), match_obj.group(2), match_obj.group(3).lstrip('+'), match_obj.group(4),
+                                    (match_obj.group(6) or '').upper(), match_obj.group(7).lstrip('/'))
+                    if len(image_lines) >= _IMAGE_LINE_CACHE_SIZE:
+                        image_lines.clear()
+                    image_lines[line] = image_fields
+            if image_fields is not None:
+                load_address, end_address, name, code_type, uuid, path = image_fields
+                symbol_file = '{prefix}/{os_version}/Symbols/{symbol_file}'\
+                              ''.format(prefix=symbol_file_prefix,
+                                        os_version=crash_obj.os_version,
+                                        symbol_file=path)
+                crash_obj.add_image(ImageItemInfo(load_address, name, code_type, uuid, symbol_file, end_address))
+            elif len(crash_obj.binary_images) > 0:
+                yield _finish_crash(crash_obj, finder_func)
+                state = _PARSE_HEADER
+                crash_obj = None
+    # 内容结束时，已经读取到image信息的crash视为完成
+    if state == _PARSE_IMAGE and len(crash_obj.binary_images) > 0:
+        yield _finish_crash(crash_obj, finder_func)
+
+def _finish_crash(crash_obj, finder_func):
+    image_item = crash_obj.binary_images.get(crash_obj.product_name)
+    if image_item is not None:
+        image_item.symbol_file = finder_func(crash_obj.product_name, crash_obj.identifier, crash_obj.version, image_item.code_type, image_item.uuid) or ''
+    return crash_obj
 
 def _parse_crash_info(line, crash_obj):
     """
+    先比较行首文字，只有可能匹配的行才使用正则
     :param line: line string
     :param crash_obj: CrashInfo object
     :return: crash_obj, complete:Bool
     """
     complete = False
     if crash_obj is None:
-        if re.match(_match_crash_header_re(), line) is not None:
+        if line.startswith('Incident') and _crash_header_re_obj.match(line) is not None:
             crash_obj = CrashInfo()
     elif len(crash_obj.product_name) == 0 :
-        match_obj = re.match(_match_product_name_re(), line)
-        if match_obj is not None:
-            crash_obj.product_name =  match_obj.group(1)
+        if line.startswith('Process:'):
+            match_obj = _product_name_re_obj.match(line)
+            if match_obj is not None:
+                crash_obj.product_name = match_obj.group(1)
     elif len(crash_obj.identifier) == 0:
-        match_obj = re.match(_match_identifier_re(), line)
-        if match_obj is not None:
-            crash_obj.identifier = match_obj.group(1)
+        if line.startswith('Identifier:'):
+            match_obj = _identifier_re_obj.match(line)
+            if match_obj is not None:
+                crash_obj.identifier = match_obj.group(1)
     elif len(crash_obj.version) == 0:
-        match_obj = re.match(_match_version_re(), line)
-        if match_obj is not None:
-            crash_obj.version = match_obj.group(1)
+        if line.startswith('Version:'):
+            match_obj = _version_re_obj.match(line)
+            if match_obj is not None:
+                crash_obj.version = match_obj.group(1)
     elif len(crash_obj.code_type) == 0:
-        match_obj = re.match(_match_code_type_re(), line)
-        if match_obj is not None:
-            crash_obj.code_type = match_obj.group(1)
+        if line.startswith('Code'):
+            match_obj = _code_type_re_obj.match(line)
+            if match_obj is not None:
+                crash_obj.code_type = match_obj.group(1)
     elif len(crash_obj.os_version) == 0:
-        match_obj = re.match(_match_os_version_re(), line)
-        if match_obj is not None:
-            crash_obj.os_version = match_obj.group(1)
-            complete = True
+        if line.startswith('OS'):
+            match_obj = _os_version_re_obj.match(line)
+            if match_obj is not None:
+                crash_obj.os_version = match_obj.group(1)
+                complete = True
     return (crash_obj, complete)
 
-def _parse_stack_info(line, re_obj, crash_obj, line_num):
+def _run_atos(image_item, load_address, addresses, context):
     """
-    :param line: line string
-    :param re_obj: re compiled object
-    :param crash_obj: CrashInfo object
-    :return: crash_obj, re_obj, complete:Bool
+    同一image同一加载地址的地址合并调用atos，每次最多_ATOS_MAX_ADDRESSES个，atos按参数顺序逐行输出符号
+    :param image_item: ImageItemInfo object
+    :param load_address: 加载地址
+    :param addresses: 调用地址list
+    :param context: _SymbolicateContext object
+    :return: dict of {address:String: symbol:String}
     """
-    if re_obj is None:
-        re_obj = re.compile(_match_stack_item_re())
-    complete = False
-    match_obj = re_obj.match(line)
-    if match_obj is not None:
-        stack_item =  StackItemInfo()
-        stack_item.name = match_obj.group(1)
-        stack_item.invoke_address = match_obj.group(2)
-        stack_item.load_address = match_obj.group(3)
-        stack_item.line_num = line_num
-        crash_obj.function_stacks.append(stack_item)
-    elif re.match(_match_image_header_re(), line) is not None:
-        complete = True
-        re_obj = None
-    return (crash_obj, re_obj, complete)
-
-def _parse_image_info(line, re_obj, crash_obj):
+    if context.atos_pool is not None:
+        # 复用进程池中常驻的atos进程，通过stdin逐行查询
+        logd('atos pool: {symbol_file} {load_address} {count} addresses'.format(symbol_file=image_item.symbol_file, load_address=load_address, count=len(addresses)))
+        if context.stats is None:
+            return context.atos_pool.symbolicate(image_item.symbol_file, image_item.code_type, load_address, addresses)
+        start = time.perf_counter()
+        symbols = context.atos_pool.symbolicate(image_item.symbol_file, image_item.code_type, load_address, addresses)
+        context.stats.add_command('atos-pool', image_item.name, time.perf_counter() - start)
+        return symbols
+    symbols = dict()
+    for chunk in _atos_chunks(addresses):
+        command = 'atos -arch {code_type} -o {symbol_file} -l {load_address} {invoke_addresses}'\
+                  ''.format(code_type=image_item.code_type, symbol_file=_escape_path(image_item.symbol_file),
+                            load_address=load_address, invoke_addresses=' '.join(chunk))
+        logd(command)
+        status, output = context.run_command(command, 'atos', image_item.name)
+        symbols.update(_parse_atos_output(chunk, status, output))
+    return symbols
+
+def _atos_chunks(addresses):
     """
-    :param line: line string
-    :param re_obj: re compiled object
-    :param crash_obj: CrashInfo object
-    :return: crash_obj, re_obj, complete:Bool
+    地址较多时分多次调用atos，避免命令行超过ARG_MAX
+    :param addresses: 调用地址list
+    :return: 每次调用的地址list
     """
-    if re_obj is None:
-        re_obj = re.compile(_match_image_item_re())
-    complete = False
-    match_obj = re_obj.match(line)
-    if match_obj is not None:
-        image_item = ImageItemInfo()
-        image_item.load_address = match_obj.group(1)
-        image_item.name = match_obj.group(2).lstrip('+')
-        image_item.code_type = match_obj.group(3)
-        image_item.uuid = match_obj.group(5)
-        if image_item.uuid is not None:
-            image_item.uuid = image_item.uuid.upper()
-        image_item.symbol_file = '{prefix}/{os_version}/Symbols/{symbol_file}'\
-                  ''.format(prefix=_os_symbol_file_path_prefix(),
-                            os_version=crash_obj.os_version,
-                            symbol_file=match_obj.group(6).lstrip('/'))
-        crash_obj.binary_images[image_item.name] = image_item
-    elif len(crash_obj.binary_images.items()) > 0:
-        complete = True
-        re_obj = None
-    return (crash_obj, re_obj, complete)
-
-def _symbolicate_stack_items(crash_obj):
+    return [addresses[start:start + _ATOS_MAX_ADDRESSES] for start in range(0, len(addresses), _ATOS_MAX_ADDRESSES)]
+
+def _parse_atos_output(addresses, status, output):
+    """
+    :param addresses: 调用地址list
+    :param status: atos的退出码
+    :param output: atos的输出
+    :return: dict of {address:String: symbol:String}
+    """
+    if status != 0:
+        loge(output)
+        return dict()
+    output_lines = output.splitlines()
+    if len(output_lines) < len(addresses):
+        loge('cannot parse the output of atos')
+        loge(output)
+        return dict()
+    # atos的警告信息会出现在符号之前，只取最后的len(addresses)行
+    return dict(zip(addresses, output_lines[len(output_lines) - len(addresses):]))
+
+def _symbolicate_crash_list(crash_list, context, workers=1):
+    """
+    :param crash_list: CrashInfo list
+    :param context: _SymbolicateContext object
+    :param workers: 线程数，大于1时不同image的解析并发进行
+    :return: crash_list
+    """
+    with context.stage('symbolicate'):
+        pending, duplicates = _lookup_results(crash_list, context)
+        _symbolicate_groups([crash_obj for fingerprint, crash_obj in pending], context, workers)
+        _save_results(pending, duplicates, context)
+    return crash_list
+
+def _crash_fingerprint(crash_obj, backend='atos'):
+    """
+    由解析方式、image的uuid、地址范围、符号文件及所有栈帧的地址计算crash指纹，指纹相同的crash符号化结果相同
+    :param backend: 'atos'或'native'，两者输出的符号格式不同，结果不能混用
+    :return: 十六进制字符串
+    """
+    digest = hashlib.sha1('{} {}'.format(backend, crash_obj.code_type).encode('utf-8'))
+    for image_item in crash_obj.image_index:
+        digest.update('\n{} {} {} {} {} {}'.format(image_item.uuid, image_item.load_address, image_item.end_address, image_item.name,
+                                                   image_item.code_type, image_item.symbol_file).encode('utf-8'))
+    digest.update(b'\n')
+    for stack_item in crash_obj.function_stacks:
+        digest.update('{} {},'.format(stack_item.invoke_address, stack_item.load_address).encode('utf-8'))
+    return digest.hexdigest()
+
+def _lookup_results(crash_list, context):
+    """
+    从结果缓存中填充已经符号化过的crash，同一批中重复的crash只保留第一个
+    :return: pending:list of (fingerprint, crash_obj)，需要符号化的crash，duplicates:list of (crash_obj, 与之相同的crash_obj)
+    """
+    pending = list()
+    duplicates = list()
+    seen = dict()
+    for crash_obj in crash_list:
+        fingerprint = _crash_fingerprint(crash_obj, context.backend)
+        if context.stats is not None:
+            context.stats.add_fingerprint(fingerprint, crash_obj.function_stacks[0].line_num if crash_obj.function_stacks else -1)
+        if fingerprint in seen:
+            duplicates.append((crash_obj, seen[fingerprint]))
+            continue
+        symbols = context.result_cache.get(fingerprint)
+        if symbols is not None and len(symbols) == len(crash_obj.function_stacks):
+            for stack_item, symbol in zip(crash_obj.function_stacks, symbols):
+                stack_item.invoke_symbol = symbol
+            continue
+        seen[fingerprint] = crash_obj
+        pending.append((fingerprint, crash_obj))
+    return (pending, duplicates)
+
+def _save_results(pending, duplicates, context):
+    """
+    保存新符号化的crash的结果，并复制给同一批中重复的crash
+    """
+    for fingerprint, crash_obj in pending:
+        symbols = [stack_item.invoke_symbol for stack_item in crash_obj.function_stacks]
+        complete = all(len(stack_item.invoke_symbol) > 0 or crash_obj.image_for(stack_item) is None for stack_item in crash_obj.function_stacks)
+        context.result_cache.set(fingerprint, symbols, complete)
+    for crash_obj, source_obj in duplicates:
+        for stack_item, source_item in zip(crash_obj.function_stacks, source_obj.function_stacks):
+            stack_item.invoke_symbol = source_item.invoke_symbol
+
+def _symbolicate_groups(crash_list, context, workers):
+    groups = _group_stack_items(crash_list)
+    if workers is None or workers <= 1 or len(groups) <= 1:
+        for image_item, stack_items in groups:
+            _symbolicate_image_stack_items(image_item, stack_items, context)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_symbolicate_image_stack_items, image_item, stack_items, context) for image_item, stack_items in groups]
+            for future in futures:
+                future.result()
+    return crash_list
+
+def _symbolicate_stack_items(crash_obj, context=None):
     """
     :param crash_obj: CrashInfo object
+    :param context: _SymbolicateContext object
     :return: crash_obj
     """
-    re_obj = re.compile(_sub_proccess_file_path_re())
-    uuid_re_obj = re.compile(_match_dwarfdump_uuid_re())
-    def proccess_path(match_obj):
-        matched_str = match_obj.group(1)
-        if len(matched_str) > 0 and matched_str[0] != '\\':
-            return '\\'+matched_str
-        return matched_str
-
-    def run_atos(stack_item, image_item, symbol_file_path):
-        logd('atos -arch {code_type} -o {symbol_file} -l {load_address} {invoke_address}'.format(code_type=image_item.code_type, symbol_file=symbol_file_path, load_address=stack_item.load_address, invoke_address=stack_item.invoke_address))
-        status, output = getstatusoutput('atos -arch {code_type} -o {symbol_file} -l {load_address} {invoke_address}'.format(code_type=image_item.code_type, symbol_file=symbol_file_path, load_address=stack_item.load_address, invoke_address=stack_item.invoke_address))
-        if status == 0:
-            stack_item.invoke_symbol = output
-        else:
-            loge(output)
+    if context is None:
+        context = _SymbolicateContext()
+    _symbolicate_crash_list([crash_obj], context)
+    return crash_obj
 
-    for stack_item in crash_obj.function_stacks:
-        image_item = crash_obj.binary_images.get(stack_item.name)
-        if image_item is None:
+def _unresolved_crash_list(crash_list):
+    """
+    :param crash_list: CrashInfo list
+    :return: 只包含未解析栈帧的CrashInfo list，栈帧及image与原crash共用
+    """
+    result = list()
+    for crash_obj in crash_list:
+        function_stacks = [stack_item for stack_item in crash_obj.function_stacks
+                           if len(stack_item.invoke_symbol) == 0 and crash_obj.image_for(stack_item) is not None]
+        if len(function_stacks) == 0:
             continue
-        symbol_file_path = re_obj.sub(proccess_path, image_item.symbol_file)
-        if image_item.uuid is not None and len(image_item.uuid) > 0:
-            logd('dwarfdump --uuid --arch {code_type} {symbol_file}'.format(code_type=image_item.code_type, symbol_file=symbol_file_path))
-            status, output = getstatusoutput('dwarfdump --uuid --arch {code_type} {symbol_file}'.format(code_type=image_item.code_type, symbol_file=symbol_file_path))
-            output_uuid = output
-            uuid_match_obj = uuid_re_obj.match(output)
-            if uuid_match_obj is not None:
-                output_uuid = ''.join(uuid_match_obj.groups())
-            else:
-                loge('cannot parse the output of dwarfdump')
-            if status == 0 and output_uuid == image_item.uuid:
-                run_atos(stack_item, image_item, symbol_file_path)
-            else:
-                loge('warnning! symbol file "{symbol_file}": uuid is not matched {uuid}'.format(symbol_file=symbol_file_path, uuid=image_item.uuid))
-                loge(output)
+        unresolved_obj = CrashInfo()
+        for name in CrashInfo.__slots__:
+            setattr(unresolved_obj, name, getattr(crash_obj, name))
+        unresolved_obj.function_stacks = function_stacks
+        result.append(unresolved_obj)
+    return result
+
+def _group_stack_items(crash_list):
+    """
+    按调用地址所在的image对所有crash中所有线程的栈信息分组，同一image在不同crash中的栈帧合并为一组
+    :param crash_list: CrashInfo list
+    :return: list of (image_item, stack_items)
+    """
+    stack_groups = dict()
+    for crash_obj in crash_list:
+        for stack_item in crash_obj.function_stacks:
+            image_item = crash_obj.image_for(stack_item)
+            if image_item is None:
+                continue
+            key = (image_item.uuid, image_item.name, image_item.code_type, image_item.symbol_file)
+            stack_groups.setdefault(key, (image_item, list()))[1].append(stack_item)
+    return list(stack_groups.values())
+
+def _symbolicate_image_stack_items(image_item, stack_items, context):
+    """
+    解析同一image的栈信息，image内偏移相同的栈帧只解析一次
+    :param image_item: ImageItemInfo object
+    :param stack_items: StackItemInfo list
+    :param context: _SymbolicateContext object
+    """
+    steps = _image_steps(image_item, stack_items, context)
+    result = None
+    while True:
+        try:
+            step, load_address, addresses = steps.send(result)
+        except StopIteration:
+            return
+        if step == 'index':
+            result = context.index_store.symbolicate(image_item.uuid, image_item.code_type, image_item.name, load_address, addresses)
+        elif step == 'uuid':
+            result = _query_uuid(image_item.code_type, image_item.symbol_file, context)
+        elif step == 'build':
+            result = context.index_store.build(image_item.symbol_file, image_item.code_type)
         else:
-            run_atos(stack_item, image_item, symbol_file_path)
+            result = _resolve_image(image_item, load_address, addresses, context)
 
-    return crash_obj
+def _image_steps(image_item, stack_items, context):
+    """
+    同一image依次尝试符号索引、失败记录、uuid校验及atos/resolver，同步及协程版本共用。
+    需要读取文件或运行外部命令的步骤以(step, load_address, addresses)的形式yield，由调用方执行后send回结果：
+    'index' -> dict或None，'uuid' -> (status, uuid, output)，'build' -> (uuid, arch) list，'resolve' -> dict
+    """
+    index_store = context.index_store
+    load_address, targets, addresses = _image_targets(image_item, stack_items)
+    _locate_symbol_file(image_item, context)
+    if image_item.uuid is None or len(image_item.uuid) == 0:
+        _assign_symbols(targets, (yield ('resolve', load_address, addresses)))
+        return
+    # 索引中没有的地址list，没有索引时为None
+    missing = None
+    if index_store is not None:
+        symbols = yield ('index', load_address, addresses)
+        if symbols is not None:
+            _assign_symbols(targets, symbols)
+            missing = [address for address in addresses if address not in symbols]
+            if len(missing) == 0:
+                return
+    if _skip_failed_image(image_item, stack_items, context) is True:
+        return
+    status, output_uuid, output = yield ('uuid', load_address, addresses)
+    if status is not True or output_uuid != image_item.uuid:
+        _add_failed_image(image_item, stack_items, status, output, context)
+        return
+    # uuid一致时为该符号文件建立索引，之后的任务直接使用索引
+    if missing is None and index_store is not None and len((yield ('build', load_address, addresses))) > 0:
+        logd('build symbol index for {uuid} {code_type}'.format(uuid=image_item.uuid, code_type=image_item.code_type))
+        symbols = yield ('index', load_address, addresses)
+        if symbols is not None:
+            _assign_symbols(targets, symbols)
+            missing = [address for address in addresses if address not in symbols]
+            if len(missing) == 0:
+                return
+    # 索引中没有的地址再由atos或resolver解析
+    _assign_symbols(targets, (yield ('resolve', load_address, missing if missing is not None else addresses)))
+
+def _resolve_image(image_item, load_address, addresses, context):
+    """
+    :return: dict of {address:String: symbol:String}
+    """
+    resolver = context.resolver
+    if resolver is None:
+        return _run_atos(image_item, load_address, addresses, context)
+    if context.stats is None:
+        return resolver.symbolicate(image_item.symbol_file, image_item.code_type, image_item.name, load_address, addresses)
+    start = time.perf_counter()
+    symbols = resolver.symbolicate(image_item.symbol_file, image_item.code_type, image_item.name, load_address, addresses)
+    context.stats.add_command('native', image_item.name, time.perf_counter() - start)
+    return symbols
+
+def _locate_symbol_file(image_item, context):
+    """
+    指定symbol_store时按uuid查找符号文件，找到的文件uuid已经确认，直接写入uuid缓存
+    """
+    if context.symbol_store is None or image_item.uuid is None or len(image_item.uuid) == 0:
+        return
+    symbol_file = context.symbol_store.lookup(image_item.uuid, image_item.code_type)
+    if symbol_file is not None:
+        if symbol_file != image_item.symbol_file:
+            logd('symbol store: {image} -> "{symbol_file}"'.format(image=image_item.name, symbol_file=symbol_file))
+        image_item.symbol_file = symbol_file
+        context.uuid_cache.set(symbol_file, image_item.code_type, image_item.uuid)
+
+def _skip_failed_image(image_item, stack_items, context):
+    """
+    之前已经失败的image不再查询uuid及运行atos，栈帧直接保持未解析
+    :return: 是否跳过
+    """
+    reason = context.negative_cache.get(image_item.symbol_file, image_item.code_type, image_item.uuid)
+    if reason is None:
+        return False
+    logd('skip {image}: {reason}'.format(image=image_item.name, reason=reason))
+    if context.stats is not None:
+        context.stats.add_skipped_image(image_item.name, image_item.symbol_file, image_item.uuid, reason, len(stack_items))
+    return True
+
+def _add_failed_image(image_item, stack_items, status, output, context):
+    """
+    记录符号文件不存在或uuid不一致的image
+    :param status: _query_uuid返回的status
+    :param output: _query_uuid返回的output
+    """
+    _log_uuid_mismatch(image_item, output)
+    if status is True:
+        reason = 'uuid mismatch'
+    elif os.path.isfile(os.path.expanduser(image_item.symbol_file)) is False:
+        reason = 'symbol file not found'
+    else:
+        reason = 'cannot read uuid'
+    context.negative_cache.add(image_item.symbol_file, image_item.code_type, image_item.uuid, reason, image_item.name)
+    if context.stats is not None:
+        # 符号文件不存在或无法读取uuid时只记录跳过原因
+        if status is True:
+            context.stats.add_uuid_mismatch(image_item.name, image_item.symbol_file, image_item.uuid)
+        context.stats.add_skipped_image(image_item.name, image_item.symbol_file, image_item.uuid, reason, len(stack_items))
+
+def _log_uuid_mismatch(image_item, output):
+    loge('warnning! symbol file "{symbol_file}": uuid is not matched {uuid}'.format(symbol_file=image_item.symbol_file, uuid=image_item.uuid))
+    loge(output)
+
+def _image_targets(image_item, stack_items):
+    """
+    按image内偏移对栈帧去重
+    :return: load_address:String, targets:dict of {offset: (address, stack_items)}, addresses:list
+    """
+    # 不同crash中image的加载地址可能不同，统一换算为第一个栈帧所在的加载地址
+    load_address = stack_items[0].load_address
+    base_address = int(load_address, 16)
+    targets = dict()
+    addresses = list()
+    for stack_item in stack_items:
+        offset = stack_item.offset
+        if offset not in targets:
+            address = stack_item.invoke_address if stack_item.load_address == load_address else '0x{:x}'.format(base_address + offset)
+            targets[offset] = (address, list())
+            addresses.append(address)
+        targets[offset][1].append(stack_item)
+    logd('{image}: {count} frames, {unique} unique addresses'.format(image=image_item.name, count=len(stack_items), unique=len(addresses)))
+    return (load_address, targets, addresses)
+
+def _assign_symbols(targets, symbols):
+    """
+    将解析结果写回偏移相同的所有栈帧
+    """
+    for address, items in targets.values():
+        symbol = symbols.get(address)
+        if symbol is not None:
+            for stack_item in items:
+                stack_item.invoke_symbol = symbol
 
-def _compose_log(crash_list, lines):
+def _compose_log(crash_list, lines, line_offset=0):
     """
     :param crash_list: CrashInfo list
     :param lines: origin log content
+    :param line_offset: lines第一行的行号，流式处理时lines只包含当前crash的内容
     :return: new log content
     """
-    re_obj = re.compile(_sub_stack_item_symbol_re())
+    re_obj = _stack_item_symbol_re_obj
     for crash_obj in crash_list:
         for stack_item in crash_obj.function_stacks:
-            lines[stack_item.line_num] = re_obj.sub(stack_item.invoke_symbol, lines[stack_item.line_num])
+            index = stack_item.line_num - line_offset
+            lines[index] = re_obj.sub(stack_item.invoke_symbol, lines[index])
     return lines
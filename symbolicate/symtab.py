@@ -0,0 +1,170 @@
+import os
+import bisect
+import threading
+from array import array
+from .macho import MachOFile, N_STAB, N_TYPE, N_SECT, N_EXT
+from .dwarf import DwarfInfo, DwarfError
+
+__author__ = 'jinzhao'
+
+
+def _format_symbol(name, image_name, offset):
+    """
+    与atos一致的输出格式
+    """
+    return '{name} (in {image_name}) + {offset}'.format(name=name, image_name=image_name, offset=offset)
+
+
+def _format_source_symbol(name, image_name, file_name, line):
+    """
+    与atos解析dSYM时一致的输出格式
+    """
+    return '{name} (in {image_name}) ({file_name}:{line})'.format(name=name, image_name=image_name, file_name=file_name, line=line)
+
+
+def _display_name(name):
+    """
+    C符号在符号表中带有'_'前缀，atos输出时会去掉
+    """
+    if name.startswith('_'):
+        return name[1:]
+    return name
+
+
+class SymbolTable(object):
+    """
+    由Mach-O的LC_SYMTAB构建的有序地址表，使用二分查找定位地址所在的符号
+    """
+    def __init__(self, macho_slice):
+        self.__slice = macho_slice
+        self.__text_vmaddr = 0
+        for segment in macho_slice.segments():
+            if segment.name == '__TEXT':
+                self.__text_vmaddr = segment.vmaddr
+                break
+        section_ends = [section.addr + section.size for section in macho_slice.sections()]
+        entries = list()
+        for n_strx, n_type, n_sect, n_desc, n_value in macho_slice.nlists():
+            if n_type & N_STAB != 0 or n_type & N_TYPE != N_SECT or n_strx == 0:
+                continue
+            if n_sect < 1 or n_sect > len(section_ends):
+                continue
+            # 同一地址有多个符号时优先使用外部符号
+            entries.append((n_value, 0 if n_type & N_EXT else 1, n_strx, section_ends[n_sect - 1]))
+        entries.sort()
+        self.__addresses = array('Q')
+        self.__ends = array('Q')
+        self.__names = array('I')
+        for n_value, external, n_strx, section_end in entries:
+            if len(self.__addresses) > 0 and self.__addresses[-1] == n_value:
+                continue
+            if len(self.__ends) > 0 and self.__ends[-1] > n_value:
+                self.__ends[-1] = n_value
+            self.__addresses.append(n_value)
+            self.__ends.append(section_end)
+            self.__names.append(n_strx)
+
+    @property
+    def text_vmaddr(self):
+        return self.__text_vmaddr
+
+    def __len__(self):
+        return len(self.__addresses)
+
+    def entries(self):
+        """
+        :return: generator of (address:Int, end:Int, name:String)
+        """
+        for index in range(len(self.__addresses)):
+            yield (self.__addresses[index], self.__ends[index], _display_name(self.__slice.string(self.__names[index])))
+
+    def lookup(self, address):
+        """
+        :param address: 符号文件中的虚拟地址
+        :return: (name:String, offset:Int)，找不到时返回None
+        """
+        index = bisect.bisect_right(self.__addresses, address) - 1
+        if index < 0 or address >= self.__ends[index]:
+            return None
+        return (_display_name(self.__slice.string(self.__names[index])), address - self.__addresses[index])
+
+
+class NativeResolver(object):
+    """
+    不依赖atos的符号解析，直接读取符号文件的DWARF信息及符号表，已加载的数据在多次解析之间复用
+    """
+    def __init__(self):
+        self.__files = dict()
+        self.__images = dict()
+        self.__lock = threading.Lock()
+
+    def __image(self, symbol_file, code_type):
+        """
+        :return: (SymbolTable, DwarfInfo)，文件不存在或没有对应架构时返回None
+        """
+        path = os.path.realpath(os.path.expanduser(symbol_file))
+        key = (path, code_type)
+        if key in self.__images:
+            return self.__images[key]
+        with self.__lock:
+            if key not in self.__images:
+                self.__images[key] = self.__load_image(path, code_type)
+            return self.__images[key]
+
+    def __load_image(self, path, code_type):
+        image = None
+        macho_file = self.__files.get(path)
+        if macho_file is None and os.path.isfile(path):
+            macho_file = MachOFile(path)
+            self.__files[path] = macho_file
+        if macho_file is not None:
+            macho_slice = macho_file.slice(code_type)
+            if macho_slice is not None:
+                dwarf_info = DwarfInfo(macho_slice)
+                image = (SymbolTable(macho_slice), dwarf_info if dwarf_info.available else None)
+        return image
+
+    def symbol_table(self, symbol_file, code_type):
+        """
+        :param symbol_file: 符号文件路径
+        :param code_type: cpu架构版本
+        :return: SymbolTable，文件不存在或没有对应架构时返回None
+        """
+        image = self.__image(symbol_file, code_type)
+        return image[0] if image is not None else None
+
+    def symbolicate(self, symbol_file, code_type, image_name, load_address, addresses):
+        """
+        :param symbol_file: 符号文件路径
+        :param code_type: cpu架构版本
+        :param image_name: image名称
+        :param load_address: image加载地址，16进制字符串
+        :param addresses: 调用地址list，16进制字符串
+        :return: dict of {address:String: symbol:String}，只包含解析成功的地址
+        """
+        image = self.__image(symbol_file, code_type)
+        symbols = dict()
+        if image is None:
+            return symbols
+        table, dwarf_info = image
+        slide = int(load_address, 16) - table.text_vmaddr
+        for address in addresses:
+            file_address = int(address, 16) - slide
+            if dwarf_info is not None:
+                try:
+                    source = dwarf_info.lookup(file_address)
+                except DwarfError:
+                    source = None
+                if source is not None and source[0] is not None and source[2] is not None:
+                    symbols[address] = _format_source_symbol(source[0], image_name, source[1], source[2])
+                    continue
+            result = table.lookup(file_address)
+            if result is not None:
+                symbols[address] = _format_symbol(result[0], image_name, result[1])
+        return symbols
+
+    def close(self):
+        self.__images = dict()
+        for macho_file in self.__files.values():
+            macho_file.close()
+        self.__files = dict()
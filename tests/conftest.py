@@ -0,0 +1,92 @@
+import os
+import sys
+import textwrap
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.synthetic import write_fake_tools
+
+__author__ = 'jinzhao'
+
+APP_UUID = '0123456789ABCDEF0123456789ABCDEF'
+LIBOBJC_UUID = 'FEDCBA9876543210FEDCBA9876543210'
+OS_VERSION = '9.1 (13B143)'
+
+
+def make_crash_log(product='MyApp', frames=None, images=None, incident='8B0B2A4C-0000-4C5E-9A8E-4A7A8E0B1C2D'):
+    """
+    生成符合Report Version 104格式的crash日志内容
+    """
+    if frames is None:
+        frames = [('libobjc.A.dylib', 0x180e2dbd0, 0x180e14000),
+                  (product, 0x1000a1234, 0x100000000),
+                  (product, 0x1000a1300, 0x100000000),
+                  ('libobjc.A.dylib', 0x180e2dbd0, 0x180e14000)]
+    if images is None:
+        images = [(0x100000000, 0x100ffffff, '+' + product, APP_UUID, '/var/mobile/Applications/{0}.app/{0}'.format(product)),
+                  (0x180e14000, 0x180e3ffff, 'libobjc.A.dylib', LIBOBJC_UUID, '/usr/lib/libobjc.A.dylib')]
+    header = textwrap.dedent('''\
+        Incident Identifier: {incident}
+        CrashReporter Key:   TODO
+        Hardware Model:      iPhone7,2
+        Process:         {product} [1234]
+        Path:            /var/mobile/Applications/{product}.app/{product}
+        Identifier:      com.example.{product}
+        Version:         1.0
+        Code Type:       ARM-64
+        Parent Process:  launchd [1]
+
+        Date/Time:       2015-12-17 10:00:00 +0800
+        OS Version:      iPhone OS {os_version}
+        Report Version:  104
+
+        Exception Type:  SIGSEGV
+        Exception Codes: SEGV_ACCERR at 0x0
+        Crashed Thread:  0
+
+        Thread 0 Crashed:
+        ''').format(incident=incident, product=product, os_version=OS_VERSION)
+    lines = [header]
+    for index, (name, address, load_address) in enumerate(frames):
+        lines.append('{:<4}{:<32}0x{:016x} 0x{:x} + {}\n'.format(index, name, address, load_address, address - load_address))
+    lines.append('\nBinary Images:\n')
+    for start, end, name, uuid, path in images:
+        uuid_part = '<{}> '.format(uuid.lower()) if uuid else ''
+        lines.append('       0x{:x} -        0x{:x} {} arm64  {}{}\n'.format(start, end, name, uuid_part, path))
+    lines.append('\n\n')
+    return ''.join(lines)
+
+
+@pytest.fixture
+def toolchain(tmp_path, monkeypatch):
+    """
+    在PATH中放置模拟的atos和dwarfdump，HOME指向临时目录，返回调用记录文件路径
+    """
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    write_fake_tools(str(bin_dir))
+    home = tmp_path / 'home'
+    home.mkdir(exist_ok=True)
+    tool_log = tmp_path / 'tools.log'
+    tool_log.write_text('')
+    monkeypatch.setenv('PATH', str(bin_dir) + os.pathsep + os.environ.get('PATH', ''))
+    monkeypatch.setenv('HOME', str(home))
+    monkeypatch.setenv('STUB_TOOL_LOG', str(tool_log))
+    return tool_log
+
+
+@pytest.fixture
+def symbol_files(tmp_path):
+    """
+    生成app及系统库的符号文件，uuid写入同名.uuid文件供模拟的dwarfdump读取
+    """
+    app_file = tmp_path / 'MyApp.app.dSYM' / 'Contents' / 'Resources' / 'DWARF' / 'MyApp'
+    app_file.parent.mkdir(parents=True)
+    app_file.write_bytes(b'')
+    (tmp_path / (str(app_file) + '.uuid')).write_text(APP_UUID)
+    system_file = tmp_path / 'home' / 'Library' / 'Developer' / 'Xcode' / 'iOS DeviceSupport' / OS_VERSION / 'Symbols' / 'usr' / 'lib' / 'libobjc.A.dylib'
+    system_file.parent.mkdir(parents=True)
+    system_file.write_bytes(b'')
+    (tmp_path / (str(system_file) + '.uuid')).write_text(LIBOBJC_UUID)
+    return str(app_file), str(system_file)
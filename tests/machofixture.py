@@ -0,0 +1,159 @@
+import struct
+
+__author__ = 'jinzhao'
+
+CPU_TYPES = {
+    'armv7': (12, 9),
+    'armv7s': (12, 11),
+    'arm64': (0x0100000c, 0),
+    'arm64e': (0x0100000c, 0x80000002),
+    'x86_64': (0x01000007, 3),
+}
+
+
+def build_macho(arch, uuid=None, is_64=True, big_endian=False, symbols=None, text_vmaddr=None, text_size=0x10000, extra_sections=None):
+    """
+    构造只包含mach_header、load command及符号表的最小Mach-O文件
+    :param symbols: list of (name, address)，name为符号表中的原始名称
+    :param extra_sections: list of (segname, sectname, data)，追加在__TEXT之后的section
+    """
+    endian = '>' if big_endian else '<'
+    cpu_type, cpu_subtype = CPU_TYPES[arch]
+    header_size = 32 if is_64 else 28
+    if text_vmaddr is None:
+        text_vmaddr = 0x100000000 if is_64 else 0x4000
+    section_padding = (0,) * (7 if is_64 else 6)
+    segment_fmt, section_fmt = ('16sQQQQiiII', '16s16sQQIIIIIIII') if is_64 else ('16sIIIIiiII', '16s16sIIIIIIIII')
+    segment_size = 8 + struct.calcsize(endian + segment_fmt)
+    section_size = struct.calcsize(endian + section_fmt)
+    extra_sections = extra_sections or list()
+    symbols = symbols or list()
+    nlist_fmt = endian + ('IBBHQ' if is_64 else 'IBBHI')
+
+    commands_size = segment_size + section_size
+    if extra_sections:
+        commands_size += segment_size + section_size * len(extra_sections)
+    commands_size += 24
+    if uuid is not None:
+        commands_size += 24
+    data_offset = header_size + commands_size
+
+    sections_data = b''
+    extra_headers = b''
+    for segname, sectname, data in extra_sections:
+        extra_headers += struct.pack(endian + section_fmt, sectname.encode(), segname.encode(), 0, len(data), data_offset + len(sections_data), *section_padding)
+        sections_data += data
+    symoff = data_offset + len(sections_data)
+    strtab = b'\0'
+    nlists = b''
+    for name, address in symbols:
+        nlists += struct.pack(nlist_fmt, len(strtab), 0x0f, 1, 0, address)
+        strtab += name.encode() + b'\0'
+    stroff = symoff + len(nlists)
+
+    commands = struct.pack(endian + 'II', 0x19 if is_64 else 0x1, segment_size + section_size)
+    commands += struct.pack(endian + segment_fmt, b'__TEXT', text_vmaddr, text_size, 0, 0, 5, 5, 1, 0)
+    commands += struct.pack(endian + section_fmt, b'__text', b'__TEXT', text_vmaddr, text_size, 0, *section_padding)
+    if extra_sections:
+        commands += struct.pack(endian + 'II', 0x19 if is_64 else 0x1, segment_size + section_size * len(extra_sections))
+        commands += struct.pack(endian + segment_fmt, extra_sections[0][0].encode(), 0, 0, data_offset, len(sections_data), 0, 0, len(extra_sections), 0)
+        commands += extra_headers
+    commands += struct.pack(endian + 'IIIIII', 0x2, 24, symoff, len(symbols), stroff, len(strtab))
+    if uuid is not None:
+        commands += struct.pack(endian + 'II', 0x1b, 24) + bytes.fromhex(uuid)
+    ncmds = 2 + (1 if extra_sections else 0) + (1 if uuid is not None else 0)
+    if is_64:
+        header = struct.pack(endian + 'IIIIIIII', 0xfeedfacf, cpu_type, cpu_subtype, 6, ncmds, len(commands), 0, 0)
+    else:
+        header = struct.pack(endian + 'IIIIIII', 0xfeedface, cpu_type, cpu_subtype, 6, ncmds, len(commands), 0)
+    return header + commands + sections_data + nlists + strtab
+
+
+def build_fat(slices, is_64=False, align=12):
+    """
+    将多个thin Mach-O合并为fat文件
+    """
+    entry_size = 32 if is_64 else 20
+    offset = 8 + entry_size * len(slices)
+    header = struct.pack('>II', 0xcafebabf if is_64 else 0xcafebabe, len(slices))
+    body = b''
+    for data in slices:
+        cpu_type, cpu_subtype = struct.unpack_from('<II', data, 4)
+        padding = (-offset) % (1 << align)
+        offset += padding
+        body += b'\0' * padding
+        if is_64:
+            header += struct.pack('>IIQQII', cpu_type, cpu_subtype, offset, len(data), align, 0)
+        else:
+            header += struct.pack('>IIIII', cpu_type, cpu_subtype, offset, len(data), align)
+        body += data
+        offset += len(data)
+    return header + body
+
+
+def _uleb(value):
+    result = b''
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            result += bytes([byte | 0x80])
+        else:
+            return result + bytes([byte])
+
+
+def _sleb(value):
+    result = b''
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if (value == 0 and byte & 0x40 == 0) or (value == -1 and byte & 0x40):
+            return result + bytes([byte])
+        result += bytes([byte | 0x80])
+
+
+def build_dwarf(file_name, functions, lines, extra_lines=None):
+    """
+    构造DWARF 4格式的__DWARF section，只包含一个编译单元
+    :param functions: list of (name, low_pc, high_pc)
+    :param lines: list of (address, line)，最后一项为序列结束地址
+    :param extra_lines: 另一个序列，格式与lines相同
+    :return: list of (segname, sectname, data)，可作为build_macho的extra_sections
+    """
+    abbrev = _uleb(1) + _uleb(0x11) + b'\x01'
+    abbrev += _uleb(0x03) + _uleb(0x08) + _uleb(0x10) + _uleb(0x17) + _uleb(0x11) + _uleb(0x01) + _uleb(0x12) + _uleb(0x06) + b'\0\0'
+    abbrev += _uleb(2) + _uleb(0x2e) + b'\x00'
+    abbrev += _uleb(0x03) + _uleb(0x0e) + _uleb(0x11) + _uleb(0x01) + _uleb(0x12) + _uleb(0x06) + b'\0\0'
+    abbrev += b'\0'
+
+    debug_str = b''
+    low_pc = min(item[1] for item in functions)
+    high_pc = max(item[2] for item in functions)
+    dies = _uleb(1) + file_name.encode() + b'\0' + struct.pack('<IQI', 0, low_pc, high_pc - low_pc)
+    for name, low, high in functions:
+        dies += _uleb(2) + struct.pack('<IQI', len(debug_str), low, high - low)
+        debug_str += name.encode() + b'\0'
+    dies += b'\0'
+    unit = struct.pack('<HIB', 4, 0, 8) + dies
+    debug_info = struct.pack('<I', len(unit)) + unit
+
+    program = b''
+    # extra_lines作为单独的序列写在lines之前
+    for sequence in ([extra_lines] if extra_lines else []) + [lines]:
+        address, line = sequence[0][0], 1
+        program += b'\0' + _uleb(9) + b'\x02' + struct.pack('<Q', address)
+        for next_address, next_line in sequence[:-1]:
+            if next_address != address:
+                program += b'\x02' + _uleb(next_address - address)
+            program += b'\x03' + _sleb(next_line - line) + b'\x01'
+            address, line = next_address, next_line
+        program += b'\x02' + _uleb(sequence[-1][0] - address) + b'\0\x01\x01'
+    header = struct.pack('<BBBbBB', 1, 1, 1, -5, 14, 13) + bytes([0, 1, 1, 1, 1, 0, 0, 0, 1, 0, 0, 1])
+    header += b'\0' + file_name.encode() + b'\0' + _uleb(0) + _uleb(0) + _uleb(0) + b'\0'
+    line_unit = struct.pack('<HI', 4, len(header)) + header + program
+    debug_line = struct.pack('<I', len(line_unit)) + line_unit
+
+    return [('__DWARF', '__debug_info', debug_info),
+            ('__DWARF', '__debug_abbrev', abbrev),
+            ('__DWARF', '__debug_line', debug_line),
+            ('__DWARF', '__debug_str', debug_str)]
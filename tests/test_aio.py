@@ -0,0 +1,54 @@
+import asyncio
+import symbolicate
+import symbolicate.symbolicate as symbolicate_module
+from conftest import APP_UUID, make_crash_log
+
+__author__ = 'jinzhao'
+
+
+def test_symbolicate_crash_async_matches_sync(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log() * 3)
+    app_file = symbol_files[0]
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'expected.crash')) is True
+
+    async def finder_func(name, identifier, version, codetype, uuid):
+        await asyncio.sleep(0)
+        return app_file
+
+    async def main():
+        semaphore = asyncio.Semaphore(4)
+        return await asyncio.gather(*[symbolicate.symbolicate_crash_async(str(crash_log), finder_func, str(tmp_path / '{}.crash'.format(index)), semaphore=semaphore)
+                                      for index in range(5)])
+
+    assert asyncio.run(main()) == [True] * 5
+    for index in range(5):
+        assert (tmp_path / '{}.crash'.format(index)).read_bytes() == (tmp_path / 'expected.crash').read_bytes()
+
+
+def test_symbolicate_crash_async_accepts_plain_finder(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    output_file = tmp_path / 'out.crash'
+
+    assert asyncio.run(symbolicate.symbolicate_crash_async(str(crash_log), lambda *args: symbol_files[0], str(output_file))) is True
+    assert 'sym_a1234 (in MyApp) + 0' in output_file.read_text()
+    assert asyncio.run(symbolicate.symbolicate_crash_async(str(tmp_path / 'missing.crash'), lambda *args: symbol_files[0])) is False
+
+
+def test_symbolicate_crash_async_splits_long_atos_command_lines(tmp_path, toolchain, symbol_files, monkeypatch):
+    monkeypatch.setattr(symbolicate_module, '_ATOS_MAX_ADDRESSES', 2)
+    frames = [('MyApp', 0x1000a1000 + index * 0x10, 0x100000000) for index in range(5)]
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log(frames=frames))
+    output_file = tmp_path / 'out.crash'
+
+    assert asyncio.run(symbolicate.symbolicate_crash_async(str(crash_log), lambda *args: symbol_files[0], str(output_file))) is True
+    content = output_file.read_text()
+    assert all('sym_a10{:x}0 (in MyApp) + 0'.format(index) in content for index in range(5))
+    assert len([line for line in toolchain.read_text().splitlines() if line.startswith('atos ')]) == 3
+
+
+def test_query_uuid_async(toolchain, symbol_files):
+    assert asyncio.run(symbolicate.query_uuid_async('arm64', symbol_files[0])) == APP_UUID
+    assert asyncio.run(symbolicate.query_uuid_async('arm64', symbol_files[0] + '.missing')) == ''
@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+import symbolicate
+from conftest import make_crash_log
+
+__author__ = 'jinzhao'
+
+
+def _spawns(tool_log):
+    return [line for line in tool_log.read_text().splitlines() if line.startswith('atos-interactive ')]
+
+
+def test_atos_pool_reuses_process_per_key(toolchain, symbol_files):
+    with symbolicate.AtosPool() as pool:
+        assert pool.symbolicate(symbol_files[0], 'arm64', '0x100000000', ['0x1000a1234']) == {'0x1000a1234': 'sym_a1234 (in MyApp) + 0'}
+        assert pool.symbolicate(symbol_files[0], 'arm64', '0x100000000', ['0x1000a1300', '0x1000a1234']) == {'0x1000a1300': 'sym_a1300 (in MyApp) + 0',
+                                                                                                           '0x1000a1234': 'sym_a1234 (in MyApp) + 0'}
+        assert pool.symbolicate(symbol_files[0], 'arm64', '0x100100000', ['0x1001a1234']) == {'0x1001a1234': 'sym_a1234 (in MyApp) + 0'}
+        assert pool.stats() == {'processes': 2, 'spawned': 2, 'reused': 1, 'evicted': 0}
+    assert _spawns(toolchain) == ['atos-interactive 0x100000000', 'atos-interactive 0x100100000']
+
+
+def test_atos_pool_evicts_least_recently_used_and_idle(toolchain, symbol_files):
+    with symbolicate.AtosPool(max_processes=2, idle_timeout=0.2) as pool:
+        for load_address in ('0x100000000', '0x100100000', '0x100000000', '0x100200000'):
+            assert len(pool.symbolicate(symbol_files[0], 'arm64', load_address, [load_address])) == 1
+        assert pool.stats()['processes'] == 2
+        assert pool.symbolicate(symbol_files[0], 'arm64', '0x100100000', ['0x100100010']) == {'0x100100010': 'sym_10 (in MyApp) + 0'}
+        assert pool.stats()['spawned'] == 4
+        time.sleep(0.3)
+        assert pool.prune() == 2
+        assert pool.stats()['processes'] == 0
+
+
+def test_symbolicate_crash_keeps_pool_warm_across_logs(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    app_file = symbol_files[0]
+
+    with symbolicate.AtosPool() as pool:
+        for name in ('first.crash', 'second.crash'):
+            assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / name), atos_pool=pool) is True
+
+    expected = tmp_path / 'expected.crash'
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(expected)) is True
+    assert (tmp_path / 'first.crash').read_bytes() == expected.read_bytes()
+    assert (tmp_path / 'second.crash').read_bytes() == expected.read_bytes()
+    assert sorted(_spawns(toolchain)) == ['atos-interactive 0x100000000', 'atos-interactive 0x180e14000']
+
+
+def test_atos_pool_expands_home_in_symbol_path(toolchain, symbol_files):
+    system_file = '~/' + os.path.relpath(symbol_files[1], os.path.expanduser('~'))
+    with symbolicate.AtosPool() as pool:
+        assert pool.symbolicate(system_file, 'arm64', '0x180e14000', ['0x180e2dbd0']) == {'0x180e2dbd0': 'sym_19bd0 (in libobjc.A.dylib) + 0'}
+
+
+def test_atos_pool_retries_process_closed_before_lock(toolchain, symbol_files, monkeypatch):
+    with symbolicate.AtosPool() as pool:
+        assert len(pool.symbolicate(symbol_files[0], 'arm64', '0x100000000', ['0x1000a1234'])) == 1
+        acquire = pool._AtosPool__acquire
+        closed = list()
+
+        def acquire_evicted(key):
+            # 模拟取得进程后、加锁前被其他线程淘汰
+            process = acquire(key)
+            if len(closed) == 0:
+                closed.append(process)
+                pool._AtosPool__discard(key, process)
+            return process
+        monkeypatch.setattr(pool, '_AtosPool__acquire', acquire_evicted)
+        assert pool.symbolicate(symbol_files[0], 'arm64', '0x100000000', ['0x1000a1300']) == {'0x1000a1300': 'sym_a1300 (in MyApp) + 0'}
+        assert closed[0].closed is True
+
+
+def test_atos_pool_handles_large_address_lists(toolchain, symbol_files):
+    addresses = ['0x{:x}'.format(0x100000000 + index * 4) for index in range(20000)]
+    pool = symbolicate.AtosPool(timeout=10)
+    result = list()
+    thread = threading.Thread(target=lambda: result.append(pool.symbolicate(symbol_files[0], 'arm64', '0x100000000', addresses)), daemon=True)
+    thread.start()
+    # 一次写入所有地址时atos与调用方互相等待，不会结束
+    thread.join(60)
+    assert thread.is_alive() is False
+    pool.close()
+    assert len(result[0]) == 20000
+    assert result[0]['0x10000fffc'] == 'sym_fffc (in MyApp) + 0'
@@ -0,0 +1,84 @@
+import os
+import sys
+import subprocess
+import symbolicate
+from conftest import make_crash_log
+
+__author__ = 'jinzhao'
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _write_logs(directory, count):
+    directory.mkdir()
+    paths = list()
+    for index in range(count):
+        path = directory / 'log{}.crash'.format(index)
+        path.write_text(make_crash_log() * 2)
+        paths.append(str(path))
+    return paths
+
+
+def test_collect_crash_logs(tmp_path):
+    paths = _write_logs(tmp_path / 'logs', 3)
+    (tmp_path / 'logs' / 'notes.txt').write_text('')
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text('# recent crashes\n{}\n\n{}\n'.format(paths[0], str(tmp_path / 'extra.crash')))
+
+    assert symbolicate.collect_crash_logs([str(tmp_path / 'logs')]) == paths
+    assert symbolicate.collect_crash_logs([str(tmp_path / 'logs' / 'log[12].crash')]) == paths[1:]
+    assert symbolicate.collect_crash_logs([paths[2]], manifest=str(manifest)) == [paths[2], paths[0], str(tmp_path / 'extra.crash')]
+
+
+def test_symbolicate_batch_with_process_pool(tmp_path, toolchain, symbol_files):
+    paths = _write_logs(tmp_path / 'logs', 4)
+    out_dir = tmp_path / 'out'
+
+    summary = symbolicate.symbolicate_batch(paths, symbolicate.DsymFinder(symbol_files[0]), str(out_dir), processes=2)
+
+    assert summary['files'] == 4
+    assert summary['failed'] == []
+    assert summary['crashes'] == 8
+    assert summary['frames'] == 32
+    assert summary['resolved'] == 32
+    assert sorted(os.listdir(str(out_dir))) == ['log0.crash', 'log1.crash', 'log2.crash', 'log3.crash']
+    assert 'sym_a1234 (in MyApp) + 0' in (out_dir / 'log3.crash').read_text()
+
+
+def test_launcher_batch_command(tmp_path, toolchain, symbol_files):
+    paths = _write_logs(tmp_path / 'logs', 2)
+    dsym = symbol_files[0].split('/Contents/')[0]
+    output = subprocess.run([sys.executable, os.path.join(ROOT, 'launcher.py'), 'batch', dsym, str(tmp_path / 'logs')],
+                            stdout=subprocess.PIPE, universal_newlines=True, cwd=ROOT)
+    assert output.returncode == 0
+    assert output.stdout.startswith('2 files, 4 crashes, 16 frames (16 resolved)')
+    assert os.path.isfile(str(tmp_path / 'logs' / 'log0.symbolicated.crash'))
+
+
+def test_shard_groups_keeps_each_uuid_in_one_shard():
+    from symbolicate.batch import _shard_groups
+    from symbolicate.symbolicate import ImageItemInfo
+    groups = [(ImageItemInfo(name='A', code_type='arm64', uuid='A'), [None] * 5),
+              (ImageItemInfo(name='B', code_type='arm64', uuid='B'), [None] * 3),
+              (ImageItemInfo(name='A', code_type='arm64', uuid='A', symbol_file='other'), [None] * 1),
+              (ImageItemInfo(name='C', code_type='arm64', uuid='C'), [None] * 2)]
+
+    shards = _shard_groups(groups, 2)
+    assert [[image_item.name for image_item, stack_items in shard] for shard in shards] == [['A', 'A'], ['B', 'C']]
+    assert len(_shard_groups(groups, 8)) == 3
+
+
+def test_symbolicate_batch_with_uuid_affinity(tmp_path, toolchain, symbol_files):
+    paths = _write_logs(tmp_path / 'logs', 4)
+    files_dir = tmp_path / 'files'
+    affinity_dir = tmp_path / 'affinity'
+    finder = lambda *args: symbol_files[0]
+
+    summary = symbolicate.symbolicate_batch(paths, finder, str(affinity_dir), processes=2, schedule='affinity')
+    assert (summary['files'], summary['failed'], summary['crashes'], summary['frames'], summary['resolved']) == (4, [], 8, 32, 32)
+    # 每个符号文件只在一个进程内查询一次uuid
+    assert sorted(line for line in toolchain.read_text().splitlines() if line.startswith('dwarfdump ')) == sorted('dwarfdump ' + path for path in symbol_files)
+
+    symbolicate.symbolicate_batch(paths, symbolicate.DsymFinder(symbol_files[0]), str(files_dir))
+    for name in os.listdir(str(files_dir)):
+        assert (affinity_dir / name).read_text() == (files_dir / name).read_text()
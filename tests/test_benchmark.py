@@ -0,0 +1,34 @@
+import os
+import sys
+import json
+import subprocess
+from benchmarks import synthetic
+from symbolicate import symbolicate as core
+
+__author__ = 'jinzhao'
+
+_RUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'run.py')
+
+
+def test_synthetic_crash_log_matches_parser(tmp_path):
+    crash_log = str(tmp_path / 'bench.crash')
+    workload = synthetic.write_crash_log(crash_log, crashes=3, threads=2, frames=5, images=12)
+    status, lines = core._read_log(crash_log)
+    crash_list = core._parse_content(lines, lambda *args: 'app')
+
+    assert workload == {'crashes': 3, 'frames': 30, 'images': 12}
+    assert len(crash_list) == 3
+    assert [len(crash_obj.function_stacks) for crash_obj in crash_list] == [10, 10, 10]
+    assert len(crash_list[0].binary_images) == 12
+    assert crash_list[0].binary_images['BenchApp'].symbol_file == 'app'
+
+
+def test_benchmark_reports_each_scenario(tmp_path):
+    output = subprocess.check_output([sys.executable, _RUN, '--crashes', '4', '--threads', '2', '--frames', '4',
+                                      '--scenario', 'parse', '--scenario', 'end_to_end', '--work-dir', str(tmp_path)])
+    result = json.loads(output.decode('utf-8'))
+
+    assert sorted(result['scenarios']) == ['end_to_end', 'parse']
+    assert result['scenarios']['parse']['frames'] == 32
+    assert result['scenarios']['end_to_end']['resolved'] == 32
+    assert result['scenarios']['end_to_end']['peak_rss_kb'] > 0
@@ -0,0 +1,197 @@
+import os
+import symbolicate
+from symbolicate.symbolicate import _parse_content, _crash_fingerprint
+from conftest import make_crash_log, APP_UUID
+
+__author__ = 'jinzhao'
+
+
+def _dwarfdump_calls(tool_log):
+    return [line for line in tool_log.read_text().splitlines() if line.startswith('dwarfdump ')]
+
+
+def test_uuid_cache_counts_hits_and_misses(tmp_path):
+    symbol_file = tmp_path / 'MyApp'
+    symbol_file.write_bytes(b'binary')
+    uuid_cache = symbolicate.UUIDCache()
+
+    assert uuid_cache.get(str(symbol_file), 'arm64') is None
+    uuid_cache.set(str(symbol_file), 'arm64', APP_UUID)
+    assert uuid_cache.get(str(symbol_file), 'arm64') == APP_UUID
+    assert uuid_cache.get(str(symbol_file), 'armv7') is None
+    assert uuid_cache.stats() == {'hits': 1, 'misses': 2, 'entries': 1}
+
+
+def test_uuid_cache_invalidated_when_file_changes(tmp_path):
+    symbol_file = tmp_path / 'MyApp'
+    symbol_file.write_bytes(b'binary')
+    uuid_cache = symbolicate.UUIDCache()
+    uuid_cache.set(str(symbol_file), 'arm64', APP_UUID)
+
+    symbol_file.write_bytes(b'another binary')
+
+    assert uuid_cache.get(str(symbol_file), 'arm64') is None
+
+
+def test_uuid_cache_persists_into_cache_dir(tmp_path):
+    symbol_file = tmp_path / 'MyApp'
+    symbol_file.write_bytes(b'binary')
+    cache_dir = tmp_path / 'cache'
+    uuid_cache = symbolicate.UUIDCache(str(cache_dir))
+    uuid_cache.set(str(symbol_file), 'arm64', APP_UUID)
+    assert uuid_cache.save() is True
+
+    assert symbolicate.UUIDCache(str(cache_dir)).get(str(symbol_file), 'arm64') == APP_UUID
+
+
+def test_uuid_cache_save_merges_entries_of_other_processes(tmp_path):
+    first_file = tmp_path / 'MyApp'
+    first_file.write_bytes(b'binary')
+    second_file = tmp_path / 'libobjc.A.dylib'
+    second_file.write_bytes(b'another binary')
+    cache_dir = str(tmp_path / 'cache')
+    # 两个worker各自加载了空缓存，先后保存
+    first_cache = symbolicate.UUIDCache(cache_dir)
+    second_cache = symbolicate.UUIDCache(cache_dir)
+    first_cache.set(str(first_file), 'arm64', APP_UUID)
+    second_cache.set(str(second_file), 'arm64', 'FE' * 16)
+    assert first_cache.save() is True
+    assert second_cache.save() is True
+
+    reloaded = symbolicate.UUIDCache(cache_dir)
+    assert reloaded.get(str(first_file), 'arm64') == APP_UUID
+    assert reloaded.get(str(second_file), 'arm64') == 'FE' * 16
+    assert os.listdir(cache_dir) == ['uuid_cache.json']
+
+
+def test_symbolicate_crash_runs_dwarfdump_once_per_symbol_file(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log() * 3)
+    app_file = symbol_files[0]
+    cache_dir = str(tmp_path / 'cache')
+
+    uuid_cache = symbolicate.UUIDCache(cache_dir)
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'out.crash'), uuid_cache=uuid_cache) is True
+    assert len(_dwarfdump_calls(toolchain)) == 2
+    assert uuid_cache.hits == 0
+
+    uuid_cache = symbolicate.UUIDCache(cache_dir)
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'out.crash'), uuid_cache=uuid_cache) is True
+    assert len(_dwarfdump_calls(toolchain)) == 2
+    assert uuid_cache.misses == 0
+
+
+def test_negative_cache_expires_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('symbolicate.cache.time.monotonic', lambda: now[0])
+    negative_cache = symbolicate.NegativeCache(ttl=60)
+    negative_cache.add('/path/MyApp', 'arm64', APP_UUID, 'uuid mismatch', 'MyApp')
+
+    assert negative_cache.get('/path/MyApp', 'arm64', APP_UUID) == 'uuid mismatch'
+    assert negative_cache.get('/path/MyApp', 'armv7', APP_UUID) is None
+    assert negative_cache.summary() == [{'image': 'MyApp', 'symbol_file': '/path/MyApp', 'code_type': 'arm64', 'uuid': APP_UUID,
+                                         'reason': 'uuid mismatch', 'skipped': 1}]
+    now[0] += 60
+    assert negative_cache.get('/path/MyApp', 'arm64', APP_UUID) is None
+    assert negative_cache.summary() == []
+
+
+def test_failed_image_is_tried_once_per_run(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    # 栈帧地址不同，每个crash都需要符号化
+    crash_log.write_text(''.join(make_crash_log(frames=[('libobjc.A.dylib', 0x180e2dbd0, 0x180e14000),
+                                                        ('MyApp', 0x1000a1234 + index, 0x100000000)]) for index in range(3)))
+    # 符号文件存在但dwarfdump无法读取uuid
+    app_file = tmp_path / 'broken' / 'MyApp'
+    app_file.parent.mkdir()
+    app_file.write_bytes(b'not a Mach-O file')
+
+    result, stats = symbolicate.symbolicate_crash_with_stats(str(crash_log), lambda *args: str(app_file), str(tmp_path / 'out.crash'), stream=True)
+    assert result is True
+    assert _dwarfdump_calls(toolchain).count('dwarfdump ' + str(app_file)) == 1
+    stats = stats.to_dict()
+    assert stats['caches']['negative_cache']['hits'] == 2
+    assert stats['skipped_images'] == [{'image': 'MyApp', 'symbol_file': str(app_file), 'uuid': APP_UUID, 'reason': 'cannot read uuid', 'frames': 3}]
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    result_cache = symbolicate.ResultCache(max_entries=2)
+    result_cache.set('a' * 40, ['main'])
+    result_cache.set('b' * 40, ['foo'])
+    assert result_cache.get('a' * 40) == ['main']
+    result_cache.set('c' * 40, ['bar'])
+
+    assert result_cache.get('b' * 40) is None
+    assert result_cache.get('a' * 40) == ['main']
+    assert result_cache.stats() == {'hits': 2, 'misses': 1, 'entries': 2}
+
+    cache_dir = str(tmp_path / 'cache')
+    symbolicate.ResultCache(cache_dir=cache_dir).set('d' * 40, ['main', ''])
+    assert symbolicate.ResultCache(cache_dir=cache_dir).get('d' * 40) == ['main', '']
+    # 存在未解析栈帧的结果不保存，已有的结果也会被移除
+    result_cache.set('a' * 40, ['main', ''], complete=False)
+    assert result_cache.get('a' * 40) is None
+    result_cache = symbolicate.ResultCache(cache_dir=cache_dir)
+    result_cache.set('e' * 40, ['main', ''], complete=False)
+    assert symbolicate.ResultCache(cache_dir=cache_dir).get('e' * 40) is None
+
+
+def test_result_cache_prunes_least_recently_used_files(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    result_cache = symbolicate.ResultCache(cache_dir=cache_dir, max_disk_entries=2)
+    monkeypatch.setattr(result_cache, 'prune_interval', 1)
+    for index, name in enumerate('abc'):
+        result_cache.set(name * 40, [name])
+        path = os.path.join(cache_dir, 'results', name * 2, name * 40 + '.json')
+        os.utime(path, (index + 1, index + 1))
+
+    reloaded = symbolicate.ResultCache(cache_dir=cache_dir)
+    assert reloaded.get('a' * 40) is None
+    assert reloaded.get('b' * 40) == ['b']
+    assert reloaded.get('c' * 40) == ['c']
+
+
+def test_shared_result_cache_retries_unresolved_crashes(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    app_file = symbol_files[0]
+    uuid_file = tmp_path / (app_file + '.uuid')
+    uuid_file.unlink()
+    result_cache = symbolicate.ResultCache()
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'first.crash'), result_cache=result_cache) is True
+    assert 'sym_a1234 (in MyApp)' not in (tmp_path / 'first.crash').read_text()
+
+    # 补齐符号文件后同一个crash重新解析
+    uuid_file.write_text(APP_UUID)
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'second.crash'), result_cache=result_cache) is True
+    assert 'sym_a1234 (in MyApp)' in (tmp_path / 'second.crash').read_text()
+
+
+def test_crash_fingerprint_depends_on_backend():
+    crash_obj = _parse_content(make_crash_log().splitlines(True), lambda *args: '')[0]
+    assert _crash_fingerprint(crash_obj, 'atos') != _crash_fingerprint(crash_obj, 'native')
+    assert _crash_fingerprint(crash_obj, 'atos') == _crash_fingerprint(crash_obj)
+
+
+def test_duplicate_crashes_reuse_results(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    other = make_crash_log(frames=[('MyApp', 0x1000a2000, 0x100000000)])
+    crash_log.write_text(make_crash_log() * 3 + other)
+    app_file = symbol_files[0]
+    cache_dir = str(tmp_path / 'cache')
+
+    result, stats = symbolicate.symbolicate_crash_with_stats(str(crash_log), lambda *args: app_file, str(tmp_path / 'first.crash'),
+                                                             result_cache=symbolicate.ResultCache(cache_dir=cache_dir))
+    assert result is True
+    duplicates = stats.to_dict()['duplicates']
+    assert duplicates['unique'] == 2
+    assert [(cluster['count'], cluster['line_num']) for cluster in duplicates['clusters']] == [(3, 19)]
+    tool_calls = toolchain.read_text()
+
+    # 所有crash的结果都已经保存，第二次运行不需要任何外部命令
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'second.crash'),
+                                         result_cache=symbolicate.ResultCache(cache_dir=cache_dir)) is True
+    assert toolchain.read_text() == tool_calls
+    assert (tmp_path / 'first.crash').read_text() == (tmp_path / 'second.crash').read_text()
+    assert (tmp_path / 'first.crash').read_text().count('sym_a1234 (in MyApp)') == 3
@@ -0,0 +1,49 @@
+from symbolicate.macho import MachOFile
+from symbolicate.dwarf import DwarfInfo
+from symbolicate.symtab import NativeResolver
+from machofixture import build_macho, build_dwarf
+from conftest import APP_UUID
+
+__author__ = 'jinzhao'
+
+FUNCTIONS = [('-[AppDelegate crash]', 0x1000a1200, 0x1000a1280), ('main', 0x1000a1280, 0x1000a1300)]
+LINES = [(0x1000a1200, 40), (0x1000a1230, 42), (0x1000a1240, 45), (0x1000a1280, 12), (0x1000a1300, 0)]
+
+
+def _write_dsym(path):
+    path.write_bytes(build_macho('arm64', APP_UUID, symbols=[('-[AppDelegate crash]', 0x1000a1200), ('_main', 0x1000a1280), ('_helper', 0x1000a1400)],
+                                 text_size=0x200000, extra_sections=build_dwarf('/src/AppDelegate.m', FUNCTIONS, LINES)))
+
+
+def test_dwarf_lookup(tmp_path):
+    path = tmp_path / 'MyApp'
+    _write_dsym(path)
+    with MachOFile(str(path)) as macho_file:
+        dwarf_info = DwarfInfo(macho_file.slice('arm64'))
+        assert dwarf_info.available is True
+        assert dwarf_info.lookup(0x1000a1234) == ('-[AppDelegate crash]', 'AppDelegate.m', 42)
+        assert dwarf_info.lookup(0x1000a1200) == ('-[AppDelegate crash]', 'AppDelegate.m', 40)
+        assert dwarf_info.lookup(0x1000a12f0) == ('main', 'AppDelegate.m', 12)
+        assert dwarf_info.lookup(0x1000a1400) is None
+
+
+def test_dwarf_lookup_at_sequence_boundary(tmp_path):
+    # 第二个序列从第一个序列的结束地址开始，并且在行号程序中排在前面
+    path = tmp_path / 'MyApp'
+    path.write_bytes(build_macho('arm64', APP_UUID, text_size=0x200000,
+                                 extra_sections=build_dwarf('/src/AppDelegate.m', FUNCTIONS, LINES[:3] + [(0x1000a1280, 0)], extra_lines=LINES[3:])))
+    with MachOFile(str(path)) as macho_file:
+        dwarf_info = DwarfInfo(macho_file.slice('arm64'))
+        assert dwarf_info.lookup(0x1000a1280) == ('main', 'AppDelegate.m', 12)
+        assert dwarf_info.lookup(0x1000a1244) == ('-[AppDelegate crash]', 'AppDelegate.m', 45)
+        assert all(high > low for low, high, function, file_name, line in dwarf_info.line_ranges())
+
+
+def test_native_resolver_prefers_dwarf_line_info(tmp_path):
+    path = tmp_path / 'MyApp'
+    _write_dsym(path)
+    resolver = NativeResolver()
+    symbols = resolver.symbolicate(str(path), 'arm64', 'MyApp', '0x100000000', ['0x1000a1244', '0x1000a1410'])
+    resolver.close()
+    assert symbols == {'0x1000a1244': '-[AppDelegate crash] (in MyApp) (AppDelegate.m:45)',
+                       '0x1000a1410': 'helper (in MyApp) + 16'}
@@ -0,0 +1,35 @@
+import pytest
+import symbolicate
+from symbolicate import symbolicate as core
+from conftest import make_crash_log
+
+__author__ = 'jinzhao'
+
+
+def test_frame_structures_use_slots():
+    stack_item = core.StackItemInfo()
+    assert (stack_item.line_num, stack_item.name, stack_item.invoke_address, stack_item.load_address, stack_item.invoke_symbol) == (-1, '', '', '', '')
+    assert core.ImageItemInfo().symbol_file == ''
+    assert core.CrashInfo().function_stacks == []
+    with pytest.raises(AttributeError):
+        stack_item.unknown = 1
+
+
+def test_frame_table_from_crash_list():
+    crash_list = core._parse_content((make_crash_log() * 2).splitlines(True), lambda *args: '')
+    table = symbolicate.FrameTable.from_crash_list(crash_list)
+
+    assert len(table) == 8
+    assert list(table.crash_ids) == [0, 0, 0, 0, 1, 1, 1, 1]
+    assert list(table.line_nums[:4]) == [19, 20, 21, 22]
+    assert [image_item.name for image_item in table.images] == ['libobjc.A.dylib', 'MyApp']
+    assert list(table.image_ids[:4]) == [0, 1, 1, 0]
+    assert table.offsets()[1] == 0xa1234
+    assert table.group_by_image() == {0: [0x19bd0], 1: [0xa1234, 0xa1300]}
+
+
+def test_frame_table_offsets_below_load_address():
+    table = symbolicate.FrameTable()
+    table.append(0, 0, None, 0x100000000, 0x100000010)
+    table.append(0, 1, None, 0x100000020, 0x100000000)
+    assert list(table.offsets()) == [-0x10, 0x20]
@@ -0,0 +1,36 @@
+import symbolicate
+from symbolicate.symbolicate import ImageItemInfo
+from conftest import make_crash_log
+
+__author__ = 'jinzhao'
+
+
+def test_image_index_finds_image_by_address():
+    libobjc = ImageItemInfo('0x180e14000', 'libobjc.A.dylib', end_address='0x180e3ffff')
+    app = ImageItemInfo('0x100000000', 'MyApp', end_address='0x100ffffff')
+    dyld = ImageItemInfo('0x120000000', 'dyld')
+    index = symbolicate.ImageIndex([libobjc, app, dyld])
+
+    assert list(index) == [app, dyld, libobjc]
+    assert index.find(0x100000000) is app
+    assert index.find(0x100ffffff) is app
+    assert index.find(0x101000000) is None
+    assert index.find(0xfffffff) is None
+    # 没有结束地址的image一直延伸到下一个image之前
+    assert index.find(0x170000000) is dyld
+    assert index.find(0x180e40000) is None
+    assert index.group([0x1000a1234, 0x180e2dbd0, 0x1000a1300, 0x10]) == ({app: [0x1000a1234, 0x1000a1300], libobjc: [0x180e2dbd0]}, [0x10])
+
+
+def test_frames_are_mapped_to_images_by_address(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    # 栈信息中的image名称被截断，只能通过地址范围确定image
+    crash_log.write_text(make_crash_log(frames=[('libobjc.A.dyl', 0x180e2dbd0, 0x180e14000), ('MyApp', 0x1000a1234, 0x100000000)]))
+    output_file = tmp_path / 'out.crash'
+    app_file = symbol_files[0]
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(output_file)) is True
+
+    lines = output_file.read_text().splitlines()
+    assert lines[19].endswith('sym_19bd0 (in libobjc.A.dylib) + 0')
+    assert lines[20].endswith('sym_a1234 (in MyApp) + 0')
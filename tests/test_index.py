@@ -0,0 +1,174 @@
+import os
+import asyncio
+import sys
+import subprocess
+import threading
+import symbolicate
+from machofixture import build_macho, build_dwarf
+from conftest import make_crash_log, APP_UUID, LIBOBJC_UUID
+from test_dwarf import FUNCTIONS, LINES
+from test_symtab import APP_SYMBOLS, write_native_symbol_files
+
+__author__ = 'jinzhao'
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _write_dsym(path, uuid=APP_UUID):
+    path.write_bytes(build_macho('arm64', uuid, symbols=APP_SYMBOLS, text_size=0x200000,
+                                 extra_sections=build_dwarf('/src/AppDelegate.m', FUNCTIONS, LINES)))
+
+
+def test_index_store_build_and_reload(tmp_path):
+    symbol_file = tmp_path / 'MyApp'
+    _write_dsym(symbol_file)
+    cache_dir = str(tmp_path / 'cache')
+
+    index_store = symbolicate.SymbolIndexStore(cache_dir)
+    assert index_store.build(str(symbol_file)) == [(APP_UUID, 'arm64')]
+    index_store.close()
+
+    symbol_file.unlink()
+    index_store = symbolicate.SymbolIndexStore(cache_dir)
+    symbols = index_store.symbolicate(APP_UUID, 'arm64', 'MyApp', '0x104000000', ['0x1040a1234', '0x1040a1410', '0x104000010'])
+    assert symbols == {'0x1040a1234': '-[AppDelegate crash] (in MyApp) (AppDelegate.m:42)',
+                       '0x1040a1410': 'helper (in MyApp) + 16'}
+    assert index_store.symbolicate(LIBOBJC_UUID, 'arm64', 'MyApp', '0x104000000', ['0x1040a1234']) is None
+    assert index_store.stats() == {'hits': 1, 'misses': 1, 'loaded': 1}
+    index_store.close()
+
+
+def test_index_store_rebuilt_for_new_uuid(tmp_path):
+    symbol_file = tmp_path / 'MyApp'
+    _write_dsym(symbol_file)
+    index_store = symbolicate.SymbolIndexStore(str(tmp_path / 'cache'))
+    index_store.build(str(symbol_file))
+    _write_dsym(symbol_file, LIBOBJC_UUID)
+    assert index_store.build(str(symbol_file)) == [(LIBOBJC_UUID, 'arm64')]
+    assert index_store.get(LIBOBJC_UUID, 'arm64') is not None
+    index_store.close()
+
+
+def test_index_store_evicts_least_recently_used(tmp_path):
+    first = tmp_path / 'First'
+    second = tmp_path / 'Second'
+    _write_dsym(first)
+    _write_dsym(second, LIBOBJC_UUID)
+    index_store = symbolicate.SymbolIndexStore(str(tmp_path / 'cache'))
+    index_store.build(str(first))
+    first_index = os.path.join(index_store.root, APP_UUID + '-arm64.idx')
+    os.utime(first_index, (1, 1))
+    size = os.path.getsize(first_index)
+    index_store = symbolicate.SymbolIndexStore(str(tmp_path / 'cache'), max_size=size + size // 2)
+    index_store.build(str(second))
+    assert sorted(os.listdir(index_store.root)) == [LIBOBJC_UUID + '-arm64.idx']
+
+
+def test_symbolicate_crash_uses_index_as_first_tier(tmp_path, monkeypatch, symbol_files):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    app_file, system_file = symbol_files
+    write_native_symbol_files(app_file, system_file)
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    cache_dir = str(tmp_path / 'cache')
+
+    index_store = symbolicate.SymbolIndexStore(cache_dir)
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'first.crash'), index_store=index_store) is True
+    index_store.close()
+    os.remove(app_file)
+    os.remove(system_file)
+
+    index_store = symbolicate.SymbolIndexStore(cache_dir)
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'second.crash'), index_store=index_store) is True
+    index_store.close()
+
+    lines = (tmp_path / 'second.crash').read_text().splitlines()
+    assert (tmp_path / 'first.crash').read_text().splitlines() == lines
+    assert lines[19].endswith('0x0000000180e2dbd0 objc_msgSend (in libobjc.A.dylib) + 16')
+    assert lines[20].endswith('0x00000001000a1234 -[AppDelegate crash] (in MyApp) + 52')
+
+
+def test_symbolicate_crash_falls_back_for_addresses_missing_from_index(tmp_path, toolchain, symbol_files):
+    app_file = symbol_files[0]
+    _write_dsym(tmp_path / 'MyApp')
+    frames = [('MyApp', 0x1000a1234, 0x100000000), ('MyApp', 0x100000010, 0x100000000)]
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log(frames=frames))
+    index_store = symbolicate.SymbolIndexStore(str(tmp_path / 'cache'))
+    assert index_store.build(str(tmp_path / 'MyApp')) == [(APP_UUID, 'arm64')]
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'out.crash'), index_store=index_store) is True
+    index_store.close()
+
+    lines = (tmp_path / 'out.crash').read_text().splitlines()
+    assert lines[19].endswith('0x00000001000a1234 -[AppDelegate crash] (in MyApp) (AppDelegate.m:42)')
+    assert lines[20].endswith('0x0000000100000010 sym_10 (in MyApp) + 0')
+    assert [line for line in toolchain.read_text().splitlines() if line.startswith('atos ')] == ['atos 0x0000000100000010']
+
+
+def test_symbolicate_crash_async_falls_back_for_addresses_missing_from_index(tmp_path, toolchain, symbol_files):
+    app_file = symbol_files[0]
+    _write_dsym(tmp_path / 'MyApp')
+    frames = [('MyApp', 0x1000a1234, 0x100000000), ('MyApp', 0x100000010, 0x100000000)]
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log(frames=frames))
+    index_store = symbolicate.SymbolIndexStore(str(tmp_path / 'cache'))
+    index_store.build(str(tmp_path / 'MyApp'))
+
+    assert asyncio.run(symbolicate.symbolicate_crash_async(str(crash_log), lambda *args: app_file, str(tmp_path / 'out.crash'), index_store=index_store)) is True
+    index_store.close()
+
+    lines = (tmp_path / 'out.crash').read_text().splitlines()
+    assert lines[19].endswith('0x00000001000a1234 -[AppDelegate crash] (in MyApp) (AppDelegate.m:42)')
+    assert lines[20].endswith('0x0000000100000010 sym_10 (in MyApp) + 0')
+
+
+def test_index_store_lookup_not_blocked_by_build(tmp_path, monkeypatch):
+    first = tmp_path / 'First'
+    second = tmp_path / 'Second'
+    _write_dsym(first)
+    _write_dsym(second, LIBOBJC_UUID)
+    index_store = symbolicate.SymbolIndexStore(str(tmp_path / 'cache'))
+    index_store.build(str(first))
+    looked_up = list()
+    write_index = symbolicate.index._write_index
+
+    def slow_write_index(*args):
+        # 建立索引的过程中在另一个线程查询已有的索引
+        thread = threading.Thread(target=lambda: looked_up.append(index_store.symbolicate(APP_UUID, 'arm64', 'MyApp', '0x104000000', ['0x1040a1410'])))
+        thread.start()
+        thread.join(5)
+        write_index(*args)
+    monkeypatch.setattr(symbolicate.index, '_write_index', slow_write_index)
+
+    assert index_store.build(str(second)) == [(LIBOBJC_UUID, 'arm64')]
+    assert looked_up == [{'0x1040a1410': 'helper (in MyApp) + 16'}]
+    index_store.close()
+
+
+def test_launcher_default_backend_output_is_stable_across_runs(tmp_path, toolchain):
+    # 符号文件可以建立索引，默认的atos解析不能因为缓存目录中的索引改变输出
+    app_file = tmp_path / 'MyApp.app.dSYM' / 'Contents' / 'Resources' / 'DWARF' / 'MyApp'
+    app_file.parent.mkdir(parents=True)
+    _write_dsym(app_file)
+    (tmp_path / (str(app_file) + '.uuid')).write_text(APP_UUID)
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    for name in ('first.crash', 'second.crash'):
+        output = subprocess.run([sys.executable, os.path.join(ROOT, 'launcher.py'), str(crash_log), str(tmp_path / 'MyApp.app.dSYM'), '-o', str(tmp_path / name)],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        assert output.returncode == 0
+    first = (tmp_path / 'first.crash').read_text()
+    assert 'sym_a1234 (in MyApp) + 0' in first
+    assert (tmp_path / 'second.crash').read_text() == first
+
+
+def test_launcher_index_command(tmp_path):
+    symbol_file = tmp_path / 'MyApp'
+    _write_dsym(symbol_file)
+    output = subprocess.run([sys.executable, os.path.join(ROOT, 'launcher.py'), 'index', str(symbol_file), '--cache-dir', str(tmp_path / 'cache')],
+                            stdout=subprocess.PIPE, universal_newlines=True, cwd=ROOT)
+    assert output.returncode == 0
+    assert output.stdout.split() == [APP_UUID, 'arm64', str(symbol_file)]
+    assert os.path.isfile(str(tmp_path / 'cache' / 'symbols' / (APP_UUID + '-arm64.idx')))
@@ -0,0 +1,46 @@
+import symbolicate
+from symbolicate.macho import read_uuids
+from machofixture import build_macho, build_fat
+from conftest import APP_UUID, LIBOBJC_UUID
+
+__author__ = 'jinzhao'
+
+
+def test_read_uuids_thin_64(tmp_path):
+    path = tmp_path / 'MyApp'
+    path.write_bytes(build_macho('arm64', APP_UUID))
+    assert read_uuids(str(path)) == {'arm64': APP_UUID}
+
+
+def test_read_uuids_thin_32_big_endian(tmp_path):
+    path = tmp_path / 'MyApp'
+    path.write_bytes(build_macho('armv7', APP_UUID, is_64=False, big_endian=True))
+    assert read_uuids(str(path)) == {'armv7': APP_UUID}
+
+
+def test_read_uuids_fat(tmp_path):
+    path = tmp_path / 'MyApp'
+    path.write_bytes(build_fat([build_macho('armv7', LIBOBJC_UUID, is_64=False), build_macho('arm64e', APP_UUID)]))
+    assert read_uuids(str(path)) == {'armv7': LIBOBJC_UUID, 'arm64e': APP_UUID}
+
+
+def test_read_uuids_fat_64(tmp_path):
+    path = tmp_path / 'MyApp'
+    path.write_bytes(build_fat([build_macho('arm64', APP_UUID), build_macho('x86_64', LIBOBJC_UUID)], is_64=True))
+    assert read_uuids(str(path)) == {'arm64': APP_UUID, 'x86_64': LIBOBJC_UUID}
+
+
+def test_read_uuids_not_macho(tmp_path):
+    path = tmp_path / 'MyApp'
+    path.write_bytes(b'')
+    assert read_uuids(str(path)) == {}
+    path.write_bytes(b'not a mach-o file')
+    assert read_uuids(str(path)) == {}
+
+
+def test_query_uuid_without_dwarfdump(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    path = tmp_path / 'MyApp'
+    path.write_bytes(build_fat([build_macho('armv7', LIBOBJC_UUID, is_64=False), build_macho('arm64', APP_UUID)]))
+    assert symbolicate.query_uuid('arm64', str(path)) == APP_UUID
+    assert symbolicate.query_uuid('armv7s', str(path)) == ''
@@ -0,0 +1,50 @@
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+import symbolicate
+from conftest import make_crash_log
+
+__author__ = 'jinzhao'
+
+
+@pytest.fixture(params=['http', 'unix'])
+def server(request, tmp_path, toolchain):
+    if request.param == 'unix':
+        server = symbolicate.SymbolicateServer(str(tmp_path / 'cache'), workers=2, socket_path=str(tmp_path / 'symbolicate.sock'))
+    else:
+        server = symbolicate.SymbolicateServer(str(tmp_path / 'cache'), workers=2)
+    server.start()
+    yield server
+    server.shutdown()
+    server.close()
+
+
+def test_server_symbolicates_concurrent_requests(tmp_path, toolchain, symbol_files, server):
+    content = make_crash_log() * 2
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(content)
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: symbol_files[0], str(tmp_path / 'expected.crash')) is True
+    expected = (tmp_path / 'expected.crash').read_text()
+
+    client = symbolicate.SymbolicateClient(server.address)
+    assert client.health()['status'] == 'ok'
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(lambda index: client.symbolicate(content, symbol_files[0]), range(8)))
+    assert outputs == [expected] * 8
+
+    stats = client.stats()
+    assert stats['requests'] == 8
+    assert stats['crashes'] == 16
+    assert stats['resolved'] == stats['frames'] == 64
+    assert stats['atos_pool']['spawned'] == 2
+
+
+def test_server_rejects_missing_dsym(server):
+    client = symbolicate.SymbolicateClient(server.address)
+    with pytest.raises(IOError):
+        client.symbolicate(make_crash_log(), '')
+
+
+def test_dsym_symbol_file():
+    assert symbolicate.server.dsym_symbol_file('/path/MyApp.app.dSYM/') == os.path.join('/path/MyApp.app.dSYM', 'Contents', 'Resources', 'DWARF', 'MyApp')
+    assert symbolicate.server.dsym_symbol_file('/path/MyApp') == '/path/MyApp'
@@ -0,0 +1,69 @@
+import os
+import sys
+import subprocess
+import symbolicate
+from symbolicate.sidecar import save_state, load_state
+from symbolicate.symbolicate import _parse_content
+from conftest import make_crash_log, APP_UUID
+
+__author__ = 'jinzhao'
+
+_LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'launcher.py')
+
+
+def _tool_calls(tool_log):
+    return tool_log.read_text().splitlines()
+
+
+def test_state_round_trip(tmp_path):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log() * 2)
+    crash_list = _parse_content(crash_log.read_text().splitlines(True), lambda *args: 'app')
+    crash_list[0].function_stacks[1].invoke_symbol = 'main (in MyApp) + 0'
+    state_path = str(tmp_path / 'log.state')
+
+    assert save_state(state_path, str(crash_log), crash_list) is True
+    loaded = load_state(state_path, str(crash_log))
+    assert len(loaded) == 2
+    assert loaded[0].binary_images['MyApp'].symbol_file == 'app'
+    assert loaded[0].binary_images['MyApp'].uuid == APP_UUID
+    assert loaded[0].image_for(loaded[0].function_stacks[0]).name == 'libobjc.A.dylib'
+    assert [stack_item.invoke_symbol for stack_item in loaded[0].function_stacks] == ['', 'main (in MyApp) + 0', '', '']
+    assert [stack_item.line_num for stack_item in loaded[1].function_stacks] == [stack_item.line_num for stack_item in crash_list[1].function_stacks]
+
+    # crash日志变化后状态文件失效
+    with open(str(crash_log), 'a') as file:
+        file.write('\n')
+    assert load_state(state_path, str(crash_log)) is None
+
+
+def test_resume_retries_unresolved_frames_only(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    app_file = symbol_files[0]
+    state_path = str(tmp_path / 'log.state')
+    missing_file = str(tmp_path / 'missing' / 'MyApp')
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: missing_file, str(tmp_path / 'first.crash'), state_path=state_path) is True
+    assert 'sym_a1234 (in MyApp)' not in (tmp_path / 'first.crash').read_text()
+    assert os.path.isfile(state_path)
+    toolchain.write_text('')
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'second.crash'), state_path=state_path, resume=True) is True
+    content = (tmp_path / 'second.crash').read_text()
+    assert 'sym_a1234 (in MyApp)' in content
+    assert 'sym_19bd0 (in libobjc.A.dylib)' in content
+    # 已经解析的libobjc不再处理
+    assert [line for line in _tool_calls(toolchain) if line.startswith('atos ')] == ['atos 0x00000001000a1234 0x00000001000a1300']
+    assert [line for line in _tool_calls(toolchain) if line.startswith('dwarfdump ')] == ['dwarfdump ' + app_file]
+
+
+def test_launcher_rejects_state_with_stream_or_ndjson(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    dsym = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(symbol_files[0]))))
+    for options in (['--resume', '--stream'], ['--state', str(tmp_path / 'state.json'), '--format', 'ndjson']):
+        output = subprocess.run([sys.executable, _LAUNCHER, str(crash_log), dsym] + options, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        assert output.returncode == 2
+        assert output.stdout.startswith('Error! --state and --resume cannot be used')
+    assert os.listdir(str(tmp_path)).count('state.json') == 0
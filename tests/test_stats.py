@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import subprocess
+import symbolicate
+from conftest import make_crash_log
+
+__author__ = 'jinzhao'
+
+_LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'launcher.py')
+
+
+def test_symbolicate_crash_with_stats(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log() * 2)
+    app_file = symbol_files[0]
+    (tmp_path / (app_file + '.uuid')).write_text('00000000000000000000000000000000')
+
+    result, stats = symbolicate.symbolicate_crash_with_stats(str(crash_log), lambda *args: app_file, str(tmp_path / 'out.crash'))
+    assert result is True
+    stats = stats.to_dict()
+    assert sorted(stats['stages']) == ['compose', 'parse', 'read', 'symbolicate', 'wait_process', 'write']
+    assert stats['stages']['parse']['count'] == 1
+    assert stats['commands']['dwarfdump']['count'] == 2
+    assert stats['commands']['atos']['count'] == 1
+    assert sorted(stats['commands']['atos']['images']) == ['libobjc.A.dylib']
+    assert stats['caches']['uuid_cache'] == {'hits': 0, 'misses': 2, 'hit_rate': 0.0}
+    assert (stats['crashes'], stats['frames'], stats['resolved'], stats['unresolved']) == (2, 8, 4, 4)
+    assert stats['uuid_mismatches'] == [{'image': 'MyApp', 'symbol_file': app_file, 'uuid': '0123456789ABCDEF0123456789ABCDEF'}]
+
+
+def test_missing_symbol_file_is_not_a_uuid_mismatch(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    os.remove(symbol_files[1])
+
+    result, stats = symbolicate.symbolicate_crash_with_stats(str(crash_log), lambda *args: symbol_files[0], str(tmp_path / 'out.crash'))
+    assert result is True
+    stats = stats.to_dict()
+    assert stats['uuid_mismatches'] == []
+    assert [(image['image'], image['reason']) for image in stats['skipped_images']] == [('libobjc.A.dylib', 'symbol file not found')]
+
+
+def test_symbolicate_crash_without_stats_records_nothing(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    context = symbolicate.symbolicate._SymbolicateContext()
+    assert symbolicate.symbolicate._symbolicate_log(str(crash_log), lambda *args: symbol_files[0], str(tmp_path / 'out.crash'), context) == (1, 4, 4)
+    assert context.stats is None
+
+
+def test_launcher_prints_json_stats(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    dsym = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(symbol_files[0]))))
+    process = subprocess.run([sys.executable, _LAUNCHER, str(crash_log), dsym, '-o', str(tmp_path / 'out.crash'), '--stream', '--stats-format', 'json'],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    stderr = process.stderr.decode('utf-8')
+    stats = json.loads(stderr[stderr.index('{'):])
+    assert stats['frames'] == 4
+    assert stats['stages']['stream']['count'] == 1
+    assert stats['stages']['symbolicate']['count'] == 1
+
+
+def test_launcher_stats_flag_before_positional_arguments(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    dsym = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(symbol_files[0]))))
+    process = subprocess.run([sys.executable, _LAUNCHER, '--stats', str(crash_log), dsym, '-o', str(tmp_path / 'out.crash')],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert process.returncode == 0
+    assert 'crashes: 1, frames: 4, resolved: 4, unresolved: 0' in process.stderr
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import symbolicate
+from conftest import make_crash_log, APP_UUID, LIBOBJC_UUID
+from machofixture import build_macho
+
+__author__ = 'jinzhao'
+
+_LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'launcher.py')
+
+
+def _write_symbols(root):
+    app_file = root / 'MyApp.app.dSYM' / 'Contents' / 'Resources' / 'DWARF' / 'MyApp'
+    app_file.parent.mkdir(parents=True)
+    app_file.write_bytes(build_macho('arm64', APP_UUID))
+    system_file = root / 'Symbols' / 'usr' / 'lib' / 'libobjc.A.dylib'
+    system_file.parent.mkdir(parents=True)
+    system_file.write_bytes(build_macho('arm64', LIBOBJC_UUID))
+    (root / 'README').write_text('not a Mach-O file')
+    return str(app_file), str(system_file)
+
+
+def test_symbol_store_maps_uuid_to_file(tmp_path):
+    app_file, system_file = _write_symbols(tmp_path / 'symbols')
+    store = symbolicate.SymbolStore([str(tmp_path / 'symbols')])
+
+    assert store.lookup(APP_UUID) == app_file
+    assert store.lookup(LIBOBJC_UUID.lower(), 'arm64') == system_file
+    assert store.lookup(LIBOBJC_UUID, 'armv7') is None
+    assert store('MyApp', 'com.example.MyApp', '1.0', 'arm64', APP_UUID) == app_file
+    assert store.stats() == {'hits': 3, 'misses': 1, 'files': 3, 'uuids': 2}
+
+
+def test_symbol_store_rescans_changed_files_only(tmp_path):
+    app_file, system_file = _write_symbols(tmp_path / 'symbols')
+    cache_dir = str(tmp_path / 'cache')
+    symbolicate.SymbolStore([str(tmp_path / 'symbols')], cache_dir)
+
+    store = symbolicate.SymbolStore([str(tmp_path / 'symbols')], cache_dir, scan=False)
+    assert store.lookup(APP_UUID) == app_file
+    assert store.scan() == {'scanned': 3, 'read': 0, 'uuids': 2}
+
+    new_uuid = 'AB' * 16
+    with open(app_file, 'wb') as file:
+        file.write(build_macho('arm64', new_uuid) + b'\0')
+    os.remove(system_file)
+    assert store.scan() == {'scanned': 2, 'read': 1, 'uuids': 1}
+    assert store.lookup(new_uuid) == app_file
+    assert store.lookup(APP_UUID) is None
+    assert store.lookup(LIBOBJC_UUID) is None
+
+
+def test_symbol_store_ignores_files_changed_after_scan(tmp_path):
+    app_file, system_file = _write_symbols(tmp_path / 'symbols')
+    store = symbolicate.SymbolStore([str(tmp_path / 'symbols')])
+    with open(app_file, 'ab') as file:
+        file.write(b'\0')
+    os.remove(system_file)
+
+    assert store.lookup(APP_UUID) is None
+    assert store.lookup(LIBOBJC_UUID) is None
+
+
+def test_symbol_store_concurrent_saves(tmp_path):
+    _write_symbols(tmp_path / 'symbols')
+    cache_dir = tmp_path / 'cache'
+    store = symbolicate.SymbolStore([str(tmp_path / 'symbols')], str(cache_dir))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda index: store.save(), range(200)))
+
+    assert all(results)
+    assert not [path for path in cache_dir.rglob('*') if path.name.endswith('.tmp')]
+    assert symbolicate.SymbolStore([str(tmp_path / 'symbols')], str(cache_dir), scan=False).lookup(APP_UUID) is not None
+
+
+def test_symbolicate_crash_with_symbol_store(tmp_path, toolchain):
+    _write_symbols(tmp_path / 'symbols')
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    output = tmp_path / 'out.crash'
+    store = symbolicate.SymbolStore([str(tmp_path / 'symbols')])
+
+    assert symbolicate.symbolicate_crash(str(crash_log), None, str(output), symbol_store=store) is True
+    content = output.read_text()
+    assert 'sym_a1234 (in MyApp)' in content
+    assert 'sym_19bd0 (in libobjc.A.dylib)' in content
+    # 索引中的uuid已经确认，不需要运行dwarfdump
+    assert [line for line in toolchain.read_text().splitlines() if line.startswith('dwarfdump ')] == []
+
+
+def test_symbolicate_crash_requires_finder_or_symbol_store(tmp_path):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+
+    with pytest.raises(ValueError):
+        symbolicate.symbolicate_crash(str(crash_log), None, str(tmp_path / 'out.crash'))
+    with open(str(crash_log)) as file, pytest.raises(ValueError):
+        list(symbolicate.symbolicate_stream(file, None))
+
+
+def test_warm_symbols_only_for_referenced_images(tmp_path):
+    root = tmp_path / 'symbols'
+    app_file, system_file = _write_symbols(root)
+    other_file = root / 'Symbols' / 'usr' / 'lib' / 'libother.dylib'
+    other_file.write_bytes(build_macho('arm64', 'CD' * 16))
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    cache_dir = str(tmp_path / 'cache')
+    stages = list()
+
+    summary = symbolicate.warm_symbols([str(root)], [str(crash_log)], cache_dir, workers=2, progress=lambda *args: stages.append(args))
+    assert summary == {'scanned': 4, 'read': 4, 'uuids': 3, 'images': 2, 'missing': 0, 'indexed': 2}
+    assert stages[-1] == ('index', 2, 2)
+    assert ('scan', 4, 4) in stages
+    assert symbolicate.UUIDCache(cache_dir).get(system_file, 'arm64') == LIBOBJC_UUID
+    index_store = symbolicate.SymbolIndexStore(cache_dir)
+    assert index_store.exists(APP_UUID, 'arm64') is True
+    assert index_store.exists('CD' * 16, 'arm64') is False
+
+    # 再次运行时跳过已经完成的部分
+    summary = symbolicate.warm_symbols([str(root)], [str(crash_log)], cache_dir)
+    assert (summary['read'], summary['indexed']) == (0, 0)
+
+
+def test_warm_symbols_builds_every_index_in_parallel(tmp_path):
+    root = tmp_path / 'symbols'
+    root.mkdir()
+    uuids = ['{:032X}'.format(0xA0 + index) for index in range(6)]
+    for index, uuid in enumerate(uuids):
+        (root / 'lib{}.dylib'.format(index)).write_bytes(build_macho('arm64', uuid))
+    cache_dir = str(tmp_path / 'cache')
+
+    summary = symbolicate.warm_symbols([str(root)], cache_dir=cache_dir, workers=4)
+    assert (summary['images'], summary['indexed']) == (6, 6)
+    index_store = symbolicate.SymbolIndexStore(cache_dir)
+    assert all(index_store.exists(uuid, 'arm64') for uuid in uuids)
+    assert [name for name in os.listdir(index_store.root) if name.endswith('.tmp')] == []
+
+
+def test_launcher_warm_command(tmp_path):
+    root = tmp_path / 'symbols'
+    _write_symbols(root)
+    output = subprocess.run([sys.executable, _LAUNCHER, 'warm', str(root), '--cache-dir', str(tmp_path / 'cache'), '--no-index'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert output.returncode == 0
+    assert output.stdout.startswith('3 files scanned (3 read), 2 uuids, 2 images warmed, 0 indexes built')
+    assert 'scan: 3/3' in output.stderr
+
+
+def test_launcher_reuses_warmed_caches_by_default(tmp_path, toolchain):
+    root = tmp_path / 'symbols'
+    _write_symbols(root)
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    # warm及符号化都使用默认的缓存目录
+    warm = subprocess.run([sys.executable, _LAUNCHER, 'warm', str(root), '-q'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert warm.returncode == 0
+    output = subprocess.run([sys.executable, _LAUNCHER, str(crash_log), str(root / 'MyApp.app.dSYM'), '-o', str(tmp_path / 'out.crash'), '--backend', 'native', '--stats-format', 'json'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert output.returncode == 0
+    caches = json.loads(output.stderr[output.stderr.index('{'):])['caches']
+    assert caches['symbol_store']['hits'] == 2
+    assert caches['symbol_index']['hits'] == 2
+    assert [line for line in toolchain.read_text().splitlines() if line.startswith('dwarfdump ')] == []
@@ -0,0 +1,156 @@
+import json
+import symbolicate
+import symbolicate.symbolicate as symbolicate_module
+from symbolicate.symbolicate import _split_symbol
+from conftest import APP_UUID, LIBOBJC_UUID, make_crash_log
+
+__author__ = 'jinzhao'
+
+
+def _tool_calls(tool_log, tool):
+    return [line for line in tool_log.read_text().splitlines() if line.startswith(tool + ' ')]
+
+
+def test_symbolicate_crash_batches_atos_per_image(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    output_file = tmp_path / 'symbol_log.crash'
+    app_file = symbol_files[0]
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(output_file)) is True
+
+    lines = output_file.read_text().splitlines()
+    assert lines[19].endswith('0x0000000180e2dbd0 sym_19bd0 (in libobjc.A.dylib) + 0')
+    assert lines[20].endswith('0x00000001000a1234 sym_a1234 (in MyApp) + 0')
+    assert lines[21].endswith('0x00000001000a1300 sym_a1300 (in MyApp) + 0')
+    assert lines[22].endswith('0x0000000180e2dbd0 sym_19bd0 (in libobjc.A.dylib) + 0')
+    atos_calls = _tool_calls(toolchain, 'atos')
+    assert sorted(atos_calls) == ['atos 0x00000001000a1234 0x00000001000a1300', 'atos 0x0000000180e2dbd0']
+
+
+def test_symbolicate_crash_skips_uuid_mismatch(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    output_file = tmp_path / 'symbol_log.crash'
+    app_file = symbol_files[0]
+    (tmp_path / (app_file + '.uuid')).write_text('00000000000000000000000000000000')
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(output_file)) is True
+
+    lines = output_file.read_text().splitlines()
+    assert lines[20].rstrip().endswith('0x00000001000a1234')
+    assert lines[19].endswith('sym_19bd0 (in libobjc.A.dylib) + 0')
+    assert _tool_calls(toolchain, 'atos') == ['atos 0x0000000180e2dbd0']
+
+
+def test_symbolicate_crash_concurrent_output_matches_serial(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(''.join(make_crash_log(incident='8B0B2A4C-0000-4C5E-9A8E-4A7A8E0B1C{:02X}'.format(index)) for index in range(6)))
+    app_file = symbol_files[0]
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'serial.crash')) is True
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'concurrent.crash'), workers=4, max_processes=2) is True
+
+    assert (tmp_path / 'serial.crash').read_bytes() == (tmp_path / 'concurrent.crash').read_bytes()
+    assert 'sym_a1234 (in MyApp)' in (tmp_path / 'concurrent.crash').read_text()
+
+
+def test_symbolicate_crash_stream_output_matches_whole_file(tmp_path, toolchain, symbol_files):
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text('preamble\n' + make_crash_log() * 3 + 'trailer\n')
+    app_file = symbol_files[0]
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'whole.crash')) is True
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(tmp_path / 'stream.crash'), stream=True) is True
+
+    assert (tmp_path / 'whole.crash').read_bytes() == (tmp_path / 'stream.crash').read_bytes()
+
+
+def test_symbolicate_stream_emits_each_crash_before_reading_further(toolchain, symbol_files):
+    content = make_crash_log().splitlines(True)
+    consumed = list()
+
+    def lines():
+        for index in range(3):
+            for line in content:
+                consumed.append(index)
+                yield line
+
+    output = symbolicate.symbolicate_stream(lines(), lambda *args: symbol_files[0])
+    first_block = [next(output) for index in range(len(content) - 2)]
+    assert first_block[20].endswith('sym_a1234 (in MyApp) + 0\n')
+    assert consumed[-1] == 0
+    assert len(list(output)) == len(content) * 3 - len(first_block)
+
+
+def test_symbolicate_crash_dedups_addresses_across_threads_and_crashes(tmp_path, toolchain, symbol_files):
+    slid_frames = [('MyApp', 0x1001a1234, 0x100100000),
+                   ('libobjc.A.dylib', 0x180e2dbd0, 0x180e14000)]
+    slid_images = [(0x100100000, 0x1010fffff, '+MyApp', APP_UUID, '/var/mobile/Applications/MyApp.app/MyApp'),
+                   (0x180e14000, 0x180e3ffff, 'libobjc.A.dylib', LIBOBJC_UUID, '/usr/lib/libobjc.A.dylib')]
+    second_thread = '\nThread 1:\n0   MyApp                           0x00000001001a1400 0x100100000 + 660480\n'
+    slid_log = make_crash_log(frames=slid_frames, images=slid_images).replace('\nBinary Images:', second_thread + '\nBinary Images:')
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log() + slid_log)
+    output_file = tmp_path / 'symbol_log.crash'
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: symbol_files[0], str(output_file)) is True
+
+    content = output_file.read_text()
+    assert '0x00000001001a1234 sym_a1234 (in MyApp) + 0' in content
+    assert '0x00000001001a1400 sym_a1400 (in MyApp) + 0' in content
+    assert content.count('sym_19bd0 (in libobjc.A.dylib) + 0') == 3
+    atos_calls = _tool_calls(toolchain, 'atos')
+    assert sorted(atos_calls) == ['atos 0x00000001000a1234 0x00000001000a1300 0x1000a1400', 'atos 0x0000000180e2dbd0']
+
+
+def test_symbolicate_crash_splits_long_atos_command_lines(tmp_path, toolchain, symbol_files, monkeypatch):
+    monkeypatch.setattr(symbolicate_module, '_ATOS_MAX_ADDRESSES', 2)
+    frames = [('MyApp', 0x1000a1000 + index * 0x10, 0x100000000) for index in range(5)]
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log(frames=frames))
+    output_file = tmp_path / 'symbol_log.crash'
+
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: symbol_files[0], str(output_file)) is True
+
+    content = output_file.read_text()
+    assert all('sym_a10{:x}0 (in MyApp) + 0'.format(index) in content for index in range(5))
+    assert [len(line.split()) - 1 for line in _tool_calls(toolchain, 'atos')] == [2, 2, 1]
+
+
+def test_parse_content_keeps_grammar_and_separate_images():
+    content = make_crash_log().replace('Incident Identifier: ', 'Incident\tIdentifier:') * 2
+    found = list()
+    crash_list = symbolicate.symbolicate._parse_content(content.splitlines(True), lambda *args: found.append(args) or 'app{}'.format(len(found)))
+
+    assert len(crash_list) == 2
+    assert [stack_item.line_num for stack_item in crash_list[1].function_stacks] == [19 + len(content.splitlines()) // 2 + offset for offset in range(4)]
+    assert crash_list[1].function_stacks[1].offset == 0xa1234
+    assert crash_list[0].binary_images['MyApp'] is not crash_list[1].binary_images['MyApp']
+    assert [crash_obj.binary_images['MyApp'].symbol_file for crash_obj in crash_list] == ['app1', 'app2']
+    assert found[0] == ('MyApp', 'com.example.MyApp', '1.0', 'arm64', APP_UUID)
+
+
+def test_symbolicate_records_and_ndjson_output(tmp_path, toolchain, symbol_files):
+    assert _split_symbol('main (in MyApp) (main.m:12)') == ('main', 'main.m', 12)
+    assert _split_symbol('objc_msgSend (in libobjc.A.dylib) + 16') == ('objc_msgSend', None, None)
+    assert _split_symbol('0x1000a1234') == ('0x1000a1234', None, None)
+    assert _split_symbol('') == (None, None, None)
+
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log() * 2)
+    app_file = symbol_files[0]
+    with open(str(crash_log)) as file:
+        records = list(symbolicate.symbolicate_records(file, lambda *args: app_file))
+    assert len(records) == 2
+    record = records[0]
+    assert (record['product_name'], record['identifier'], record['version'], record['code_type']) == ('MyApp', 'com.example.MyApp', '1.0', 'ARM-64')
+    assert record['frames'][1] == {'log_line': 20, 'image': 'MyApp', 'address': '0x00000001000a1234', 'offset': 0xa1234,
+                                   'symbol': 'sym_a1234', 'file': None, 'line': None, 'resolved': True}
+    assert [image['name'] for image in record['images']] == ['MyApp', 'libobjc.A.dylib']
+    assert record['images'][0]['end_address'] == '0x100ffffff'
+    assert record['images'][1]['uuid'] == LIBOBJC_UUID
+
+    output_file = tmp_path / 'out.ndjson'
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(output_file), output_format='ndjson') is True
+    assert [json.loads(line) for line in output_file.read_text().splitlines()] == records
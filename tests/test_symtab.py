@@ -0,0 +1,60 @@
+import symbolicate
+from symbolicate.macho import MachOFile
+from symbolicate.symtab import SymbolTable, NativeResolver
+from machofixture import build_macho, build_fat
+from conftest import make_crash_log, APP_UUID, LIBOBJC_UUID
+
+__author__ = 'jinzhao'
+
+APP_SYMBOLS = [('-[AppDelegate crash]', 0x1000a1200), ('_main', 0x1000a1280), ('_helper', 0x1000a1400)]
+LIBOBJC_SYMBOLS = [('_objc_msgSend', 0x180e2dbc0), ('_objc_retain', 0x180e2dc00)]
+
+
+def write_native_symbol_files(app_file, system_file):
+    with open(app_file, 'wb') as file:
+        file.write(build_macho('arm64', APP_UUID, symbols=APP_SYMBOLS, text_size=0x200000))
+    with open(system_file, 'wb') as file:
+        file.write(build_fat([build_macho('armv7', LIBOBJC_UUID[::-1], is_64=False),
+                              build_macho('arm64', LIBOBJC_UUID, symbols=LIBOBJC_SYMBOLS, text_vmaddr=0x180e14000, text_size=0x2c000)]))
+
+
+def test_symbol_table_lookup(tmp_path):
+    path = tmp_path / 'MyApp'
+    path.write_bytes(build_macho('arm64', APP_UUID, symbols=APP_SYMBOLS, text_size=0x200000))
+    with MachOFile(str(path)) as macho_file:
+        table = SymbolTable(macho_file.slice('arm64'))
+        assert len(table) == 3
+        assert table.lookup(0x1000a1234) == ('-[AppDelegate crash]', 0x34)
+        assert table.lookup(0x1000a1280) == ('main', 0)
+        assert table.lookup(0x1000a1500) == ('helper', 0x100)
+        assert table.lookup(0x1000a1100) is None
+        assert table.lookup(0x100200000) is None
+
+
+def test_native_resolver_applies_slide(tmp_path):
+    path = tmp_path / 'MyApp'
+    path.write_bytes(build_macho('arm64', APP_UUID, symbols=APP_SYMBOLS, text_size=0x200000))
+    resolver = NativeResolver()
+    symbols = resolver.symbolicate(str(path), 'arm64', 'MyApp', '0x104000000', ['0x1040a1234', '0x104000010'])
+    assert symbols == {'0x1040a1234': '-[AppDelegate crash] (in MyApp) + 52'}
+    assert resolver.symbolicate(str(path), 'armv7', 'MyApp', '0x4000', ['0x4010']) == {}
+    resolver.close()
+
+
+def test_symbolicate_crash_with_native_resolver(tmp_path, monkeypatch, symbol_files):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    app_file, system_file = symbol_files
+    write_native_symbol_files(app_file, system_file)
+    crash_log = tmp_path / 'log.crash'
+    crash_log.write_text(make_crash_log())
+    output_file = tmp_path / 'symbol_log.crash'
+
+    resolver = symbolicate.NativeResolver()
+    assert symbolicate.symbolicate_crash(str(crash_log), lambda *args: app_file, str(output_file), resolver=resolver) is True
+    resolver.close()
+
+    lines = output_file.read_text().splitlines()
+    assert lines[19].endswith('0x0000000180e2dbd0 objc_msgSend (in libobjc.A.dylib) + 16')
+    assert lines[20].endswith('0x00000001000a1234 -[AppDelegate crash] (in MyApp) + 52')
+    assert lines[21].endswith('0x00000001000a1300 main (in MyApp) + 128')